@@ -9,8 +9,9 @@ class Settings(BaseSettings):
     # Ollama
     ollama_base_url: str = "http://localhost:11434"
 
-    # OpenAI
+    # OpenAI (or any OpenAI-compatible endpoint when openai_api_base is set)
     openai_api_key: str = ""
+    openai_api_base: str = ""
 
     # Anthropic
     anthropic_api_key: str = ""
@@ -26,11 +27,62 @@ class Settings(BaseSettings):
 
     # Database
     database_url: str = "sqlite:///./query_builder.db"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"
+    sqlite_busy_timeout_ms: int = 5000
 
     # Qdrant
     qdrant_url: str = "https://vector.cyberglobes.ai"
     qdrant_api_key: str = ""
-    qdrant_collection: str = "cg_data_sources_dev"
+    qdrant_collection: str = "cg_data_sources_dev"  # Default catalog
+    qdrant_collections: str = ""  # Comma-separated further collections requests may select
+    catalog_memory_budget_mb: int = 512  # Least recently used collections are evicted beyond this
+    catalog_refresh_interval: float = 30.0  # Background refresh check for hot collections; 0 disables
+    catalog_hot_uses: int = 10  # Catalog lookups since the last refresh that make a collection hot
+    catalog_history_size: int = 100  # Catalog changes kept per collection for /services/changes
+    catalog_backoff_base: float = 5.0  # Seconds before retrying a failed catalog refresh; doubles per failure
+    catalog_backoff_max: float = 300.0
+    catalog_circuit_threshold: int = 3  # Consecutive failures before callers without a catalog fail fast
+
+    # Plan cache
+    plan_cache_size: int = 1024  # 0 disables
+    plan_cache_ttl: int = 3600
+    plan_cache_warm_limit: int = 1000  # Records replayed from the generation log at startup
+    entity_cache_size: int = 1024  # Plans keyed on the prompt with URLs/handles/hashtags/quotes abstracted; 0 disables
+
+    # Plan output format requested from the LLM: full (QueryPlan) | compact (CompactPlan, expanded locally)
+    plan_output_format: str = "full"
+
+    # Skeleton planning: match the prompt to a mined plan skeleton and have the LLM fill only its slots
+    skeleton_planning: bool = False
+    skeleton_min_score: float = 0.5  # Classifier similarity needed to use a skeleton
+    skeleton_min_support: int = 3  # Occurrences a skeleton mined from logs/corrections needs (examples always count)
+    skeleton_log_limit: int = 10000  # Generation log records mined at startup
+    skeleton_corrections_limit: int = 5000
+
+    # Generation log
+    generation_log_enabled: bool = True
+    generation_log_dir: str = "./generation_log"
+    generation_log_segment_bytes: int = 64 * 1024 * 1024
+    generation_log_queue_size: int = 10000
+
+    # Profiling (off unless a token is set or the sample rate is > 0)
+    profile_token: str = ""  # Requests with a matching X-Profile-Token header are profiled
+    profile_sample_rate: float = 0.0
+    profile_interval_ms: float = 5.0
+    profile_dir: str = "./profiles"
+    profile_max_files: int = 200
+
+    # Tracing
+    tracing_exporter: str = "none"  # none | file | otlp
+    tracing_file: str = "./traces/spans.jsonl"
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_service_name: str = "cgbrains"
+
+    # Startup
+    llm_sdk_preload: bool = True  # Import the LLM SDKs in a background thread at startup
 
     # Logging
     log_level: str = "info"
@@ -53,6 +105,8 @@ class Settings(BaseSettings):
             return self.ollama_base_url
         if self.llm_provider == "azure":
             return self.azure_api_base or None
+        if self.llm_provider == "openai":
+            return self.openai_api_base or None
         return None
 
     @property
@@ -65,5 +119,18 @@ class Settings(BaseSettings):
             }
         return {}
 
+    def litellm_kwargs_for(self, model: str) -> dict:
+        """Return api_base and provider kwargs for any litellm model string."""
+        if model.startswith("ollama/"):
+            return {"api_base": self.ollama_base_url}
+        if model.startswith("azure/"):
+            kwargs = {"api_key": self.azure_api_key, "api_version": self.azure_api_version}
+            if self.azure_api_base:
+                kwargs["api_base"] = self.azure_api_base
+            return kwargs
+        if self.llm_provider == "openai" and self.openai_api_base:
+            return {"api_base": self.openai_api_base}
+        return {}
+
 
 settings = Settings()
@@ -0,0 +1,102 @@
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlmodel import SQLModel, create_engine
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SYNCHRONOUS_LEVELS = {"off", "normal", "full", "extra"}
+_JOURNAL_MODES = {"delete", "truncate", "persist", "memory", "wal", "off"}
+
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Configure every new SQLite connection for concurrent readers and writers.
+
+    WAL lets readers (exports, training jobs) run alongside the API's writes,
+    ``synchronous=NORMAL`` is durable under WAL without an fsync per commit,
+    and ``busy_timeout`` makes a writer wait for the lock instead of failing
+    immediately with ``database is locked``.
+    """
+    journal_mode = settings.sqlite_journal_mode.lower()
+    synchronous = settings.sqlite_synchronous.lower()
+    if journal_mode not in _JOURNAL_MODES:
+        raise ValueError(f"Unsupported SQLITE_JOURNAL_MODE: {settings.sqlite_journal_mode}")
+    if synchronous not in _SYNCHRONOUS_LEVELS:
+        raise ValueError(f"Unsupported SQLITE_SYNCHRONOUS: {settings.sqlite_synchronous}")
+
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(settings.sqlite_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+    cursor.execute(f"PRAGMA synchronous = {synchronous}")
+    cursor.close()
+
+
+def create_db_engine(url: str | None = None) -> Engine:
+    """Create the SQLAlchemy engine used by the API and the training scripts."""
+    url = url or settings.database_url
+
+    if not _is_sqlite(url):
+        return create_engine(
+            url,
+            echo=False,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_pre_ping=True,
+        )
+
+    connect_args = {
+        "check_same_thread": False,
+        "timeout": settings.sqlite_busy_timeout_ms / 1000,
+    }
+    if _is_sqlite_memory(url):
+        # A single shared connection, otherwise every checkout sees an empty DB
+        engine = create_engine(url, echo=False, connect_args=connect_args, poolclass=StaticPool)
+    else:
+        engine = create_engine(
+            url,
+            echo=False,
+            connect_args=connect_args,
+            poolclass=QueuePool,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+        )
+
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+def migrate(engine: Engine) -> None:
+    """Bring an existing database up to the current schema.
+
+    Tables are created without their indexes, and databases created before
+    an index was declared never got it either, so create any missing
+    indexes here; this is idempotent and cheap when they already exist.
+    ``IF NOT EXISTS`` (rather than inspect-then-create) keeps it safe when
+    several workers start against a fresh database.
+    """
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def init_db(engine: Engine) -> None:
+    """Create missing tables and apply migrations."""
+    with engine.begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            conn.execute(CreateTable(table, if_not_exists=True))
+    migrate(engine)
+    logger.info("Database ready (%s)", engine.url.render_as_string(hide_password=True))
@@ -1,10 +1,13 @@
 import logging
+import time
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException
-from sqlmodel import Session, SQLModel, create_engine
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+from sqlmodel import Session
 
 from app.config import settings
+from app.database import create_db_engine, init_db
 from app.models.feedback import QueryBuilderLog
 from app.models.schemas import (
     ErrorResponse,
@@ -12,21 +15,72 @@ from app.models.schemas import (
     FeedbackResponse,
     GenerateRequest,
     GenerateResponse,
+    PlanResponse,
+    RefineRequest,
 )
+from app.models.step_types import QueryPlan
 from app.services.assembler import build_message, build_response
-from app.services.catalog import list_categories
-from app.services.planner import generate_plan
+from app.services.catalog_search import search_services
+from app.services.catalog import (
+    available_collections,
+    get_catalog_cache_stats,
+    get_catalog_changes,
+    get_catalog_status,
+    start_background_refresh,
+    stop_background_refresh,
+    use_collection,
+)
+from app.services.entity_cache import entity_plan_cache
+from app.services.generation_log import generation_log, recent_records
+from app.services.plan_cache import plan_cache
+from app.services.planner import generate_plan, preload_llm_sdk_in_background, refine_plan, warm_plan_cache
+from app.services.profiler import (
+    list_profiles,
+    profile_current_thread,
+    read_profile,
+    save_profile,
+    should_profile,
+    token_valid,
+)
+from app.services.serialization import FastJSONResponse
+from app.services.services_response import CATEGORY_FIELDS, choose_encoding, get_services_body
+from app.services.skeletons import load_skeleton_library, set_skeleton_library
+from app.services.tracing import TraceIdFilter, TracingMiddleware, configure_tracing, shutdown_tracing
 
-logging.basicConfig(level=settings.log_level.upper())
+logging.basicConfig(
+    level=settings.log_level.upper(),
+    format="%(levelname)s:%(name)s:[trace=%(trace_id)s] %(message)s",
+)
+for _handler in logging.getLogger().handlers:
+    _handler.addFilter(TraceIdFilter())
 logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.database_url, echo=False)
+engine = create_db_engine()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    SQLModel.metadata.create_all(engine)
+    configure_tracing()
+    if settings.llm_sdk_preload:
+        preload_llm_sdk_in_background()
+    init_db(engine)
+    if settings.skeleton_planning:
+        records = recent_records(settings.generation_log_dir, settings.skeleton_log_limit) if settings.generation_log_enabled else []
+        library = load_skeleton_library(
+            engine, records, settings.skeleton_min_support, settings.skeleton_min_score, settings.skeleton_corrections_limit
+        )
+        set_skeleton_library(library)
+        logger.info("Loaded %d plan skeletons", len(library))
+    if settings.generation_log_enabled:
+        warmed = warm_plan_cache(recent_records(settings.generation_log_dir, settings.plan_cache_warm_limit))
+        if warmed:
+            logger.info("Warmed plan cache with %d plans from the generation log", warmed)
+        generation_log.start()
+    start_background_refresh()
     yield
+    stop_background_refresh()
+    generation_log.stop()
+    shutdown_tracing()
 
 
 app = FastAPI(
@@ -35,6 +89,7 @@ app = FastAPI(
     version="0.1.0",
     lifespan=lifespan,
 )
+app.add_middleware(TracingMiddleware)
 
 
 @app.get("/health")
@@ -42,17 +97,125 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def metrics():
+    """Catalog freshness and refresh backoff state (default and all cached collections), and plan cache counters."""
+    return {
+        "catalog": get_catalog_status(),
+        "catalog_cache": get_catalog_cache_stats(),
+        "plan_cache": {"size": len(plan_cache), "hits": plan_cache.hits, "misses": plan_cache.misses},
+        "entity_plan_cache": {
+            "size": len(entity_plan_cache), "hits": entity_plan_cache.hits, "misses": entity_plan_cache.misses,
+        },
+    }
+
+
+def _check_collection(name: str | None) -> None:
+    if name is not None and name not in available_collections():
+        raise HTTPException(status_code=400, detail=f"Unknown catalog collection: {name}")
+
+
 @app.post("/generate", response_model=GenerateResponse, responses={500: {"model": ErrorResponse}})
-def generate(request: GenerateRequest):
-    """Take a natural language prompt and return a structured query."""
+def generate(request: GenerateRequest, x_profile_token: str | None = Header(default=None)):
+    """Take a natural language prompt and return a structured query.
+
+    The response is built from the already validated plan and serialized
+    once, bypassing FastAPI's response-model re-validation.
+    """
+    _check_collection(request.collection)
+    if not should_profile(x_profile_token):
+        return FastJSONResponse(_generate(request))
+
+    profiler = profile_current_thread().start()
     try:
-        plan = generate_plan(request.prompt, request.options or None)
-        message = build_message(plan)
-        return build_response(plan, message)
+        result = _generate(request)
+    finally:
+        profiler.stop()
+        name = save_profile(profiler, {"endpoint": "/generate", "prompt": request.prompt})
+    return FastJSONResponse(result, headers={"X-Profile-Id": name})
+
+
+def _generate(request: GenerateRequest) -> GenerateResponse:
+    start = time.perf_counter()
+    stats: dict = {}
+    try:
+        with use_collection(request.collection):
+            plan = generate_plan(request.prompt, request.options or None, stats=stats)
+            message = build_message(plan)
+            result = build_response(plan, message, include_plan=request.include_plan)
     except Exception as e:
         logger.exception("Failed to generate query")
         raise HTTPException(status_code=500, detail=str(e))
 
+    generation_log.append({
+        "ts": time.time(),
+        "prompt": request.prompt,
+        "options": request.options,
+        "collection": request.collection,
+        "model": stats.get("model", settings.litellm_model),
+        "output_format": stats.get("output_format"),
+        "skeleton": stats.get("skeleton"),
+        "plan": _generated_plan(plan, stats),  # Serialized by the writer thread
+        "step_count": len(plan.steps),
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "llm_latency_ms": stats.get("llm_latency_ms"),
+        "prompt_tokens": stats.get("prompt_tokens"),
+        "completion_tokens": stats.get("completion_tokens"),
+        "cache_hit": stats.get("cache_hit", False),
+        "cache": stats.get("cache"),
+    })
+    return result
+
+
+def _generated_plan(plan: QueryPlan, stats: dict) -> QueryPlan:
+    """The plan as generated, before post-generation options were applied to it.
+
+    This is what the plan cache holds, so the log can warm the cache and feed
+    training without one request's post_count or dates leaking into another.
+    """
+    replaced = stats.get("replaced_metadata")
+    if not replaced:
+        return plan
+    return plan.model_copy(update={"metadata": plan.metadata.model_copy(update=replaced)})
+
+
+@app.post("/generate/refine", response_model=PlanResponse, responses={500: {"model": ErrorResponse}})
+def refine(request: RefineRequest):
+    """Edit a previously generated plan according to an instruction.
+
+    The LLM returns only the changed steps, so this is much cheaper than
+    generating the plan again from a new prompt.
+    """
+    _check_collection(request.collection)
+    start = time.perf_counter()
+    stats: dict = {}
+    try:
+        with use_collection(request.collection):
+            plan = refine_plan(request.plan, request.instruction, request.options or None, stats=stats)
+            message = build_message(plan)
+            result = build_response(plan, message, include_plan=True)
+    except Exception as e:
+        logger.exception("Failed to refine query")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    generation_log.append({
+        "ts": time.time(),
+        "kind": "refine",
+        "prompt": request.instruction,
+        "base_plan": request.plan,
+        "options": request.options,
+        "collection": request.collection,
+        "model": stats.get("model", settings.litellm_model),
+        "plan": plan,
+        "step_count": len(plan.steps),
+        "patch_ops": stats.get("patch_ops"),
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "llm_latency_ms": stats.get("llm_latency_ms"),
+        "prompt_tokens": stats.get("prompt_tokens"),
+        "completion_tokens": stats.get("completion_tokens"),
+    })
+    return FastJSONResponse(result)
+
 
 @app.post("/feedback", response_model=FeedbackResponse)
 def feedback(request: FeedbackRequest):
@@ -72,7 +235,98 @@ def feedback(request: FeedbackRequest):
     return FeedbackResponse(success=True, id=log.id)
 
 
+def _split_fields(value: str | None) -> tuple[str, ...] | None:
+    if value is None:
+        return None
+    return tuple(f for f in (part.strip() for part in value.split(",")) if f)
+
+
 @app.get("/services")
-def services():
-    """Return the available service catalog."""
-    return {"services": list_categories()}
+def services(
+    fields: str | None = Query(default=None, description="Comma-separated category fields: category, initiators, services"),
+    service_fields: str | None = Query(default=None, description="Comma-separated keys to keep on each service"),
+    offset: int = Query(default=0, ge=0),
+    limit: int | None = Query(default=None, ge=1),
+    collection: str | None = Query(default=None, description="Catalog collection (default: QDRANT_COLLECTION)"),
+    accept_encoding: str | None = Header(default=None),
+    if_none_match: str | None = Header(default=None),
+):
+    """Return the available service catalog.
+
+    The body is serialized and compressed once per catalog version; clients
+    that send back the ETag get a 304. ``fields``, ``service_fields`` and
+    ``offset``/``limit`` let light clients skip the heavy service payloads.
+    The ``X-Catalog-Version`` header is the version to pass to
+    ``/services/changes`` afterwards.
+    """
+    category_fields = _split_fields(fields)
+    if category_fields is not None:
+        unknown = set(category_fields) - set(CATEGORY_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    _check_collection(collection)
+    with use_collection(collection):
+        body = get_services_body(category_fields, _split_fields(service_fields), offset, limit)
+    encoding = choose_encoding(accept_encoding)
+    headers = {
+        "ETag": body.etag_for(encoding),
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache",
+        "X-Catalog-Version": str(body.version),
+    }
+    if body.matches(if_none_match):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body.encoded(encoding), media_type="application/json", headers=headers)
+
+
+@app.get("/services/changes")
+def services_changes(
+    since: int = Query(ge=0, description="X-Catalog-Version of the client's copy"),
+    collection: str | None = Query(default=None, description="Catalog collection (default: QDRANT_COLLECTION)"),
+):
+    """Return the services added, modified and removed since catalog version ``since``.
+
+    If ``since`` is older than the kept history the response is
+    ``{"version", "resync": true}`` and the client should re-fetch ``/services``.
+    """
+    _check_collection(collection)
+    with use_collection(collection):
+        return FastJSONResponse(get_catalog_changes(since))
+
+
+@app.get("/services/search")
+def services_search(
+    q: str = Query(default="", description="Words to match; the last may be a prefix"),
+    initiators: str | None = Query(default=None, description="Comma-separated initiators; services must support one"),
+    limit: int = Query(default=10, ge=1, le=100),
+    collection: str | None = Query(default=None, description="Catalog collection (default: QDRANT_COLLECTION)"),
+):
+    """Return the best matching services (category, name, initiators, description, score)."""
+    _check_collection(collection)
+    with use_collection(collection):
+        return FastJSONResponse(search_services(q, _split_fields(initiators), limit))
+
+
+def _require_profile_token(token: str | None) -> None:
+    if not token_valid(token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Profile-Token")
+
+
+@app.get("/debug/profiles")
+def profiles(x_profile_token: str | None = Header(default=None)):
+    """List captured request profiles, newest first."""
+    _require_profile_token(x_profile_token)
+    return {"profiles": list_profiles()}
+
+
+@app.get("/debug/profiles/{name}", response_class=PlainTextResponse)
+def profile(name: str, x_profile_token: str | None = Header(default=None)):
+    """Return a profile as collapsed stacks (flamegraph.pl / speedscope input)."""
+    _require_profile_token(x_profile_token)
+    folded = read_profile(name)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return folded
@@ -0,0 +1,46 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field, model_validator
+
+
+class CompactStep(BaseModel):
+    """A ``StepPlan`` with short keys; the description is generated locally except for AI steps."""
+
+    t: Literal["service", "scripter", "ai", "ai-image"] = Field(description="step type")
+    c: str | None = Field(default=None, description="service_category (service steps only)")
+    i: str | None = Field(default=None, description="initiator (service steps only)")
+    p: dict = Field(default_factory=dict, description="params")
+    r: list[int] = Field(default_factory=list, description="related step numbers")
+    d: str | None = Field(default=None, description="description (ai and ai-image steps only)")
+
+    @model_validator(mode="after")
+    def _require_ai_description(self):
+        if self.t in ("ai", "ai-image") and not self.d:
+            raise ValueError("d (description) is required for ai and ai-image steps")
+        return self
+
+
+class CompactMetadata(BaseModel):
+    """Metadata that can't be derived from the steps."""
+
+    n: int | None = Field(default=None, description="post_count if not 50")
+    tn: str | None = Field(default=None, description="target_name if not the username searched")
+    ti: str | None = Field(default=None, description="target_id")
+    kw: str | None = Field(default=None, description="keywords if not the searched keywords/hashtags")
+    nt: str | None = Field(default=None, description="narrative_topics")
+    bs: str | None = Field(default=None, description="benchmark_set")
+    df: str | None = Field(default=None, description="date_from")
+    dt: str | None = Field(default=None, description="date_to")
+
+
+class CompactPlan(BaseModel):
+    s: list[CompactStep] = Field(description="steps")
+    m: CompactMetadata = Field(default_factory=CompactMetadata, description="metadata overrides")
+
+    @model_validator(mode="after")
+    def _check_related_steps(self):
+        for number, step in enumerate(self.s, 1):
+            for related in step.r:
+                if not 1 <= related < number:
+                    raise ValueError(f"step {number} references step {related}; r may only list earlier steps")
+        return self
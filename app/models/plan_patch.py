@@ -0,0 +1,29 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
+
+from app.models.compact_plan import CompactMetadata, CompactStep
+
+
+class PatchOp(BaseModel):
+    """One edit to an existing plan. Step numbers refer to the plan before the patch."""
+
+    op: Literal["insert", "replace", "delete"]
+    at: int = Field(description="step to replace/delete, or the step to insert after (0 = at the start)")
+    step: CompactStep | None = Field(default=None, description="new step for insert/replace")
+
+
+class PlanPatch(BaseModel):
+    ops: list[PatchOp] = Field(description="edits, all numbered against the current plan")
+    m: CompactMetadata = Field(default_factory=CompactMetadata, description="metadata to change")
+
+    @model_validator(mode="after")
+    def _check_applies(self, info: ValidationInfo):
+        # When validated with the plan being edited (context={"plan": ...}), reject patches
+        # that don't apply so the LLM is asked to fix them
+        plan = (info.context or {}).get("plan")
+        if plan is not None:
+            from app.services.plan_patch import apply_patch
+
+            apply_patch(plan, self)
+        return self
@@ -1,9 +1,20 @@
 from pydantic import BaseModel, Field
 
+from app.models.step_types import QueryPlan
+
 
 class GenerateRequest(BaseModel):
     prompt: str
     options: dict = Field(default_factory=dict)
+    include_plan: bool = False  # Return the QueryPlan too, e.g. to refine it later
+    collection: str | None = None  # Catalog collection to plan against (default: QDRANT_COLLECTION)
+
+
+class RefineRequest(BaseModel):
+    plan: QueryPlan
+    instruction: str
+    options: dict = Field(default_factory=dict)
+    collection: str | None = None
 
 
 class StepResponse(BaseModel):
@@ -30,6 +41,10 @@ class GenerateResponse(BaseModel):
     step_count: int
 
 
+class PlanResponse(GenerateResponse):
+    plan: QueryPlan
+
+
 class FeedbackRequest(BaseModel):
     user_id: int
     input_prompt: str
@@ -277,11 +277,20 @@ EXAMPLES = [
 ]
 
 
-def get_few_shot_examples() -> str:
-    """Format few-shot examples for the system prompt."""
+def get_few_shot_examples(compact: bool = False) -> str:
+    """Format few-shot examples for the system prompt.
+
+    With ``compact`` the plans are shown in the compact output format.
+    """
+    from app.models.step_types import QueryPlan
+    from app.services.compact_plan import compact_json, compact_plan
+
     lines = ["EXAMPLES:"]
     for i, ex in enumerate(EXAMPLES, 1):
         lines.append(f"\nExample {i}:")
         lines.append(f"User: {ex['input']}")
-        lines.append(f"Plan: {json.dumps(ex['plan'], indent=2)}")
+        if compact:
+            lines.append(f"Plan: {compact_json(compact_plan(QueryPlan.model_validate(ex['plan'])))}")
+        else:
+            lines.append(f"Plan: {json.dumps(ex['plan'], indent=2)}")
     return "\n".join(lines)
@@ -1,5 +1,6 @@
 from app.prompts.few_shot_examples import get_few_shot_examples
-from app.services.catalog import get_services_summary
+from app.services.catalog import catalog_cached, get_services_summary
+from app.services.tracing import span
 
 SYSTEM_PROMPT_TEMPLATE = """You are a query builder for a social media analytics platform.
 
@@ -32,12 +33,104 @@ RULES:
 
 {few_shot_examples}
 
-Generate a QueryPlan for the following user request:"""
+Generate a {plan_model} for the following user request:"""
 
+COMPACT_FORMAT_INSTRUCTIONS = """OUTPUT FORMAT (CompactPlan):
+- s: steps, each with t=type, c=service_category, i=initiator, p=params, r=related step numbers
+- d: description, ONLY for ai and ai-image steps; other descriptions are generated automatically
+- scripter steps set p.operation (normalize steps set p.platform instead)
+- m: metadata, ONLY values that are not already in the steps (n=post_count if not 50,
+  tn=target_name, ti=target_id, kw=keywords, nt=narrative_topics, bs=benchmark_set,
+  df=date_from, dt=date_to); source, target_url and searched keywords are derived from the steps
+- Omit empty and null fields
+"""
 
-def build_system_prompt() -> str:
-    """Build the complete system prompt with catalog and examples."""
-    return SYSTEM_PROMPT_TEMPLATE.format(
-        services_catalog=get_services_summary(),
-        few_shot_examples=get_few_shot_examples(),
-    )
+
+REFINE_PROMPT_TEMPLATE = """You are a query builder for a social media analytics platform.
+
+Your job is to edit an existing multi-step query plan according to the user's change request.
+Return only a PlanPatch with the edits; unchanged steps must not be repeated.
+
+STEP TYPES:
+- [service]: Calls an external data collection service. Must match a service from the catalog below.
+- [scripter]: Executes code-level data processing (normalize, filter, transform, extract fields).
+- [ai]: AI text analysis/filtering (classify, filter by content, detect patterns, summarize).
+- [ai-image]: AI image analysis (object detection, OCR, scene classification, location detection).
+
+{services_catalog}
+
+COMMON SCRIPTER OPERATIONS: normalize (p.platform), sentiment, keywords (p.keywords),
+mentions_target (p.target), narratives (p.narrative_topics)
+
+PLAN FORMAT: the current plan is given as a CompactPlan (s=steps with t=type, c=service_category,
+i=initiator, p=params, r=related step numbers, d=description; m=metadata). Steps are numbered from 1.
+
+PATCH FORMAT (PlanPatch):
+- ops: list of {{op, at, step}}
+  - insert: add `step` after step number `at` (at=0 inserts at the start)
+  - replace: replace step number `at` with `step`
+  - delete: remove step number `at`
+- every step number (`at` and the `r` of new steps) refers to the CURRENT plan; never renumber,
+  numbering and related steps are updated automatically
+- new steps use the CompactPlan step format; d only for ai and ai-image steps
+- m: only metadata values that change (n=post_count, tn=target_name, kw=keywords,
+  nt=narrative_topics, df=date_from, dt=date_to)
+
+EXAMPLES:
+Current plan: {{"s":[{{"t":"service","c":"twitter_posts","i":"keyword","p":{{"keyword":"EV"}}}},{{"t":"scripter","p":{{"platform":"twitter"}},"r":[1]}}]}}
+Change: also add sentiment
+Patch: {{"ops":[{{"op":"insert","at":2,"step":{{"t":"scripter","p":{{"operation":"sentiment"}},"r":[2]}}}}]}}
+
+Current plan: {{"s":[{{"t":"service","c":"twitter_posts","i":"hashtag","p":{{"hashtag":"EV"}}}},{{"t":"scripter","p":{{"platform":"twitter"}},"r":[1]}}]}}
+Change: use TikTok instead and get 200 posts
+Patch: {{"ops":[{{"op":"replace","at":1,"step":{{"t":"service","c":"tiktok_videos","i":"hashtag","p":{{"hashtag":"EV"}}}}}},{{"op":"replace","at":2,"step":{{"t":"scripter","p":{{"platform":"tiktok"}},"r":[1]}}}}],"m":{{"n":200}}}}"""
+
+SKELETON_PROMPT = """You are a query builder for a social media analytics platform.
+
+The user's request has been matched to the plan below, written as compact steps (t=type,
+c=service_category, i=initiator, p=params, r=related steps, d=description) with <slot> placeholders.
+Fill every slot with the value from the request:
+- usernames without the @, hashtags without the #, URLs exactly as written
+- platform: the platform the user asks about
+- keywords, targets and topics as short comma-separated phrases from the request
+
+Set fits=false if the plan doesn't do what the request asks (a step is missing or unwanted, or a
+value the plan needs isn't in the request); the request is then planned from scratch."""
+
+
+def _cached_prompt(kind: str, render) -> str:
+    # Prompts only change when the catalog does, and each collection has its own
+    rendered = []
+
+    def build() -> str:
+        rendered.append(True)
+        return render()
+
+    with span("prompt.build", **{"prompt.kind": kind}) as span_:
+        prompt = catalog_cached(("prompt", kind), build)
+        span_.set_attributes({"prompt.cache_hit": not rendered, "prompt.chars": len(prompt)})
+    return prompt
+
+
+def build_system_prompt(compact: bool = False) -> str:
+    """Build the complete system prompt with catalog and examples.
+
+    With ``compact`` the LLM is asked for a ``CompactPlan`` instead of a
+    ``QueryPlan``. The result is cached per catalog version, so it is
+    rendered once per catalog refresh (or once in the parent process in
+    pre-fork mode).
+    """
+    def render() -> str:
+        examples = get_few_shot_examples(compact=compact)
+        return SYSTEM_PROMPT_TEMPLATE.format(
+            services_catalog=get_services_summary(),
+            few_shot_examples=f"{COMPACT_FORMAT_INSTRUCTIONS}\n{examples}" if compact else examples,
+            plan_model="CompactPlan" if compact else "QueryPlan",
+        )
+
+    return _cached_prompt("compact" if compact else "full", render)
+
+
+def build_refine_prompt() -> str:
+    """Build the system prompt for plan refinement (cached per catalog version)."""
+    return _cached_prompt("refine", lambda: REFINE_PROMPT_TEMPLATE.format(services_catalog=get_services_summary()))
@@ -0,0 +1,143 @@
+"""
+Pre-fork server for production.
+
+``uvicorn --workers N`` spawns fresh interpreters, so every worker imports
+the app and LLM SDKs and loads the catalog on its own. This launcher does
+that work once in the parent instead: it imports the app and the LLM SDKs,
+creates the database schema, loads the catalog snapshot, renders the system
+prompt and the ``/services`` body, then ``gc.freeze()``s the heap and forks
+the workers. The workers share those pages copy-on-write and start serving
+immediately. Each worker
+runs a normal uvicorn server (including the app lifespan) on the shared
+listening socket, and the parent restarts any worker that dies.
+
+The parent starts no threads of its own before forking; background writers
+(generation log, span exporter) are started by each worker's lifespan.
+
+Usage:
+    python -m app.serve --host 127.0.0.1 --port 8100 --workers 2
+    python -m app.serve --no-preload   # fork first, load in each worker
+"""
+
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from app.config import settings
+
+logger = logging.getLogger("app.serve")
+
+_RESTART_BACKOFF = 1.0  # Seconds to wait before restarting a worker that died right after starting
+
+
+def preload():
+    """Build everything a worker needs; return the ASGI app."""
+    started = time.perf_counter()
+    from app.main import app, engine
+    from app.database import init_db
+    from app.prompts.system_prompt import build_system_prompt
+    from app.services.planner import preload_llm_sdk
+    from app.services.services_response import get_services_body
+
+    preload_llm_sdk()
+    init_db(engine)
+    engine.dispose()  # Never share open DB connections across fork
+    try:
+        build_system_prompt()
+        get_services_body().encoded("gzip")
+    except Exception:
+        logger.warning("Catalog preload failed; workers will load it on first use", exc_info=True)
+
+    gc.collect()
+    gc.freeze()  # Keep preloaded objects out of GC passes so their pages stay shared
+    logger.info("Preloaded app in %.2fs", time.perf_counter() - started)
+    return app
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=settings.log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host: str, port: int, workers: int, preload_app: bool = True) -> None:
+    app = preload() if preload_app else "app.main:app"
+    sock = _bind(host, port)
+    children: dict[int, float] = {}
+    stopping = False
+
+    def spawn() -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(app, sock)
+            except BaseException:
+                logger.exception("Worker crashed")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def shutdown(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for _ in range(workers):
+        spawn()
+    logger.info("Serving on %s:%d with %d workers (preload=%s)", host, port, workers, preload_app)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        logger.warning("Worker %d exited with status %d; restarting", pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - started < _RESTART_BACKOFF:
+            time.sleep(_RESTART_BACKOFF)
+        spawn()
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=settings.host)
+    parser.add_argument("--port", type=int, default=settings.port)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--no-preload", dest="preload", action="store_false")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=settings.log_level.upper())
+    serve(args.host, args.port, args.workers, args.preload)
+    sys.exit(0)
@@ -2,8 +2,10 @@ from pathlib import Path
 
 from jinja2 import Environment, FileSystemLoader
 
-from app.models.schemas import GenerateResponse, ParamsResponse, StepResponse
+from app.models.schemas import GenerateResponse, ParamsResponse, PlanResponse, StepResponse
 from app.models.step_types import QueryPlan, StepPlan
+from app.services.catalog import find_service
+from app.services.tracing import span
 
 _TEMPLATES_DIR = Path(__file__).parent.parent / "prompts" / "templates"
 _jinja_env = Environment(
@@ -16,28 +18,100 @@ _jinja_env = Environment(
 TEMPLATED_OPERATIONS = {"normalize", "sentiment", "keywords", "mentions_target", "narratives"}
 
 
+_TEMPLATE_MAP = {
+    "normalize": "normalize.j2",
+    "sentiment": "sentiment.j2",
+    "keywords": "keywords.j2",
+    "mentions_target": "target_check.j2",
+    "narratives": "narratives.j2",
+}
+
+# Display names for the platform prefix of service categories (twitter_posts -> Twitter posts)
+PLATFORM_NAMES = {
+    "facebook": "Facebook",
+    "instagram": "Instagram",
+    "linkedin": "LinkedIn",
+    "reddit": "Reddit",
+    "telegram": "Telegram",
+    "tiktok": "TikTok",
+    "twitter": "Twitter",
+    "youtube": "YouTube",
+}
+
+
+def _render_template(step: StepPlan, step_number: int) -> str:
+    template = _jinja_env.get_template(_TEMPLATE_MAP[step.params["operation"]])
+    return template.render(step=step, step_number=step_number)
+
+
 def _render_step_message(step: StepPlan, step_number: int) -> str:
     """Render a single step into its message line."""
     operation = step.params.get("operation", "")
 
     # For scripter steps with known templates, use Jinja2
     if step.type == "scripter" and operation in TEMPLATED_OPERATIONS:
-        template_map = {
-            "normalize": "normalize.j2",
-            "sentiment": "sentiment.j2",
-            "keywords": "keywords.j2",
-            "mentions_target": "target_check.j2",
-            "narratives": "narratives.j2",
-        }
-        template = _jinja_env.get_template(template_map[operation])
-        description = template.render(step=step, step_number=step_number)
+        description = _render_template(step, step_number)
     else:
         description = step.description
 
     return f"{step_number}. [{step.type}] {description}"
 
 
-def _format_related_steps(related: list[int]) -> str:
+def _describe_service(step: StepPlan) -> str:
+    value = step.params.get(step.initiator) if step.initiator else None
+    platform, _, kind = (step.service_category or "").partition("_")
+
+    if platform in PLATFORM_NAMES and kind:
+        subject = f"{PLATFORM_NAMES[platform]} {kind.replace('_', ' ')}"
+        if value is None:
+            return f"Scrap {subject}"
+        if step.initiator == "url":
+            return f"Scrap {subject} from: {value}"
+        if step.initiator == "keyword":
+            return f"Search {subject} with keyword: {value}"
+        if step.initiator == "hashtag":
+            return f"Scrap {subject} associated with hashtags: #{str(value).lstrip('#')}"
+        if step.initiator == "username":
+            return f"Scrap {subject} from user: @{str(value).lstrip('@')}"
+        return f"Scrap {subject} by {step.initiator}: {value}"
+
+    try:
+        service = find_service(step.service_category, step.initiator) if step.service_category else None
+    except Exception:
+        # Descriptions are cosmetic; don't fail the plan if the catalog is unreachable
+        service = None
+    name = service["name"] if service else (step.service_category or "service").replace("_", " ")
+    if value is None:
+        return f"Run {name}"
+    return f"Run {name} for {step.initiator}: {value}"
+
+
+def describe_step(step: StepPlan, step_number: int) -> str:
+    """Generate a step description from its type, category, initiator and params.
+
+    Used when the plan came from the compact output format, where the LLM
+    only writes descriptions for ``ai``/``ai-image`` steps.
+    """
+    if step.type == "service":
+        description = _describe_service(step)
+    elif step.type == "scripter":
+        operation = step.params.get("operation", "")
+        if operation in TEMPLATED_OPERATIONS:
+            description = _render_template(step, step_number)
+        elif "platform" in step.params:
+            platform = str(step.params["platform"])
+            description = f"Normalize {PLATFORM_NAMES.get(platform, platform)} data to standard format."
+        else:
+            description = f"Run {operation or 'data processing'} on the collected data"
+    else:
+        description = step.description or "Analyze the collected data"
+
+    if step.related_steps:
+        description = description.rstrip(".") + "." + format_related_steps(step.related_steps)
+    return description
+
+
+def format_related_steps(related: list[int]) -> str:
     """Format related steps reference string."""
     if not related:
         return ""
@@ -52,44 +126,57 @@ def build_message(plan: QueryPlan) -> str:
 
     Deterministic assembly - no LLM calls.
     """
-    lines = []
-    for i, step in enumerate(plan.steps, 1):
-        line = _render_step_message(step, i)
+    with span("assembler.build_message", **{"plan.step_count": len(plan.steps)}):
+        lines = []
+        for i, step in enumerate(plan.steps, 1):
+            line = _render_step_message(step, i)
 
-        # Ensure related steps reference is in the description if not already
-        if step.related_steps:
-            related_str = _format_related_steps(step.related_steps)
-            if "Related step" not in line:
-                line = line.rstrip(".") + "." + related_str
+            # Ensure related steps reference is in the description if not already
+            if step.related_steps:
+                related_str = format_related_steps(step.related_steps)
+                if "Related step" not in line:
+                    line = line.rstrip(".") + "." + related_str
 
-        lines.append(line)
+            lines.append(line)
 
-    return "\n".join(lines)
+        return "\n".join(lines)
 
 
-def build_response(plan: QueryPlan, message: str) -> GenerateResponse:
+def build_response(plan: QueryPlan, message: str, include_plan: bool = False) -> GenerateResponse:
     """Build the full API response from a plan and assembled message."""
-    steps = []
-    for i, step in enumerate(plan.steps, 1):
-        steps.append(StepResponse(
+    with span("assembler.build_response", **{"plan.step_count": len(plan.steps)}):
+        return _build_response(plan, message, include_plan)
+
+
+def _build_response(plan: QueryPlan, message: str, include_plan: bool) -> GenerateResponse:
+    # The plan is already validated, so the response models are constructed
+    # without running validation a second time
+    steps = [
+        StepResponse.model_construct(
             number=i,
             type=step.type,
             service_category=step.service_category,
             initiator=step.initiator,
             description=step.description,
-        ))
+        )
+        for i, step in enumerate(plan.steps, 1)
+    ]
 
-    params = ParamsResponse(
+    params = ParamsResponse.model_construct(
         source=plan.metadata.source,
         target_name=plan.metadata.target_name,
         target_url=plan.metadata.target_url,
+        attributes=None,
         narrative_topics=plan.metadata.narrative_topics,
     )
 
-    return GenerateResponse(
-        success=True,
-        message=message,
-        steps=steps,
-        params=params,
-        step_count=len(steps),
-    )
+    fields = {
+        "success": True,
+        "message": message,
+        "steps": steps,
+        "params": params,
+        "step_count": len(steps),
+    }
+    if include_plan:
+        return PlanResponse.model_construct(**fields, plan=plan)
+    return GenerateResponse.model_construct(**fields)
@@ -1,18 +1,186 @@
+"""Service catalog loaded from Qdrant.
+
+One deployment can serve several catalogs: every collection named in
+``settings.qdrant_collections`` (plus the default ``qdrant_collection``)
+can be selected per request with ``use_collection``. Each collection is
+loaded on first use and kept with its own refresh/backoff state and the
+artefacts derived from it (prompts, indexes, ``/services`` bodies, see
+``catalog_cached``) in an LRU bounded by ``catalog_memory_budget_mb``.
+Collections expire after ``_CACHE_TTL``; a background thread refreshes
+the hot ones before they do, so only cold collections are refreshed on
+the request path.
+"""
+
 import logging
+import threading
 import time
-from collections import defaultdict
-from typing import Optional
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Optional
 
 import httpx
 
 from app.config import settings
+from app.services.catalog_changes import CatalogHistory, catalog_version, diff_catalogs
+from app.services.catalog_records import RecordBuilder, catalog_nbytes, compact_catalog, derived_nbytes
+from app.services.tracing import span
 
 logger = logging.getLogger(__name__)
 
-_CATALOG: Optional[dict] = None
-_CATALOG_LOADED_AT: float = 0
 _CACHE_TTL: int = 300  # 5 minutes
 
+_SELECTED: ContextVar[Optional[str]] = ContextVar("catalog_collection", default=None)
+
+
+class CatalogUnavailableError(RuntimeError):
+    """Raised without contacting Qdrant while the circuit is open and there is no catalog to serve."""
+
+
+class UnknownCollectionError(ValueError):
+    """Raised when a request selects a collection that isn't configured."""
+
+
+class _RefreshState:
+    """Failure tracking for catalog refreshes: exponential backoff plus a circuit breaker.
+
+    After a failed refresh the next attempt waits ``base * 2**(failures - 1)``
+    seconds (capped at the maximum); until then a stale catalog is served
+    without contacting Qdrant. After ``circuit_threshold`` consecutive
+    failures the circuit opens: with no catalog loaded yet, callers fail
+    fast instead of each waiting for Qdrant to time out. Once the backoff
+    expires a single caller probes Qdrant (half-open); success closes the
+    circuit.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()  # Held by the one thread refreshing
+        self.reset()
+
+    def reset(self) -> None:
+        self.failures = 0
+        self.total_failures = 0
+        self.next_attempt_at = 0.0
+        self.last_error: str | None = None
+        self.last_failure_at: float | None = None  # Wall clock, for display
+        self.last_success_at: float | None = None
+
+    def in_backoff(self, now: float) -> bool:
+        return self.failures > 0 and now < self.next_attempt_at
+
+    @property
+    def circuit_open(self) -> bool:
+        return self.failures >= settings.catalog_circuit_threshold
+
+    def record_failure(self, now: float, error: Exception) -> float:
+        self.failures += 1
+        self.total_failures += 1
+        delay = min(settings.catalog_backoff_max, settings.catalog_backoff_base * 2 ** (self.failures - 1))
+        self.next_attempt_at = now + delay
+        self.last_error = f"{type(error).__name__}: {error}"
+        self.last_failure_at = time.time()
+        return delay
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.next_attempt_at = 0.0
+        self.last_success_at = time.time()
+
+
+class _Collection:
+    """One collection's catalog, its refresh state and the artefacts derived from it."""
+
+    __slots__ = ("name", "catalog", "loaded_at", "version", "refresh", "derived", "nbytes", "uses", "history")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.catalog: Optional[dict] = None
+        self.loaded_at = 0.0
+        self.version = 0  # Hash of the loaded catalog's content (see catalog_version)
+        self.refresh = _RefreshState()
+        self.derived: dict = {}  # catalog_cached() values for this version
+        self.nbytes = 0
+        self.uses = 0  # Lookups since the last refresh; decides background refresh
+        self.history: Optional[CatalogHistory] = None  # Created by the first load
+
+    def memory_nbytes(self) -> int:
+        """Approximate memory held by the catalog's records and everything derived from them."""
+        return self.nbytes + sum(derived_nbytes(value) for value in list(self.derived.values()))
+
+
+_COLLECTIONS: "OrderedDict[str, _Collection]" = OrderedDict()  # Least recently used first
+_COLLECTIONS_LOCK = threading.Lock()
+_EVICTIONS = 0
+
+
+def available_collections() -> list[str]:
+    """Return the collections requests may select, the default first."""
+    extra = [name.strip() for name in settings.qdrant_collections.split(",") if name.strip()]
+    return [settings.qdrant_collection] + [name for name in extra if name != settings.qdrant_collection]
+
+
+def current_collection() -> str:
+    """Return the collection catalog lookups in this context are served from."""
+    return _SELECTED.get() or settings.qdrant_collection
+
+
+@contextmanager
+def use_collection(name: Optional[str]) -> Iterator[None]:
+    """Serve catalog lookups in this context from collection ``name`` (None: the default)."""
+    if name is not None and name not in available_collections():
+        raise UnknownCollectionError(f"Unknown catalog collection: {name}")
+    token = _SELECTED.set(name)
+    try:
+        yield
+    finally:
+        _SELECTED.reset(token)
+
+
+def _collection(name: Optional[str] = None) -> _Collection:
+    name = name or current_collection()
+    entry = _COLLECTIONS.get(name)
+    if entry is None:
+        with _COLLECTIONS_LOCK:
+            entry = _COLLECTIONS.get(name)
+            if entry is None:
+                entry = _COLLECTIONS[name] = _Collection(name)
+    else:
+        try:
+            _COLLECTIONS.move_to_end(name)
+        except KeyError:  # Evicted meanwhile; this lookup still uses the entry it got
+            pass
+    entry.uses += 1  # Approximate under concurrency; only compared with catalog_hot_uses
+    return entry
+
+
+def _evict_over_budget(keep: _Collection) -> None:
+    """Drop least recently used collections until the loaded ones fit the memory budget.
+
+    Collections that have no catalog hold next to nothing and are kept, so
+    a collection failing to load doesn't lose its backoff state.
+    """
+    global _EVICTIONS
+    budget = settings.catalog_memory_budget_mb * 2**20
+    with _COLLECTIONS_LOCK:
+        # A snapshot: _collection() reorders the registry without the lock
+        entries = list(_COLLECTIONS.items())
+    sizes = {name: entry.memory_nbytes() for name, entry in entries}
+    total = sum(sizes.values())
+    with _COLLECTIONS_LOCK:
+        for name, entry in entries:
+            if total <= budget:
+                break
+            if entry is keep or entry.catalog is None:
+                continue
+            if _COLLECTIONS.get(name) is not entry:  # Evicted meanwhile
+                total -= sizes[name]
+                continue
+            del _COLLECTIONS[name]
+            total -= sizes[name]
+            _EVICTIONS += 1
+            logger.info("Evicted catalog %s (%.1f MB) to stay within the memory budget", name, sizes[name] / 2**20)
+
 
 def _qdrant_scroll(collection: str, limit: int = 100, offset=None) -> tuple[list, Optional[str]]:
     """Scroll points from Qdrant using the REST API directly (bypasses qdrant-client IPv4 issues)."""
@@ -25,26 +193,31 @@ def _qdrant_scroll(collection: str, limit: int = 100, offset=None) -> tuple[list
     if offset is not None:
         body["offset"] = offset
 
-    resp = httpx.post(url, json=body, headers=headers, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()["result"]
+    with span("qdrant.scroll", **{"qdrant.collection": collection, "qdrant.limit": limit}) as span_:
+        resp = httpx.post(url, json=body, headers=headers, timeout=30)
+        resp.raise_for_status()
+        data = resp.json()["result"]
+        span_.set_attribute("qdrant.points", len(data["points"]))
     return data["points"], data.get("next_page_offset")
 
 
-def _fetch_catalog_from_qdrant() -> dict:
-    """Scroll all points from the Qdrant collection and group by category.
+def _fetch_catalog_from_qdrant(collection: Optional[str] = None) -> dict:
+    """Scroll all points from a Qdrant collection (default: ``settings.qdrant_collection``) and group by category.
 
     Each Qdrant point stores service fields under ``payload.metadata`` with a
     singular ``initiator`` string.  Each point is its own service entry
     (different points may have different sample_input, description, or even
     category), so we convert ``initiator`` -> ``initiators`` list and group
-    by category.
+    by category. Services are compacted into ``ServiceRecord``s page by page
+    so the full payload dicts never pile up.
     """
-    grouped: dict[str, list[dict]] = defaultdict(list)
+    collection = collection or settings.qdrant_collection
+    grouped: dict[str, list] = defaultdict(list)
+    builder = RecordBuilder()
     offset = None
 
     while True:
-        results, next_offset = _qdrant_scroll(settings.qdrant_collection, limit=100, offset=offset)
+        results, next_offset = _qdrant_scroll(collection, limit=100, offset=offset)
 
         for point in results:
             payload = point.get("payload", {})
@@ -57,7 +230,7 @@ def _fetch_catalog_from_qdrant() -> dict:
                 if k not in ("category", "initiator", "source", "blobType", "loc")
             }
             service["initiators"] = [initiator] if initiator else []
-            grouped[category].append(service)
+            grouped[category].append(builder.build(service))
 
         if next_offset is None:
             break
@@ -72,26 +245,229 @@ def _fetch_catalog_from_qdrant() -> dict:
     return catalog
 
 
-def _load_catalog() -> dict:
-    global _CATALOG, _CATALOG_LOADED_AT
-
+def _load_catalog(entry: Optional[_Collection] = None) -> dict:
+    entry = entry or _collection()
+    catalog = entry.catalog
     now = time.monotonic()
-    if _CATALOG is not None and (now - _CATALOG_LOADED_AT) < _CACHE_TTL:
-        return _CATALOG
+    if catalog is not None and (now - entry.loaded_at) < _CACHE_TTL:
+        return catalog
+
+    refresh = entry.refresh
+    if refresh.in_backoff(now):
+        if catalog is not None:
+            return catalog
+        if refresh.circuit_open:
+            retry_in = refresh.next_attempt_at - now
+            raise CatalogUnavailableError(
+                f"Service catalog {entry.name} unavailable ({refresh.last_error}); next attempt in {retry_in:.0f}s"
+            )
+
+    failures = refresh.total_failures
+    if catalog is not None:
+        # Another thread is already refreshing: serve the stale catalog meanwhile
+        if not refresh.lock.acquire(blocking=False):
+            return catalog
+    else:
+        refresh.lock.acquire()
+    try:
+        if entry.catalog is not None and (time.monotonic() - entry.loaded_at) < _CACHE_TTL:
+            return entry.catalog
+        if entry.catalog is None and refresh.total_failures != failures and refresh.in_backoff(time.monotonic()):
+            # The load this thread waited for just failed: share its outcome instead of queueing another
+            raise CatalogUnavailableError(f"Service catalog {entry.name} unavailable ({refresh.last_error})")
+        return _refresh_catalog(entry)
+    finally:
+        refresh.lock.release()
+
+
+def _refresh_catalog(entry: _Collection, raise_errors: bool = False) -> dict:
+    """Fetch the collection; on failure serve the stale catalog if there is one (unless ``raise_errors``)."""
+    refresh = entry.refresh
+    try:
+        with span("catalog.refresh", **{
+            "catalog.collection": entry.name,
+            "catalog.stale_available": entry.catalog is not None,
+            "catalog.consecutive_failures": refresh.failures,
+        }) as span_:
+            catalog = compact_catalog(_fetch_catalog_from_qdrant(entry.name))
+            version = catalog_version(catalog)
+            previous, previous_version = entry.catalog, entry.version
+            unchanged = previous is not None and version == previous_version
+            span_.set_attribute("catalog.changed", not unchanged)
+            if not unchanged:
+                span_.set_attribute("catalog.categories", len(catalog["services"]))
+                diff = diff_catalogs(previous, catalog) if previous is not None else None
+                if diff is not None:
+                    span_.set_attribute("catalog.changed_categories", len(diff))
+    except Exception as e:
+        delay = refresh.record_failure(time.monotonic(), e)
+        if entry.catalog is not None and not raise_errors:
+            logger.warning(
+                "Failed to refresh catalog %s from Qdrant (%d in a row), using stale cache; retrying in %.0fs",
+                entry.name, refresh.failures, delay, exc_info=True,
+            )
+            return entry.catalog
+        logger.error(
+            "Failed to load catalog %s from Qdrant; retrying in %.0fs",
+            entry.name, delay, exc_info=True,
+        )
+        raise
+
+    if unchanged:
+        # Same content: keep the records, their version and everything derived from them
+        entry.loaded_at = time.monotonic()
+        entry.uses = 0
+        refresh.record_success()
+        logger.info("Service catalog %s unchanged in Qdrant", entry.name)
+        return previous
+
+    entry.catalog = catalog
+    entry.loaded_at = time.monotonic()
+    # Record the diff before publishing the version, so a client never gets a version without its changes
+    if diff is None or entry.history is None:  # First load, or a change clients can only get by resyncing
+        entry.history = CatalogHistory(version, settings.catalog_history_size)
+    else:
+        entry.history.record(previous_version, version, diff)
+    entry.version = version
+    entry.derived = {}  # Last, so nothing built from the old catalog or version lands in the new cache
+    entry.nbytes = catalog_nbytes(catalog)
+    entry.uses = 0
+    refresh.record_success()
+    logger.info("Loaded service catalog %s from Qdrant (%d categories)", entry.name, len(catalog["services"]))
+    _evict_over_budget(keep=entry)
+    return catalog
+
 
+def catalog_cached(key: Any, build: Callable[[], Any]) -> Any:
+    """Return ``build()`` for the current collection, cached until its catalog is refreshed.
+
+    Prompts, indexes and response bodies derived from a catalog are kept
+    with it, so they are rebuilt after a refresh, count toward the memory
+    budget and are dropped when the collection is evicted. ``build`` may
+    itself read the catalog.
+    """
+    entry = _collection()
+    _load_catalog(entry)
+    derived = entry.derived
     try:
-        catalog = _fetch_catalog_from_qdrant()
-        _CATALOG = catalog
-        _CATALOG_LOADED_AT = now
-        logger.info("Loaded service catalog from Qdrant (%d categories)", len(catalog["services"]))
-    except Exception:
-        if _CATALOG is not None:
-            logger.warning("Failed to refresh catalog from Qdrant, using stale cache", exc_info=True)
-        else:
-            logger.error("Failed to load catalog from Qdrant and no cache available", exc_info=True)
-            raise
+        return derived[key]
+    except KeyError:
+        value = derived[key] = build()
+    _evict_over_budget(keep=entry)
+    return value
+
+
+def refresh_hot_collections() -> list[str]:
+    """Refresh hot collections that are about to expire; return the names refreshed.
+
+    A collection is hot once it has served ``catalog_hot_uses`` lookups since
+    its last refresh. It is refreshed when it is within one
+    ``catalog_refresh_interval`` of its TTL, so requests keep hitting a
+    fresh catalog. Cold collections are left to refresh on their next use.
+    """
+    refreshed = []
+    with _COLLECTIONS_LOCK:
+        entries = list(_COLLECTIONS.values())
+    for entry in entries:
+        now = time.monotonic()
+        if entry.catalog is None or entry.uses < settings.catalog_hot_uses:
+            continue
+        if now - entry.loaded_at < _CACHE_TTL - settings.catalog_refresh_interval or entry.refresh.in_backoff(now):
+            continue
+        if not entry.refresh.lock.acquire(blocking=False):
+            continue
+        try:
+            loaded_at = entry.loaded_at
+            _refresh_catalog(entry)
+            if entry.loaded_at != loaded_at:
+                refreshed.append(entry.name)
+        finally:
+            entry.refresh.lock.release()
+    return refreshed
+
+
+_refresher: Optional[threading.Thread] = None
+_refresher_stop = threading.Event()
+
+
+def _refresh_loop() -> None:
+    while not _refresher_stop.wait(settings.catalog_refresh_interval):
+        try:
+            refresh_hot_collections()
+        except Exception:
+            logger.exception("Background catalog refresh failed")
+
+
+def start_background_refresh() -> None:
+    """Start the thread refreshing hot collections (no-op if ``catalog_refresh_interval`` is 0)."""
+    global _refresher
+    if settings.catalog_refresh_interval <= 0 or (_refresher is not None and _refresher.is_alive()):
+        return
+    _refresher_stop.clear()
+    _refresher = threading.Thread(target=_refresh_loop, name="catalog-refresh", daemon=True)
+    _refresher.start()
+
+
+def stop_background_refresh(timeout: float = 5.0) -> None:
+    global _refresher
+    if _refresher is None:
+        return
+    _refresher_stop.set()
+    _refresher.join(timeout)
+    _refresher = None
+
+
+def get_catalog_status(collection: Optional[str] = None) -> dict:
+    """Return a collection's freshness and refresh failure/backoff state (for /metrics)."""
+    name = collection or current_collection()
+    entry = _COLLECTIONS.get(name) or _Collection(name)
+    refresh = entry.refresh
+    now = time.monotonic()
+    if refresh.failures == 0:
+        circuit = "closed"
+    elif refresh.circuit_open and refresh.in_backoff(now):
+        circuit = "open"
+    elif refresh.circuit_open:
+        circuit = "half_open"
+    else:
+        circuit = "closed"
+    loaded = entry.catalog is not None
+    return {
+        "collection": name,
+        "loaded": loaded,
+        "version": entry.version,
+        "age_s": round(now - entry.loaded_at, 3) if loaded else None,
+        "stale": loaded and (now - entry.loaded_at) >= _CACHE_TTL,
+        "memory_mb": round(entry.memory_nbytes() / 2**20, 3),
+        "uses_since_refresh": entry.uses,
+        "consecutive_failures": refresh.failures,
+        "total_failures": refresh.total_failures,
+        "backoff_remaining_s": round(max(0.0, refresh.next_attempt_at - now), 3) if refresh.failures else 0.0,
+        "circuit": circuit,
+        "last_error": refresh.last_error,
+        "last_failure_at": refresh.last_failure_at,
+        "last_success_at": refresh.last_success_at,
+    }
+
+
+def get_catalog_cache_stats() -> dict:
+    """Return the state of every cached collection and the memory they hold."""
+    with _COLLECTIONS_LOCK:
+        names = list(_COLLECTIONS)
+    collections = {name: get_catalog_status(name) for name in names}
+    return {
+        "collections": collections,
+        "memory_mb": round(sum(c["memory_mb"] for c in collections.values()), 3),
+        "memory_budget_mb": settings.catalog_memory_budget_mb,
+        "evictions": _EVICTIONS,
+    }
+
 
-    return _CATALOG
+def get_catalog_version() -> int:
+    """Return the version of the current collection's catalog, refreshing it if the TTL expired."""
+    entry = _collection()
+    _load_catalog(entry)
+    return entry.version
 
 
 def get_services_summary() -> str:
@@ -110,8 +486,12 @@ def get_services_summary() -> str:
     return "\n".join(lines)
 
 
-def find_service(category: str, initiator: Optional[str] = None) -> Optional[dict]:
-    """Find a service by category and optional initiator type."""
+def find_service(category: str, initiator: Optional[str] = None) -> Optional[Mapping]:
+    """Find a service by category and optional initiator type.
+
+    The service is a read-only ``ServiceRecord``; its nested fields
+    (``sample_input`` etc.) are decoded when read.
+    """
     catalog = _load_catalog()
 
     for category_group in catalog["services"]:
@@ -128,26 +508,48 @@ def find_service(category: str, initiator: Optional[str] = None) -> Optional[dic
 
 
 def list_categories() -> list[dict]:
-    """Return all service categories with their available initiators."""
-    catalog = _load_catalog()
-    result = []
+    """Return all service categories with their available initiators.
 
-    for category_group in catalog["services"]:
-        all_initiators = set()
-        for svc in category_group["services"]:
-            all_initiators.update(svc["initiators"])
-        result.append({
-            "category": category_group["category"],
-            "services": category_group["services"],
-            "initiators": sorted(all_initiators),
-        })
-
-    return result
-
-
-def reload_catalog() -> None:
-    """Force reload the catalog from Qdrant."""
-    global _CATALOG, _CATALOG_LOADED_AT
-    _CATALOG = None
-    _CATALOG_LOADED_AT = 0
-    _load_catalog()
+    The list is built once per catalog version and shared; don't mutate it.
+    """
+
+    def build() -> list[dict]:
+        result = []
+        for category_group in _load_catalog()["services"]:
+            all_initiators = set()
+            for svc in category_group["services"]:
+                all_initiators.update(svc["initiators"])
+            result.append({
+                "category": category_group["category"],
+                "services": category_group["services"],
+                "initiators": sorted(all_initiators),
+            })
+        return result
+
+    return catalog_cached("categories", build)
+
+
+def reload_catalog(collection: Optional[str] = None) -> None:
+    """Force reload a collection's catalog from Qdrant, ignoring any refresh backoff."""
+    entry = _collection(collection)
+    entry.refresh.reset()
+    with entry.refresh.lock:
+        _refresh_catalog(entry, raise_errors=True)
+
+
+def get_catalog_changes(since: int) -> dict:
+    """Return the current collection's changes since version ``since`` (the ``/services/changes`` body).
+
+    ``{"version", "since", "changes": {category: {"added", "modified",
+    "removed"}}}``; ``removed`` entries only carry the service's name and
+    initiators. If ``since`` is outside the history window the body is
+    ``{"version", "resync": true}`` and the client should fetch ``/services``.
+    """
+    entry = _collection()
+    _load_catalog(entry)
+    version = entry.version
+    history = entry.history
+    changes = history.changes_since(since, version) if history is not None else None
+    if changes is None:
+        return {"version": version, "resync": True}
+    return {"version": version, "since": since, "changes": changes}
@@ -0,0 +1,157 @@
+"""Catalog change feed: per-version diffs for incremental client sync.
+
+Clients mirroring the catalog fetch ``/services`` once, remember its
+version and then poll ``/services/changes?since=<version>``. A version is
+a hash of the catalog's content, so every worker (and a restarted server)
+gives the same catalog the same version. Each refresh that changes the
+catalog records which services were added, removed or modified per
+category; a refresh that changes nothing keeps the version and records
+nothing, so polling a stable catalog returns an empty delta. Only the last
+``catalog_history_size`` changes are kept: a client whose version is not
+among them (older than that window, or never seen by this worker, e.g.
+after the collection was evicted or the server restarted) is told to
+resync from ``/services``.
+
+Services are identified within their category by name and initiators.
+Several Qdrant points may share both; a change to such services can't be
+expressed as a delta, so it resets the history and clients resync.
+"""
+
+import hashlib
+from collections import deque
+from collections.abc import Mapping
+from typing import Optional
+
+from app.services.catalog_records import ServiceRecord
+
+ServiceKey = tuple[str, tuple[str, ...]]
+Change = tuple[str, Optional[Mapping]]  # ("added" | "modified" | "removed", service or None)
+
+
+def catalog_version(catalog: dict) -> int:
+    """Return the version of a compacted catalog: a hash of its content.
+
+    53 bits, so it is exact as a JSON number in any client.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for group in catalog["services"]:
+        digest.update(repr(group["category"]).encode())
+        for service in group["services"]:
+            digest.update(service.encode())
+    return int.from_bytes(digest.digest(), "big") >> 11
+
+
+def service_key(service: Mapping) -> ServiceKey:
+    return service["name"], tuple(service["initiators"])
+
+
+def _same(a: Mapping, b: Mapping) -> bool:
+    if isinstance(a, ServiceRecord) and isinstance(b, ServiceRecord):
+        return a.same_as(b)
+    return dict(a) == dict(b)
+
+
+def _by_key(services) -> Optional[dict[ServiceKey, Mapping]]:
+    """Return the services by key, or None if two of them share a key."""
+    keyed = {service_key(s): s for s in services}
+    return keyed if len(keyed) == len(services) else None
+
+
+def diff_catalogs(old: dict, new: dict) -> Optional[dict[str, dict[ServiceKey, Change]]]:
+    """Return ``{category: {service key: change}}`` for the services that differ between two catalogs.
+
+    None if services sharing a key changed: the change can't be told apart per service.
+    """
+    old_groups = {group["category"]: group["services"] for group in old["services"]}
+    new_groups = {group["category"]: group["services"] for group in new["services"]}
+    diff = {}
+    for category in old_groups.keys() | new_groups.keys():
+        old_services, new_services = old_groups.get(category, ()), new_groups.get(category, ())
+        before, after = _by_key(old_services), _by_key(new_services)
+        if before is None or after is None:
+            if len(old_services) != len(new_services) or not all(map(_same, old_services, new_services)):
+                return None
+            continue
+        changed: dict[ServiceKey, Change] = {key: ("removed", None) for key in before.keys() - after.keys()}
+        for key, service in after.items():
+            previous = before.get(key)
+            if previous is None:
+                changed[key] = ("added", service)
+            elif not _same(previous, service):
+                changed[key] = ("modified", service)
+        if changed:
+            diff[category] = changed
+    return diff
+
+
+class CatalogHistory:
+    """The diffs of one collection's recent versions.
+
+    Versions are hashes, so they are matched rather than ordered: a delta
+    merges the diffs recorded after the client's version last appeared.
+    """
+
+    def __init__(self, base_version: int, max_size: int):
+        self.base_version = base_version  # Oldest version a delta can be computed from
+        self._diffs: deque[tuple[int, int, dict]] = deque()  # (previous version, version, diff)
+        self._max_size = max_size
+
+    def record(self, previous_version: int, version: int, diff: dict) -> None:
+        # Kept even if empty (e.g. reordered categories), so the new version links to the previous one
+        self._diffs.append((previous_version, version, diff))
+        while len(self._diffs) > self._max_size:
+            self.base_version = self._diffs.popleft()[1]
+
+    def changes_since(self, since: int, current_version: int) -> Optional[dict]:
+        """Return the changes from version ``since`` to now, or None if ``since`` is outside the window."""
+        diffs = list(self._diffs)
+        versions = [self.base_version] + [version for _, version, _ in diffs]
+        # Latest occurrences: a catalog changed back to an earlier state gets that state's version again.
+        # The current version may trail the last diff while a refresh is being published.
+        end = _last_index(versions, current_version, len(versions))
+        start = _last_index(versions, since, end + 1) if end is not None else None
+        if start is None:
+            return None
+        merged: dict[str, dict[ServiceKey, Change]] = {}
+        for _, _, diff in diffs[start:end]:
+            for category, changed in diff.items():
+                states = merged.setdefault(category, {})
+                for key, change in changed.items():
+                    state = _merge(states.get(key), change)
+                    if state is None:
+                        states.pop(key, None)
+                    else:
+                        states[key] = state
+        return {
+            category: _render(states) for category, states in sorted(merged.items()) if states
+        }
+
+    def __len__(self) -> int:
+        return len(self._diffs)
+
+
+def _last_index(versions: list[int], version: int, stop: int) -> Optional[int]:
+    for i in range(stop - 1, -1, -1):
+        if versions[i] == version:
+            return i
+    return None
+
+
+def _merge(state: Optional[Change], change: Change) -> Optional[Change]:
+    """Fold a later change of a service into its net change since the client's version (None: no change)."""
+    if state is None:
+        return change
+    if change[0] == "removed":
+        return None if state[0] == "added" else change
+    # The client has the service unless it was added after its version
+    return ("added" if state[0] == "added" else "modified", change[1])
+
+
+def _render(states: dict) -> dict:
+    result: dict[str, list] = {"added": [], "modified": [], "removed": []}
+    for (name, initiators), (op, service) in states.items():
+        if op == "removed":
+            result["removed"].append({"name": name, "initiators": list(initiators)})
+        else:
+            result[op].append(dict(service))
+    return {op: items for op, items in result.items() if items}
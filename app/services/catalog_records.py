@@ -0,0 +1,162 @@
+"""Compact in-memory representation of the service catalog.
+
+Every worker keeps the whole catalog, but the request path (prompt
+summary, ``find_service``, plan validation) only reads each service's
+name and initiators. A plain dict per service also carries its large
+nested payload fields (``sample_input``, ``output_mapping``,
+``pagination``) as Python objects, which dominate the footprint at tens
+of thousands of services.
+
+``ServiceRecord`` stores a service as a tuple of values plus a key layout
+shared by every service with the same keys. Nested (dict/list) values are
+kept as their encoded JSON bytes and decoded on access, category and
+initiator strings are interned, and initiators are a tuple. Records are
+read-only ``Mapping``s, so code written against the old dicts keeps
+working; ``dict(record)`` gives the fully decoded service.
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Iterator
+
+from app.services.serialization import dumps, loads
+
+# Scalar string fields shared by many services
+_INTERNED_FIELDS = ("type",)
+
+
+class _Layout:
+    """Key order of a group of records and which positions hold encoded JSON."""
+
+    __slots__ = ("keys", "index", "encoded")
+
+    def __init__(self, keys: tuple[str, ...], encoded: frozenset[int]):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+        self.encoded = encoded
+
+
+class ServiceRecord(Mapping):
+    """Read-only service entry; nested fields are decoded from JSON bytes on access."""
+
+    __slots__ = ("_layout", "_values")
+
+    def __init__(self, layout: _Layout, values: tuple):
+        self._layout = layout
+        self._values = values
+
+    def __getitem__(self, key: str) -> Any:
+        index = self._layout.index[key]
+        value = self._values[index]
+        if index in self._layout.encoded:
+            return loads(value)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._layout.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout.keys)
+
+    def __len__(self) -> int:
+        return len(self._layout.keys)
+
+    def __repr__(self) -> str:
+        return f"ServiceRecord(name={self.get('name')!r}, initiators={self.get('initiators')!r})"
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this record (interned and shared strings excluded)."""
+        size = sys.getsizeof(self) + sys.getsizeof(self._values)
+        for key, value in zip(self._layout.keys, self._values):
+            if key not in _INTERNED_FIELDS:
+                size += sys.getsizeof(value)
+        return size
+
+    def same_as(self, other: "ServiceRecord") -> bool:
+        """Compare with another record without decoding nested fields."""
+        return self._layout.keys == other._layout.keys and self._values == other._values
+
+    def encode(self) -> bytes:
+        """Return a stable encoding of the record (the same in every process), without decoding nested fields."""
+        return repr((self._layout.keys, self._values)).encode()
+
+    def raw(self, key: str) -> Any:
+        """Return the stored value: encoded JSON bytes for nested fields, without decoding."""
+        return self._values[self._layout.index[key]]
+
+
+class RecordBuilder:
+    """Builds ``ServiceRecord``s for one catalog, sharing layouts between records."""
+
+    def __init__(self):
+        self._layouts: dict[tuple, _Layout] = {}
+
+    def build(self, service: Mapping) -> ServiceRecord:
+        if isinstance(service, ServiceRecord):
+            return service
+        keys = []
+        values = []
+        encoded = []
+        for key, value in service.items():
+            key = sys.intern(key)
+            if key == "initiators":
+                value = tuple(sys.intern(i) for i in value)
+            elif isinstance(value, (dict, list)):
+                encoded.append(len(values))
+                # Copy: orjson's result can keep its over-allocated write buffer
+                value = bytes(memoryview(dumps(value)))
+            elif key in _INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            keys.append(key)
+            values.append(value)
+        layout_key = (tuple(keys), tuple(encoded))
+        layout = self._layouts.get(layout_key)
+        if layout is None:
+            layout = self._layouts[layout_key] = _Layout(layout_key[0], frozenset(encoded))
+        return ServiceRecord(layout, tuple(values))
+
+
+def compact_catalog(catalog: dict) -> dict:
+    """Return ``catalog`` (``_fetch_catalog_from_qdrant`` format) with services as ``ServiceRecord``s.
+
+    Categories are interned and each category's services become a tuple.
+    Services that already are records are kept as they are.
+    """
+    builder = RecordBuilder()
+    return {
+        "services": [
+            {
+                "category": sys.intern(group["category"]),
+                "services": tuple(builder.build(service) for service in group["services"]),
+            }
+            for group in catalog["services"]
+        ]
+    }
+
+
+def derived_nbytes(value: Any) -> int:
+    """Approximate memory held by an artefact derived from a catalog.
+
+    Records it refers to are excluded (``catalog_nbytes`` counts them).
+    Objects with an ``nbytes()`` method report their own size.
+    """
+    if isinstance(value, ServiceRecord):
+        return 0
+    nbytes = getattr(value, "nbytes", None)
+    if callable(nbytes) and not isinstance(value, type):
+        return nbytes()
+    if isinstance(value, Mapping):
+        return sys.getsizeof(value) + sum(derived_nbytes(k) + derived_nbytes(v) for k, v in list(value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(derived_nbytes(item) for item in list(value))
+    return sys.getsizeof(value)
+
+
+def catalog_nbytes(catalog: dict) -> int:
+    """Approximate memory held by a compacted catalog's records."""
+    return sum(
+        service.nbytes()
+        for group in catalog["services"]
+        for service in group["services"]
+        if isinstance(service, ServiceRecord)
+    )
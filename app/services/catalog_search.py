@@ -0,0 +1,243 @@
+"""Ranked search over the service catalog (``/services/search``).
+
+An inverted index over each service's category, name, description and
+initiators, built once per catalog version (see ``catalog_cached``).
+Every query word must match a word of the service, exactly or as a prefix
+(so "twit us" finds Twitter username scrapers while the user is still
+typing). A service scores the sum over query words of the best field
+weight the word matched times the word's IDF; prefix matches count less
+than exact ones. Results can be restricted to services supporting given
+initiators.
+"""
+
+import bisect
+import heapq
+import itertools
+import math
+import re
+import sys
+from collections.abc import Mapping
+from typing import Optional
+
+from app.services.catalog import catalog_cached, get_catalog_version, list_categories
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Field weights: a word in the category or name says more than one in the description
+_FIELD_WEIGHTS = (("category", 3.0), ("name", 3.0), ("initiators", 2.0), ("description", 1.0))
+_PREFIX_FACTOR = 0.5  # Score of a prefix match relative to an exact one
+_MAX_EXPANSIONS = 64  # Vocabulary words a prefix may expand to
+_SET_MIN_DOCS = 64  # Words in at least this many services keep a frozenset of them for intersections
+_DIRECT_SCORING = 512  # Candidate counts up to this are scored directly instead of read in rank order
+_INT_NBYTES, _FLOAT_NBYTES, _TUPLE_NBYTES = sys.getsizeof(2**40), sys.getsizeof(0.5), sys.getsizeof((0, 0))
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+class CatalogIndex:
+    """Inverted index of one catalog version."""
+
+    def __init__(self, categories: list[dict], version: int = 0):
+        self.version = version
+        self._docs: list[tuple[str, Mapping]] = []
+        weights: dict[str, dict[int, float]] = {}
+        self._by_initiator: dict[str, set[int]] = {}
+
+        for group in categories:
+            category = group["category"]
+            for service in group["services"]:
+                doc = len(self._docs)
+                self._docs.append((category, service))
+                fields = {
+                    "category": category.replace("_", " "),
+                    "name": service.get("name") or "",
+                    "initiators": " ".join(service["initiators"]),
+                    "description": service.get("description") or "",
+                }
+                for field, weight in _FIELD_WEIGHTS:
+                    for word in tokenize(fields[field]):
+                        postings = weights.setdefault(word, {})
+                        if postings.get(doc, 0.0) < weight:
+                            postings[doc] = weight
+                for initiator in service["initiators"]:
+                    self._by_initiator.setdefault(initiator, set()).add(doc)
+
+        count = len(self._docs)
+        # word -> {doc: score} for looking scores up, and the same postings grouped
+        # into score levels (best first, docs in catalog order) for reading them in rank order
+        self._postings: dict[str, dict[int, float]] = {}
+        self._levels: dict[str, list[tuple[float, list[int]]]] = {}
+        self._sets: dict[str, frozenset[int]] = {}
+        for word, postings in weights.items():
+            idf = math.log(1 + count / len(postings))
+            if len(postings) == 1:
+                (doc, weight), = postings.items()
+                self._postings[word] = {doc: weight * idf}
+                self._levels[word] = [(weight * idf, [doc])]
+                continue
+            self._postings[word] = {doc: weight * idf for doc, weight in postings.items()}
+            levels: dict[float, list[int]] = {}
+            for doc, weight in postings.items():
+                levels.setdefault(weight * idf, []).append(doc)
+            self._levels[word] = sorted(levels.items(), reverse=True)
+            if len(postings) >= _SET_MIN_DOCS:
+                self._sets[word] = frozenset(postings)
+        self._vocabulary = sorted(self._postings)
+        self._nbytes: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the index (computed once, it never changes).
+
+        Counted per word rather than per posting, which would take longer
+        than building the index.
+        """
+        if self._nbytes is None:
+            size = sys.getsizeof(self._docs) + len(self._docs) * (_TUPLE_NBYTES + _INT_NBYTES)
+            size += sum(sys.getsizeof(docs) for docs in self._by_initiator.values())
+            size += sys.getsizeof(self._vocabulary) + sum(sys.getsizeof(word) for word in self._vocabulary)
+            for word, postings in self._postings.items():
+                size += sys.getsizeof(postings) + len(postings) * _FLOAT_NBYTES
+                levels = self._levels[word]
+                size += sys.getsizeof(levels) + sum(
+                    _TUPLE_NBYTES + _FLOAT_NBYTES + sys.getsizeof(docs) for _, docs in levels
+                )
+            size += sum(sys.getsizeof(docs) for docs in self._sets.values())
+            self._nbytes = size
+        return self._nbytes
+
+    def _words(self, token: str) -> list[str]:
+        """Return the vocabulary words a query word matches: itself, and up to ``_MAX_EXPANSIONS`` it prefixes."""
+        start = bisect.bisect_left(self._vocabulary, token)
+        words = []
+        for word in self._vocabulary[start:start + _MAX_EXPANSIONS + 1]:
+            if not word.startswith(token):
+                break
+            words.append(word)
+        return words
+
+    def _doc_set(self, word: str):
+        return self._sets.get(word) or self._postings[word].keys()
+
+    def _term(self, token: str, words: list[str]):
+        """Return a query word's score levels (best first, docs in catalog order) and the postings that score it."""
+        by_score: dict[float, list[list[int]]] = {}
+        postings = []
+        for word in words:
+            factor = 1.0 if word == token else _PREFIX_FACTOR
+            for score, docs in self._levels[word]:
+                by_score.setdefault(score * factor, []).append(docs)
+            postings.append((self._postings[word], factor))
+        levels = [
+            (score, docs[0] if len(docs) == 1 else heapq.merge(*docs))
+            for score, docs in sorted(by_score.items(), reverse=True)
+        ]
+        return levels, postings
+
+    def search(self, query: str, initiators: Optional[tuple[str, ...]] = None, limit: int = 10) -> list[dict]:
+        """Return the ``limit`` best services matching every word of ``query``, best first.
+
+        With ``initiators``, only services supporting at least one of them
+        are returned. An empty query returns filtered services in catalog order.
+
+        The services having every word are found by set intersection. Few
+        candidates are scored directly; otherwise the threshold algorithm
+        reads each word's matches best first, in turn, scoring new
+        candidates by lookup, and stops once ``limit`` services rank above
+        any unread one, so broad queries only touch a few services. Equal
+        scores rank in catalog order.
+        """
+        allowed: Optional[set[int]] = None
+        if initiators:
+            allowed = set()
+            for initiator in initiators:
+                allowed |= self._by_initiator.get(initiator, set())
+
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            docs = sorted(allowed) if allowed is not None else range(len(self._docs))
+            return [self._result(doc, 0.0) for doc in itertools.islice(docs, limit)]
+
+        matched = [self._words(token) for token in tokens]
+        if not all(matched):
+            return []
+        # Services having every word, by set operations (in C)
+        sets = []
+        for words in matched:
+            docs = self._doc_set(words[0])
+            if len(words) > 1:
+                docs = set(docs).union(*(self._doc_set(word) for word in words[1:]))
+            sets.append(docs)
+        sets.sort(key=len)
+        candidates = set(sets[0])
+        for docs in sets[1:]:
+            candidates &= docs
+        if allowed is not None:
+            candidates &= allowed
+        if not candidates:
+            return []
+        terms = [self._term(token, words) for token, words in zip(tokens, matched)]
+
+        if len(candidates) <= _DIRECT_SCORING:
+            best = [(self._score(doc, terms), -doc, doc) for doc in candidates]
+            return self._ranked(heapq.nlargest(limit, best))
+
+        streams = [((score, doc) for score, docs in levels for doc in docs) for levels, _ in terms]
+        bounds = [levels[0][0] for levels, _ in terms]
+        last = [-1] * len(terms)  # Last service read from each stream
+        seen: set[int] = set()
+        best: list[tuple[float, int, int]] = []  # Min-heap of (score, -doc, doc)
+
+        while True:
+            for i, stream in enumerate(streams):
+                item = next(stream, None)
+                if item is None:
+                    return self._ranked(best)
+                bounds[i], doc = item
+                last[i] = doc
+                if doc in seen or doc not in candidates:
+                    continue
+                seen.add(doc)
+                entry = (self._score(doc, terms), -doc, doc)
+                if len(best) < limit:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            if len(best) >= limit:
+                # An unread service can at most score the bound, and only by being at every
+                # stream's current level, so after the service last read from each stream
+                bound = sum(bounds)
+                if best[0][0] > bound or (best[0][0] == bound and best[0][2] <= max(last)):
+                    return self._ranked(best)
+
+    @staticmethod
+    def _score(doc: int, terms) -> float:
+        return sum(max(p.get(doc, 0.0) * factor for p, factor in postings) for _, postings in terms)
+
+    def _ranked(self, best: list[tuple[float, int, int]]) -> list[dict]:
+        return [self._result(doc, score) for score, _, doc in sorted(best, reverse=True)]
+
+    def _result(self, doc: int, score: float) -> dict:
+        category, service = self._docs[doc]
+        return {
+            "category": category,
+            "name": service.get("name"),
+            "initiators": list(service["initiators"]),
+            "description": service.get("description"),
+            "score": round(score, 4),
+        }
+
+
+def get_search_index() -> CatalogIndex:
+    """Return the index of the current collection's catalog, built once per version."""
+    return catalog_cached("search_index", lambda: CatalogIndex(list_categories(), get_catalog_version()))
+
+
+def search_services(query: str, initiators: Optional[tuple[str, ...]] = None, limit: int = 10) -> dict:
+    """Search the current collection; return the ``/services/search`` body."""
+    index = get_search_index()
+    return {"version": index.version, "results": index.search(query, initiators, limit)}
@@ -0,0 +1,112 @@
+"""Conversion between ``QueryPlan`` and the compact LLM output format.
+
+In compact mode the LLM writes a ``CompactPlan``: short keys, no
+descriptions except for AI steps, and only the metadata that can't be read
+off the steps. ``expand_plan`` turns it back into a full ``QueryPlan``;
+``compact_plan`` goes the other way and is used to render the few-shot
+examples (and by the benchmarks) so both formats stay in sync.
+"""
+
+import re
+
+from app.models.compact_plan import CompactMetadata, CompactPlan, CompactStep
+from app.models.step_types import QueryMetadata, QueryPlan, StepPlan
+from app.services.assembler import describe_step
+
+# The "Related step(s) N." suffix appended to step descriptions
+RELATED_SUFFIX = re.compile(r"\s*Related steps? [\d, ]+\.?$")
+
+_AI_TYPES = ("ai", "ai-image")
+
+
+def derive_metadata(steps: list[StepPlan], overrides: CompactMetadata | None = None) -> QueryMetadata:
+    """Build ``QueryMetadata`` from the steps, letting ``overrides`` win."""
+    overrides = overrides or CompactMetadata()
+    services = [s for s in steps if s.type == "service"]
+
+    def first_param(key: str) -> str | None:
+        return next((str(s.params[key]) for s in services if s.params.get(key)), None)
+
+    searched = [
+        str(s.params[s.initiator]).lstrip("#")
+        for s in services
+        if s.initiator in ("keyword", "hashtag") and s.params.get(s.initiator)
+    ]
+    keyword_steps = [s for s in steps if s.params.get("operation") == "keywords" and s.params.get("keywords")]
+    narrative_steps = [s for s in steps if s.params.get("operation") == "narratives" and s.params.get("narrative_topics")]
+    username = first_param("username")
+
+    keywords = overrides.kw
+    if keywords is None and searched:
+        keywords = ", ".join(dict.fromkeys(searched))
+    if keywords is None and keyword_steps:
+        keywords = str(keyword_steps[0].params["keywords"])
+
+    return QueryMetadata(
+        source=services[0].service_category if services else None,
+        target_name=overrides.tn or (username.lstrip("@") if username else None),
+        target_url=first_param("url"),
+        target_id=overrides.ti,
+        keywords=keywords,
+        narrative_topics=overrides.nt or (str(narrative_steps[0].params["narrative_topics"]) if narrative_steps else None),
+        benchmark_set=overrides.bs,
+        date_from=overrides.df,
+        date_to=overrides.dt,
+        post_count=overrides.n or 50,
+    )
+
+
+def step_from_compact(cs: CompactStep) -> StepPlan:
+    """Build a ``StepPlan``; its description is filled in by ``describe_step`` once it has a number."""
+    return StepPlan(
+        type=cs.t,
+        service_category=cs.c if cs.t == "service" else None,
+        initiator=cs.i if cs.t == "service" else None,
+        description=cs.d or "",
+        related_steps=cs.r,
+        params=cs.p,
+    )
+
+
+def expand_plan(compact: CompactPlan) -> QueryPlan:
+    """Expand a compact plan into a full, validated ``QueryPlan``."""
+    steps = []
+    for number, cs in enumerate(compact.s, 1):
+        step = step_from_compact(cs)
+        step.description = describe_step(step, number)
+        steps.append(step)
+    return QueryPlan(steps=steps, metadata=derive_metadata(steps, compact.m))
+
+
+def compact_plan(plan: QueryPlan) -> CompactPlan:
+    """Convert a ``QueryPlan`` to the compact format, keeping only non-derivable data."""
+    steps = [
+        CompactStep(
+            t=step.type,
+            c=step.service_category,
+            i=step.initiator,
+            p=step.params,
+            r=step.related_steps,
+            d=RELATED_SUFFIX.sub("", step.description) if step.type in _AI_TYPES else None,
+        )
+        for step in plan.steps
+    ]
+
+    derived = derive_metadata(plan.steps)
+    meta = plan.metadata
+    overrides = CompactMetadata(
+        n=meta.post_count if meta.post_count != 50 else None,
+        tn=meta.target_name if meta.target_name != derived.target_name else None,
+        ti=meta.target_id,
+        kw=meta.keywords if meta.keywords != derived.keywords else None,
+        nt=meta.narrative_topics if meta.narrative_topics != derived.narrative_topics else None,
+        bs=meta.benchmark_set,
+        df=meta.date_from,
+        dt=meta.date_to,
+    )
+    return CompactPlan(s=steps, m=overrides)
+
+
+def compact_json(plan: CompactPlan) -> str:
+    """Serialize a compact plan the way the LLM is asked to write it (no nulls or defaults)."""
+    return plan.model_dump_json(exclude_defaults=True)
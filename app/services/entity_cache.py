@@ -0,0 +1,187 @@
+"""Plan cache keyed on the prompt with its entities abstracted.
+
+"Scrape posts from https://facebook.com/groups/A" and the same request for
+group B produce the same plan apart from the URL. This cache keys plans on
+the prompt with its entities (URLs, @usernames, #hashtags, quoted
+keywords) replaced by placeholders, and stores the plan with every
+occurrence of those entities replaced by markers. A hit fills the markers
+with the new prompt's entities in step params, descriptions and metadata.
+
+A plan is only stored if the substitution is unambiguous: every entity
+must appear in the plan, entities must not overlap each other or the rest
+of the prompt, and abstracting then refilling with the original entities
+must reproduce the plan exactly (so a plan that rewrote an entity, e.g.
+changed its case, is never generalized). URL placeholders keep the host,
+so a Facebook URL never reuses a plan built for a Twitter one.
+"""
+
+import re
+from urllib.parse import urlsplit
+
+from app.config import settings
+from app.models.step_types import QueryPlan
+from app.services.assembler import PLATFORM_NAMES
+from app.services.plan_cache import PlanCache, plan_cache_key
+
+_ENTITY = re.compile(
+    r"(?P<url>https?://[^\s\"'<>]+)"
+    r"|(?<![\w@])@(?P<username>[\w.]+)"
+    r"|(?<![\w#&])#(?P<hashtag>\w+)"
+    r"|\"(?P<quoted>[^\"]+)\""
+    r"|“(?P<curly>[^”]+)”"
+)
+_TRAILING = ".,;:!?)"
+
+# Metadata fields that may carry entity values
+_METADATA_FIELDS = ("target_name", "target_url", "target_id", "keywords", "narrative_topics")
+# Step params that never carry entity values
+_FIXED_PARAMS = ("platform", "operation")
+
+
+def _marker(index: int) -> str:
+    return f"\x00{index}\x00"
+
+
+def extract_entities(prompt: str) -> tuple[str, list[str]]:
+    """Return the prompt with entities replaced by placeholders, and the entity values.
+
+    Values are bare (no @, # or quotes). Placeholders are numbered per kind;
+    URL placeholders include the host.
+    """
+    values: list[str] = []
+    counts: dict[str, int] = {}
+
+    def replace(match: re.Match) -> str:
+        kind = match.lastgroup
+        value = match.group(kind)
+        suffix = ""
+        if kind in ("url", "username"):
+            stripped = value.rstrip(_TRAILING)
+            suffix = value[len(stripped):]
+            value = stripped
+        kind = "quoted" if kind == "curly" else kind
+        counts[kind] = counts.get(kind, 0) + 1
+        label = f"{kind}_{counts[kind]}"
+        if kind == "url":
+            label += f":{urlsplit(value).netloc.lower()}"
+        values.append(value.strip())
+        return f"<{label}>{suffix}"
+
+    template = _ENTITY.sub(replace, prompt.strip())
+    return template, values
+
+
+def _pattern(value: str) -> re.Pattern:
+    return re.compile(rf"(?<!\w){re.escape(value)}(?!\w)", re.IGNORECASE)
+
+
+def _map_strings(data: dict, fn) -> dict:
+    """Apply ``fn`` to every string that may carry an entity: descriptions, param values, metadata."""
+
+    def walk(value):
+        if isinstance(value, str):
+            return fn(value)
+        if isinstance(value, list):
+            return [walk(v) for v in value]
+        if isinstance(value, dict):
+            return {k: walk(v) for k, v in value.items()}
+        return value
+
+    for step in data["steps"]:
+        step["description"] = fn(step["description"])
+        step["params"] = {k: v if k in _FIXED_PARAMS else walk(v) for k, v in step["params"].items()}
+    metadata = data["metadata"]
+    for field in _METADATA_FIELDS:
+        if isinstance(metadata.get(field), str):
+            metadata[field] = fn(metadata[field])
+    return data
+
+
+def _fill(data: dict, values: list[str]) -> dict:
+    def fn(text: str) -> str:
+        if "\x00" not in text:
+            return text
+        for index, value in enumerate(values):
+            text = text.replace(_marker(index), value)
+        return text
+
+    return _map_strings(data, fn)
+
+
+def _ambiguous(template: str, values: list[str]) -> bool:
+    lowered = [v.lower() for v in values]
+    if any(not v or v in PLATFORM_NAMES for v in lowered):
+        return True
+    if any(a in b for i, a in enumerate(lowered) for j, b in enumerate(lowered) if i != j):
+        return True
+    return any(_pattern(v).search(template) for v in values)
+
+
+def abstract_plan(plan: QueryPlan, template: str, values: list[str]) -> dict | None:
+    """Return ``plan`` (as a dict) with entity values replaced by markers, or None if ambiguous."""
+    if not values or _ambiguous(template, values):
+        return None
+    original = plan.model_dump(mode="json")
+    found = [0] * len(values)
+
+    def fn(text: str) -> str:
+        for index, value in enumerate(values):
+            text, n = _pattern(value).subn(_marker(index), text)
+            found[index] += n
+        return text
+
+    abstract = _map_strings(plan.model_dump(mode="json"), fn)
+    if not all(found):
+        return None
+    # Refilling must give back exactly the original plan
+    if _fill(QueryPlan.model_validate(abstract).model_dump(mode="json"), values) != original:
+        return None
+    return abstract
+
+
+class EntityPlanCache:
+    """``PlanCache`` of abstracted plans keyed on the entity-free prompt template."""
+
+    def __init__(self, max_size: int, ttl: int):
+        self._cache = PlanCache(max_size, ttl)
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    def get(
+        self, model: str, prompt: str, options: dict | None = None, collection: str | None = None
+    ) -> QueryPlan | None:
+        template, values = extract_entities(prompt)
+        if not values:
+            return None
+        abstract = self._cache.get(plan_cache_key(model, template, options, collection))
+        if abstract is None:
+            return None
+        return QueryPlan.model_validate(_fill(abstract.model_dump(mode="json"), values))
+
+    def put(
+        self, model: str, prompt: str, options: dict | None, plan: QueryPlan, collection: str | None = None
+    ) -> bool:
+        """Store ``plan`` for the prompt's template; return False if it can't be generalized."""
+        if self._cache.max_size <= 0:
+            return False
+        template, values = extract_entities(prompt)
+        abstract = abstract_plan(plan, template, values)
+        if abstract is None:
+            return False
+        self._cache.put(plan_cache_key(model, template, options, collection), abstract)
+        return True
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+entity_plan_cache = EntityPlanCache(settings.entity_cache_size, settings.plan_cache_ttl)
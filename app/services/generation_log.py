@@ -0,0 +1,180 @@
+"""Append-only log of every successful ``/generate`` call.
+
+Records are handed to a background thread through a bounded queue, so the
+request path only pays for a ``put_nowait``. The writer appends JSON lines
+to segment files and rotates to a new segment once the current one grows
+past ``generation_log_segment_bytes``. Segment names start with a
+millisecond timestamp and include the writer's PID, so several uvicorn
+workers can share one directory and a plain sort yields write order.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from pydantic import BaseModel
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT_GLOB = "gen-*.jsonl"
+_STOP = object()
+
+
+def _encode(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return str(value)
+
+
+class GenerationLog:
+    def __init__(
+        self,
+        directory: str | Path,
+        segment_max_bytes: int,
+        queue_size: int = 10000,
+        flush_interval: float = 1.0,
+    ):
+        self.directory = Path(directory)
+        self.segment_max_bytes = segment_max_bytes
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._segment_bytes = 0
+        self._segment_seq = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="generation-log", daemon=True)
+        self._thread.start()
+        logger.info("Generation log writing to %s", self.directory)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Drain queued records and close the current segment."""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def append(self, record: dict) -> bool:
+        """Queue a record for writing. Never blocks; drops the record if the queue is full."""
+        if not self.running:
+            return False
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _open_segment(self) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._segment_seq += 1
+        name = f"gen-{int(time.time() * 1000):013d}-{os.getpid()}-{self._segment_seq:06d}.jsonl"
+        self._file = open(self.directory / name, "a", encoding="utf-8")
+        self._segment_bytes = 0
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    item = None
+
+                if item is _STOP:
+                    break
+
+                if item is not None:
+                    try:
+                        line = json.dumps(item, default=_encode) + "\n"
+                    except (TypeError, ValueError):
+                        logger.warning("Dropping unserializable generation record", exc_info=True)
+                        self.dropped += 1
+                        continue
+                    if self._file is None or self._segment_bytes >= self.segment_max_bytes:
+                        self._open_segment()
+                    self._file.write(line)
+                    self._segment_bytes += len(line)
+                    self.written += 1
+
+                if self._file is not None and (time.monotonic() - last_flush) >= self.flush_interval:
+                    self._file.flush()
+                    last_flush = time.monotonic()
+        except Exception:
+            logger.exception("Generation log writer stopped unexpectedly")
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def list_segments(directory: str | Path) -> list[Path]:
+    """Return segment files in write order."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(_SEGMENT_GLOB))
+
+
+def _read_segment(path: Path) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A torn final line from a crashed writer; skip it
+                continue
+
+
+def iter_records(directory: str | Path) -> Iterator[dict]:
+    """Stream every record in the log, oldest segment first."""
+    for path in list_segments(directory):
+        yield from _read_segment(path)
+
+
+def recent_records(directory: str | Path, limit: int) -> list[dict]:
+    """Return up to ``limit`` of the newest records, oldest first.
+
+    Segments are read newest-first and reading stops once enough records
+    are collected, so warming never scans the whole history.
+    """
+    if limit <= 0:
+        return []
+    chunks: list[list[dict]] = []
+    collected = 0
+    for path in reversed(list_segments(directory)):
+        tail = deque(_read_segment(path), maxlen=limit - collected)
+        chunks.append(list(tail))
+        collected += len(tail)
+        if collected >= limit:
+            break
+    return [record for chunk in reversed(chunks) for record in chunk]
+
+
+generation_log = GenerationLog(
+    settings.generation_log_dir,
+    settings.generation_log_segment_bytes,
+    queue_size=settings.generation_log_queue_size,
+)
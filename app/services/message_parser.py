@@ -0,0 +1,167 @@
+"""Parse numbered plan messages back into ``QueryPlan``s.
+
+User corrections are stored as the edited message text (``final_message``),
+not as plans. ``parse_message`` recovers the plan from lines like::
+
+    1. [service] Scrap Twitter posts from user: @bbc
+    2. [scripter] Normalize Twitter data to standard format. Related step 1.
+
+Service categories are resolved against the catalog from the platform and
+wording of the description; scripter operations from their template
+wording. Anything that can't be resolved unambiguously raises
+``MessageParseError`` so callers can skip the row instead of learning from
+a guess.
+"""
+
+import re
+
+from app.models.step_types import QueryPlan, StepPlan
+from app.services.assembler import PLATFORM_NAMES
+from app.services.catalog import list_categories
+from app.services.compact_plan import RELATED_SUFFIX, derive_metadata
+
+_LINE = re.compile(r"^\s*(\d+)\.\s*\[(service|scripter|ai|ai-image)\]\s*(.*?)\s*$")
+_URL = re.compile(r"https?://[^\s,]+")
+_HASHTAG = re.compile(r"#(\w+)")
+_USERNAME = re.compile(r"(?:^|[\s(:])@([\w.]+)")
+_USERNAME_LABEL = re.compile(r"\busername\b[^:]*:\s*@?([\w.]+)", re.IGNORECASE)
+_KEYWORD = re.compile(r"\bkeywords?:\s*(.+?)\.?$", re.IGNORECASE)
+_IMAGE = re.compile(r"\b(image|images|photo|photos|picture|pictures)\b", re.IGNORECASE)
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Scripter wording -> (operation, param name, value pattern)
+_KEYWORDS_VALUE = re.compile(r"\bkeywords:\s*(.+?)\.(?:\s|$)", re.IGNORECASE)
+_TARGET_VALUE = re.compile(r"\bmentions? target:\s*(.+?)\.(?:\s|$)", re.IGNORECASE)
+_NARRATIVES_VALUE = re.compile(r"\bnarrative categories:\s*(.+?)\.(?:\s|$)", re.IGNORECASE)
+_NORMALIZE_VALUE = re.compile(r"\bnormalize\s+(\w+)\s+data\b", re.IGNORECASE)
+
+_PLATFORM_ALIASES = {name.lower(): platform for platform, name in PLATFORM_NAMES.items()}
+_PLATFORM_ALIASES.update({"tweet": "twitter", "tweets": "twitter", "fb": "facebook", "ig": "instagram"})
+_PLATFORM_PATTERN = re.compile(r"\b(" + "|".join(sorted(_PLATFORM_ALIASES, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+
+
+class MessageParseError(ValueError):
+    """Raised when a message can't be turned back into a plan."""
+
+
+def _find_platform(text: str) -> str | None:
+    match = _PLATFORM_PATTERN.search(text)
+    return _PLATFORM_ALIASES[match.group(1).lower()] if match else None
+
+
+def _clean(value: str) -> str:
+    return value.rstrip(".,;)")
+
+
+def _service_initiator(text: str) -> tuple[str | None, str | None]:
+    """Return the initiator and its value from a service description."""
+    if match := _URL.search(text):
+        return "url", _clean(match.group(0))
+    if match := _HASHTAG.search(text):
+        return "hashtag", match.group(1)
+    if match := _USERNAME.search(text) or _USERNAME_LABEL.search(text):
+        return "username", _clean(match.group(1))
+    if match := _KEYWORD.search(text):
+        return "keyword", match.group(1).strip()
+    if _IMAGE.search(text):
+        return "image", None
+    return None, None
+
+
+def _service_category(text: str, initiator: str | None, categories: list[dict]) -> str:
+    """Pick the catalog category a service description refers to."""
+    if initiator is not None:
+        supported = [c for c in categories if initiator in c["initiators"]]
+        categories = supported or categories
+    lower = text.lower()
+
+    platform = _find_platform(text)
+    if platform is not None:
+        candidates = [c["category"] for c in categories if c["category"].startswith(platform + "_")]
+        by_kind = [c for c in candidates if c.partition("_")[2].rstrip("s") in lower]
+        if len(by_kind) == 1:
+            return by_kind[0]
+        if len(candidates) == 1:
+            return candidates[0]
+        if f"{platform}_posts" in candidates:
+            return f"{platform}_posts"
+        raise MessageParseError(f"can't tell which {platform} service is meant: {text!r}")
+
+    # No platform: score categories by the words they share with the description
+    words = set(_WORD.findall(lower))
+    scored = []
+    for group in categories:
+        vocabulary = set(group["category"].split("_"))
+        for service in group["services"]:
+            vocabulary.update(w for w in _WORD.findall(service["name"].lower()) if len(w) > 2)
+        scored.append((len(words & vocabulary), group["category"]))
+    scored.sort(reverse=True)
+    if not scored or scored[0][0] == 0 or (len(scored) > 1 and scored[1][0] == scored[0][0]):
+        raise MessageParseError(f"can't tell which service is meant: {text!r}")
+    return scored[0][1]
+
+
+def _scripter_params(text: str) -> dict:
+    lower = text.lower()
+    if "normalize" in lower:
+        platform = _find_platform(text)
+        if platform is None and (match := _NORMALIZE_VALUE.search(text)):
+            platform = match.group(1).lower()
+        return {"platform": platform} if platform else {"operation": "normalize"}
+    if "sentiment" in lower:
+        return {"operation": "sentiment"}
+    if match := _TARGET_VALUE.search(text):
+        return {"operation": "mentions_target", "target": match.group(1).strip()}
+    if "narrative" in lower:
+        match = _NARRATIVES_VALUE.search(text)
+        return {"operation": "narratives", "narrative_topics": match.group(1).strip()} if match else {"operation": "narratives"}
+    if "keywords" in lower:
+        match = _KEYWORDS_VALUE.search(text)
+        return {"operation": "keywords", "keywords": match.group(1).strip()} if match else {"operation": "keywords"}
+    return {}
+
+
+def parse_message(message: str) -> QueryPlan:
+    """Rebuild a ``QueryPlan`` from a numbered plan message."""
+    lines: list[tuple[str, str]] = []
+    for raw in message.splitlines():
+        if not raw.strip():
+            continue
+        match = _LINE.match(raw)
+        if match is None:
+            if not lines:
+                raise MessageParseError(f"expected a numbered step, got {raw.strip()!r}")
+            # Wrapped description: continue the previous step
+            step_type, text = lines[-1]
+            lines[-1] = (step_type, f"{text} {raw.strip()}")
+            continue
+        if int(match.group(1)) != len(lines) + 1:
+            raise MessageParseError(f"step {match.group(1)} is out of order")
+        lines.append((match.group(2), match.group(3)))
+    if not lines:
+        raise MessageParseError("the message has no steps")
+
+    categories = None
+    steps = []
+    for number, (step_type, text) in enumerate(lines, 1):
+        related: list[int] = []
+        if suffix := RELATED_SUFFIX.search(text):
+            related = [int(n) for n in re.findall(r"\d+", suffix.group(0))]
+        if any(not 1 <= ref < number for ref in related):
+            raise MessageParseError(f"step {number} references a step that isn't before it")
+        body = RELATED_SUFFIX.sub("", text)
+
+        step = StepPlan(type=step_type, description=text, related_steps=related)
+        if step_type == "service":
+            if categories is None:
+                categories = list_categories()
+            initiator, value = _service_initiator(body)
+            step.service_category = _service_category(body, initiator, categories)
+            step.initiator = initiator
+            if value is not None:
+                step.params = {initiator: value}
+        elif step_type == "scripter":
+            step.params = _scripter_params(body)
+        steps.append(step)
+
+    return QueryPlan(steps=steps, metadata=derive_metadata(steps))
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.config import settings
+from app.models.step_types import QueryPlan
+
+
+def plan_cache_key(model: str, prompt: str, options: dict | None = None, collection: str | None = None) -> str:
+    """Return a stable cache key for an LLM planning request.
+
+    ``collection`` is the catalog the plan was built against; plans for
+    different catalogs never share an entry.
+    """
+    key = {"model": model, "prompt": prompt.strip(), "options": options or {}}
+    if collection is not None:
+        key["collection"] = collection
+    payload = json.dumps(key, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class PlanCache:
+    """Thread-safe LRU of generated plans with a per-entry TTL.
+
+    Plans are stored as plain dicts and re-validated on every hit, so callers
+    are free to mutate the returned ``QueryPlan`` (e.g. apply option
+    overrides) without corrupting the cached copy.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[QueryPlan]:
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (time.monotonic() - entry[0]) >= self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            data = entry[1]
+        return QueryPlan.model_validate(data)
+
+    def put(self, key: str, plan: QueryPlan | dict) -> None:
+        if self.max_size <= 0:
+            return
+        data = plan.model_dump(mode="json") if isinstance(plan, QueryPlan) else plan
+        with self._lock:
+            self._entries[key] = (time.monotonic(), data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+plan_cache = PlanCache(settings.plan_cache_size, settings.plan_cache_ttl)
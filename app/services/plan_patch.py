@@ -0,0 +1,124 @@
+"""Apply ``PlanPatch`` edits to a ``QueryPlan``.
+
+All step numbers in a patch (``at`` and the ``r`` of new steps) refer to
+the plan as it was before the patch, so the LLM never has to renumber
+anything. After applying the edits every ``related_steps`` list is
+rewritten to the new numbering; a reference to a deleted step is replaced
+by that step's own references, so deleting e.g. a normalize step keeps the
+downstream steps attached to the scrape before it. Descriptions of kept
+steps get their "Related step N." suffix rewritten to match.
+"""
+
+from app.models.compact_plan import CompactMetadata, CompactStep
+from app.models.plan_patch import PlanPatch
+from app.models.step_types import QueryMetadata, QueryPlan, StepPlan
+from app.services.assembler import describe_step, format_related_steps
+from app.services.compact_plan import RELATED_SUFFIX, derive_metadata, step_from_compact
+
+# Metadata fields that derive_metadata fills from the steps
+_DERIVED_FIELDS = ("source", "target_name", "target_url", "keywords", "narrative_topics")
+_OVERRIDE_FIELDS = {
+    "n": "post_count", "tn": "target_name", "ti": "target_id", "kw": "keywords",
+    "nt": "narrative_topics", "bs": "benchmark_set", "df": "date_from", "dt": "date_to",
+}
+
+
+class PlanPatchError(ValueError):
+    """Raised when a patch doesn't apply to the plan."""
+
+
+def _resolve(number: int, mapping: dict[int, int | None], old_steps: list[StepPlan], seen: set[int]) -> list[int]:
+    """Map an old step number to new numbers, following deleted steps to their own references."""
+    new = mapping.get(number)
+    if new is not None:
+        return [new]
+    if number in seen or not 1 <= number <= len(old_steps):
+        return []
+    seen.add(number)
+    resolved = []
+    for parent in old_steps[number - 1].related_steps:
+        resolved.extend(_resolve(parent, mapping, old_steps, seen))
+    return resolved
+
+
+def _merge_metadata(old_plan: QueryPlan, steps: list[StepPlan], overrides: CompactMetadata) -> QueryMetadata:
+    """Re-derive step-derived fields that were derived before; keep explicit values; apply overrides."""
+    old_derived = derive_metadata(old_plan.steps)
+    new_derived = derive_metadata(steps)
+    values = old_plan.metadata.model_dump()
+    for field in _DERIVED_FIELDS:
+        if values[field] == getattr(old_derived, field) or values[field] is None:
+            values[field] = getattr(new_derived, field)
+    for short, field in _OVERRIDE_FIELDS.items():
+        value = getattr(overrides, short)
+        if value is not None:
+            values[field] = value
+    return QueryMetadata.model_validate(values)
+
+
+def apply_patch(plan: QueryPlan, patch: PlanPatch) -> QueryPlan:
+    """Return a new plan with ``patch`` applied; raise ``PlanPatchError`` if it doesn't apply."""
+    count = len(plan.steps)
+    replaced: dict[int, CompactStep] = {}
+    deleted: set[int] = set()
+    inserted: dict[int, list[CompactStep]] = {}
+
+    for op in patch.ops:
+        if op.op == "insert":
+            if not 0 <= op.at <= count:
+                raise PlanPatchError(f"insert at={op.at} is outside the plan (0-{count})")
+            if op.step is None:
+                raise PlanPatchError("insert needs a step")
+            inserted.setdefault(op.at, []).append(op.step)
+            continue
+        if not 1 <= op.at <= count:
+            raise PlanPatchError(f"{op.op} at={op.at} is outside the plan (1-{count})")
+        if op.at in replaced or op.at in deleted:
+            raise PlanPatchError(f"step {op.at} is edited more than once")
+        if op.op == "delete":
+            deleted.add(op.at)
+        else:
+            if op.step is None:
+                raise PlanPatchError("replace needs a step")
+            replaced[op.at] = op.step
+
+    # Lay out the new plan: (old number or None, step, is_new)
+    layout: list[tuple[int | None, StepPlan, bool]] = []
+    for cs in inserted.get(0, []):
+        layout.append((None, step_from_compact(cs), True))
+    for number, step in enumerate(plan.steps, 1):
+        if number in replaced:
+            layout.append((number, step_from_compact(replaced[number]), True))
+        elif number not in deleted:
+            layout.append((number, step.model_copy(deep=True), False))
+        for cs in inserted.get(number, []):
+            layout.append((None, step_from_compact(cs), True))
+    if not layout:
+        raise PlanPatchError("the patch deletes every step")
+
+    mapping: dict[int, int | None] = {n: None for n in range(1, count + 1)}
+    for new_number, (old_number, _, _) in enumerate(layout, 1):
+        if old_number is not None:
+            mapping[old_number] = new_number
+
+    steps = []
+    for new_number, (old_number, step, is_new) in enumerate(layout, 1):
+        related: list[int] = []
+        for ref in step.related_steps:
+            if not 1 <= ref <= count:
+                raise PlanPatchError(f"step {new_number} references step {ref}, which doesn't exist")
+            for resolved in _resolve(ref, mapping, plan.steps, set()):
+                if resolved not in related:
+                    related.append(resolved)
+        if any(ref >= new_number for ref in related):
+            raise PlanPatchError(f"step {new_number} would depend on a later step")
+        step.related_steps = related
+
+        if is_new:
+            step.description = describe_step(step, new_number)
+        else:
+            base = RELATED_SUFFIX.sub("", step.description)
+            step.description = (base.rstrip(".") + "." + format_related_steps(related)) if related else base
+        steps.append(step)
+
+    return QueryPlan(steps=steps, metadata=_merge_metadata(plan, steps, patch.m))
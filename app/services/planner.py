@@ -1,70 +1,370 @@
 import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Optional
 
-import instructor
-import litellm
+from pydantic import ValidationError
 
 from app.config import settings
+from app.models.compact_plan import CompactPlan
+from app.models.plan_patch import PlanPatch
 from app.models.step_types import QueryPlan
-from app.prompts.system_prompt import build_system_prompt
+from app.prompts.system_prompt import SKELETON_PROMPT, build_refine_prompt, build_system_prompt
+from app.services.catalog import current_collection
+from app.services.compact_plan import compact_json, compact_plan, expand_plan
+from app.services.entity_cache import entity_plan_cache
+from app.services.plan_cache import plan_cache, plan_cache_key
+from app.services.plan_patch import apply_patch
+from app.services.skeletons import SkeletonError, get_skeleton_library
+from app.services.tracing import span, start_span, tracing_enabled
+
+if TYPE_CHECKING:
+    import instructor
 
 logger = logging.getLogger(__name__)
 
+# Replaces litellm.completion when set (used by the evaluation record/replay mode)
+_completion_override: Optional[Callable] = None
+
+
+def set_completion_override(completion: Optional[Callable]) -> None:
+    """Route LLM calls through ``completion`` instead of ``litellm.completion``."""
+    global _completion_override
+    _completion_override = completion
+
+
+def preload_llm_sdk() -> None:
+    """Import the LLM SDKs (litellm, instructor).
+
+    They take seconds to import, so they are loaded lazily on the first
+    plan instead of at module import; call this to pay the cost up front.
+    """
+    import instructor  # noqa: F401
+    import litellm  # noqa: F401
+
 
-def _get_client() -> instructor.Instructor:
+def preload_llm_sdk_in_background() -> threading.Thread:
+    """Start importing the LLM SDKs on a daemon thread so start-up isn't blocked."""
+    thread = threading.Thread(target=preload_llm_sdk, name="llm-sdk-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def _get_client() -> "instructor.Instructor":
     """Create an instructor-patched litellm client."""
-    return instructor.from_litellm(litellm.completion)
+    import instructor
+    import litellm
+
+    return instructor.from_litellm(_completion_override or litellm.completion)
+
 
+class _AttemptTracker:
+    """Counts instructor attempts and, when tracing is on, wraps each in an ``llm.attempt`` span.
 
-def generate_plan(prompt: str, options: dict | None = None) -> QueryPlan:
+    Hook order per attempt is ``completion:kwargs`` → ``completion:response``
+    → (``parse:error`` on a validation retry), so an attempt span stays open
+    until the next attempt starts, a parse error is reported, or ``close``.
+    """
+
+    def __init__(self, client: "instructor.Instructor", model: str):
+        self.model = model
+        self.attempts = 0
+        self._span = None
+        self._tracing = tracing_enabled()
+        client.on("completion:kwargs", self._on_kwargs)
+        if self._tracing:
+            client.on("completion:response", self._on_response)
+            client.on("completion:error", self._on_error)
+            client.on("parse:error", self._on_error)
+
+    def _on_kwargs(self, *args, **kwargs) -> None:
+        self.attempts += 1
+        if self._tracing:
+            self.close()
+            self._span = start_span("llm.attempt", **{"llm.model": self.model, "llm.attempt": self.attempts})
+
+    def _on_response(self, response, *args, **kwargs) -> None:
+        usage = getattr(response, "usage", None)
+        if self._span is not None and usage is not None:
+            self._span.set_attributes({
+                "llm.prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "llm.completion_tokens": getattr(usage, "completion_tokens", None),
+            })
+
+    def _on_error(self, error, *args, **kwargs) -> None:
+        if self._span is not None and isinstance(error, BaseException):
+            self._span.record_exception(error)
+        self.close()
+
+    def close(self) -> None:
+        if self._span is not None:
+            self._span.end()
+            self._span = None
+
+
+# Options that only set the QueryMetadata field of the same name after generation. They never
+# change the steps, so they are kept out of the LLM input and the cache keys; plans are shared
+# across counts and date ranges. Every other option can change the plan and reaches the LLM.
+POST_GENERATION_OPTIONS = ("post_count", "date_from", "date_to")
+
+
+def structural_options(options: dict | None) -> dict | None:
+    """Return the options that can change the plan's structure (None if there are none)."""
+    if not options:
+        return None
+    return {key: value for key, value in options.items() if key not in POST_GENERATION_OPTIONS} or None
+
+
+def _apply_option_overrides(plan: QueryPlan, options: dict | None) -> dict:
+    """Apply post-generation options to metadata; return the values they replaced."""
+    replaced = {}
+    if options:
+        for key in POST_GENERATION_OPTIONS:
+            if key in options:
+                replaced[key] = getattr(plan.metadata, key)
+                setattr(plan.metadata, key, options[key])
+    return replaced
+
+
+def generate_plan(
+    prompt: str,
+    options: dict | None = None,
+    stats: dict | None = None,
+    model: str | None = None,
+    use_cache: bool = True,
+    output_format: str | None = None,
+) -> QueryPlan:
     """
     Stage 1: Use LLM to generate a structured QueryPlan from natural language.
 
     Args:
         prompt: Natural language user request
-        options: Optional overrides (post_count, date_from, date_to, etc.)
+        options: Optional options; post_count, date_from and date_to are applied to the
+            metadata after generation, any others are passed to the LLM
+        stats: Optional dict filled with model, token counts, attempts, LLM latency, cache hit
+            and the metadata values the post-generation options replaced
+        model: litellm model string; defaults to the configured model
+        use_cache: Look up and store the plan in the plan cache
+        output_format: "full" or "compact"; defaults to ``plan_output_format``
 
     Returns:
         QueryPlan with validated steps and metadata
     """
-    client = _get_client()
-    system_prompt = build_system_prompt()
+    stats = stats if stats is not None else {}
+    with span("planner.generate_plan") as span_:
+        try:
+            plan = _generate_plan(
+                prompt, options, stats, model or settings.litellm_model, use_cache,
+                output_format or settings.plan_output_format,
+            )
+            stats["replaced_metadata"] = _apply_option_overrides(plan, options)
+            span_.set_attribute("plan.step_count", len(plan.steps))
+        finally:
+            span_.set_attributes({
+                "llm.model": stats.get("model"),
+                "llm.output_format": stats.get("output_format"),
+                "plan.cache_hit": stats.get("cache_hit"),
+                "plan.cache": stats.get("cache"),
+                "llm.attempts": stats.get("attempts"),
+                "llm.prompt_tokens": stats.get("prompt_tokens"),
+                "llm.completion_tokens": stats.get("completion_tokens"),
+            })
+    return plan
 
-    # Build the user message with options context
-    user_message = prompt
-    if options:
-        option_parts = []
-        for key, value in options.items():
-            option_parts.append(f"{key}: {value}")
-        if option_parts:
-            user_message += f"\n\nAdditional parameters: {', '.join(option_parts)}"
 
-    logger.info(f"Generating plan for: {prompt}")
+def _generate_plan(
+    prompt: str, options: dict | None, stats: dict, model: str, use_cache: bool, output_format: str
+) -> QueryPlan:
+    if output_format not in ("full", "compact"):
+        raise ValueError(f"Unsupported plan output format: {output_format}")
+    compact = output_format == "compact"
+    stats["model"] = model
+    stats["output_format"] = output_format
+
+    llm_options = structural_options(options)
+    collection = current_collection()
+    cache_key = plan_cache_key(model, prompt, llm_options, collection)
+    plan = plan_cache.get(cache_key) if use_cache else None
+    if plan is not None:
+        stats["cache_hit"] = True
+        stats["cache"] = "exact"
+        logger.info(f"Plan cache hit for: {prompt}")
+        return plan
+    plan = entity_plan_cache.get(model, prompt, llm_options, collection) if use_cache else None
+    if plan is not None:
+        stats["cache_hit"] = True
+        stats["cache"] = "entity"
+        logger.info(f"Entity plan cache hit for: {prompt}")
+        plan_cache.put(cache_key, plan)
+        return plan
+    stats["cache_hit"] = False
 
+    plan = _plan_from_skeleton(prompt, llm_options, model, stats) if settings.skeleton_planning else None
+    if plan is None:
+        system_prompt = build_system_prompt(compact=compact)
+        user_message = build_user_message(prompt, llm_options)
+
+        logger.info(f"Generating plan for: {prompt}")
+        result = _complete(CompactPlan if compact else QueryPlan, system_prompt, user_message, model, stats)
+        plan = expand_plan(result) if compact else result
+
+    if use_cache:
+        plan_cache.put(cache_key, plan)
+        entity_plan_cache.put(model, prompt, llm_options, plan, collection)
+
+    logger.info(f"Generated plan with {len(plan.steps)} steps")
+    return plan
+
+
+def _plan_from_skeleton(prompt: str, options: dict | None, model: str, stats: dict) -> QueryPlan | None:
+    """Fill the matching plan skeleton's slots with the LLM; None if no skeleton matches or fits."""
+    with span("planner.skeleton") as span_:
+        match = get_skeleton_library().match(prompt)
+        if match is None:
+            span_.set_attribute("skeleton.matched", False)
+            return None
+        skeleton, score = match
+        span_.set_attributes({"skeleton.matched": True, "skeleton.id": skeleton.id, "skeleton.score": score})
+
+        user_message = f"Plan: {skeleton.outline()}\n\nRequest: {prompt}{_format_options(options)}"
+        logger.info(f"Filling skeleton {skeleton.id} (score {score:.2f}) for: {prompt}")
+        try:
+            slots = _complete(skeleton.slot_model(), SKELETON_PROMPT, user_message, model, stats)
+            if not slots.fits:
+                raise SkeletonError("the LLM says the skeleton doesn't fit the request")
+            plan = skeleton.fill(slots.model_dump(exclude={"fits"}), prompt)
+        except Exception as e:
+            # Fall back to full planning; keep what the attempt cost
+            logger.info(f"Skeleton {skeleton.id} not used: {e}")
+            stats["skeleton_fallback"] = {
+                "skeleton": skeleton.id,
+                "error": str(e),
+                "llm_latency_ms": stats.pop("llm_latency_ms", None),
+                "prompt_tokens": stats.pop("prompt_tokens", None),
+                "completion_tokens": stats.pop("completion_tokens", None),
+            }
+            span_.set_attribute("skeleton.fallback", True)
+            return None
+        stats["skeleton"] = skeleton.id
+        return plan
+
+
+def build_user_message(prompt: str, options: dict | None = None) -> str:
+    """Return the user message ``generate_plan`` sends the LLM for a prompt and its options."""
+    return prompt + _format_options(structural_options(options))
+
+
+def _format_options(options: dict | None) -> str:
+    """Render options as the "Additional parameters" suffix of the user message."""
+    if not options:
+        return ""
+    return f"\n\nAdditional parameters: {', '.join(f'{key}: {value}' for key, value in options.items())}"
+
+
+def _complete(response_model, system_prompt: str, user_message: str, model: str, stats: dict, context: dict | None = None):
+    """Run one structured completion and record latency, attempts and token usage in ``stats``."""
+    client = _get_client()
     kwargs = {
-        "model": settings.litellm_model,
-        "response_model": QueryPlan,
+        "model": model,
+        "response_model": response_model,
         "messages": [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_message},
         ],
         "max_retries": 2,
     }
+    if context is not None:
+        kwargs["context"] = context
 
-    if settings.litellm_api_base:
-        kwargs["api_base"] = settings.litellm_api_base
+    kwargs.update(settings.litellm_kwargs_for(model))
 
-    kwargs.update(settings.litellm_extra_kwargs)
+    # Each instructor retry re-sends the completion; count attempts via hooks
+    tracker = _AttemptTracker(client, model)
 
-    plan = client.chat.completions.create(**kwargs)
+    start = time.perf_counter()
+    try:
+        result, completion = client.chat.completions.create_with_completion(**kwargs)
+    finally:
+        tracker.close()
+        stats["llm_latency_ms"] = (time.perf_counter() - start) * 1000
+        stats["attempts"] = tracker.attempts
+        stats["retries"] = max(0, tracker.attempts - 1)
 
-    # Apply option overrides to metadata
-    if options:
-        if "post_count" in options:
-            plan.metadata.post_count = options["post_count"]
-        if "date_from" in options:
-            plan.metadata.date_from = options["date_from"]
-        if "date_to" in options:
-            plan.metadata.date_to = options["date_to"]
+    usage = getattr(completion, "usage", None)
+    if usage is not None:
+        stats["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+        stats["completion_tokens"] = getattr(usage, "completion_tokens", None)
+    return result
 
-    logger.info(f"Generated plan with {len(plan.steps)} steps")
-    return plan
+
+def refine_plan(
+    plan: QueryPlan,
+    instruction: str,
+    options: dict | None = None,
+    stats: dict | None = None,
+    model: str | None = None,
+) -> QueryPlan:
+    """
+    Edit an existing plan according to ``instruction``.
+
+    The LLM only returns a ``PlanPatch`` (insert/replace/delete steps), which
+    is applied locally; patches that don't apply to ``plan`` are sent back to
+    the LLM as validation errors.
+
+    Args:
+        plan: The plan to edit
+        instruction: Natural language change request ("also add sentiment")
+        options: Optional options, handled as in ``generate_plan``
+        stats: Optional dict filled with model, token counts, attempts and LLM latency
+        model: litellm model string; defaults to the configured model
+
+    Returns:
+        The edited QueryPlan
+    """
+    stats = stats if stats is not None else {}
+    model = model or settings.litellm_model
+    stats["model"] = model
+    with span("planner.refine_plan", **{"plan.base_step_count": len(plan.steps)}) as span_:
+        try:
+            user_message = (
+                f"Current plan: {compact_json(compact_plan(plan))}\n\n"
+                f"Change: {instruction}{_format_options(structural_options(options))}"
+            )
+            logger.info(f"Refining plan: {instruction}")
+            patch = _complete(PlanPatch, build_refine_prompt(), user_message, model, stats, context={"plan": plan})
+            refined = apply_patch(plan, patch)
+            stats["patch_ops"] = len(patch.ops)
+            _apply_option_overrides(refined, options)
+            span_.set_attribute("plan.step_count", len(refined.steps))
+        finally:
+            span_.set_attributes({
+                "llm.model": model,
+                "llm.attempts": stats.get("attempts"),
+                "llm.prompt_tokens": stats.get("prompt_tokens"),
+                "llm.completion_tokens": stats.get("completion_tokens"),
+            })
+    logger.info(f"Refined plan with {len(patch.ops)} edits to {len(refined.steps)} steps")
+    return refined
+
+
+def warm_plan_cache(records: list[dict]) -> int:
+    """Seed the plan caches (exact and entity) from generation log records; return the number loaded.
+
+    Only records produced by the currently configured model are used, so a
+    model switch never serves plans from the previous one. Refinements are
+    skipped: their plan depends on the base plan, not just the prompt.
+    """
+    loaded = 0
+    for record in records:
+        if record.get("model") != settings.litellm_model or not record.get("plan") or record.get("kind") == "refine":
+            continue
+        try:
+            plan = QueryPlan.model_validate(record["plan"])
+        except ValidationError:
+            continue
+        options = structural_options(record.get("options"))
+        collection = record.get("collection") or settings.qdrant_collection
+        plan_cache.put(plan_cache_key(record["model"], record["prompt"], options, collection), plan)
+        entity_plan_cache.put(record["model"], record["prompt"], options, plan, collection)
+        loaded += 1
+    return loaded
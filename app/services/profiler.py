@@ -0,0 +1,162 @@
+"""Opt-in sampling profiler for individual requests.
+
+A request is profiled when it carries a valid ``X-Profile-Token`` header or
+is picked by ``profile_sample_rate``. While it runs, a sampler thread
+snapshots the request thread's stack every ``profile_interval_ms`` via
+``sys._current_frames()``. Samples are wall-clock, so time spent waiting on
+the LLM shows up as socket reads next to validation, parsing and rendering.
+
+Profiles are written as collapsed stacks (``frame;frame;frame count``),
+which flamegraph.pl, speedscope and inferno read directly, plus a small JSON
+sidecar with metadata. When profiling is off, the only cost per request is
+the ``should_profile`` check.
+"""
+
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from app.config import settings
+
+_PROFILE_NAME = re.compile(r"^[0-9]{13}-[0-9a-f]{8}$")
+_ROOT_DIR = str(Path(__file__).resolve().parent.parent.parent) + os.sep
+_SITE_PACKAGES = "site-packages" + os.sep
+
+
+def token_valid(token: Optional[str]) -> bool:
+    """Return True if ``token`` matches the configured profiling token."""
+    if not settings.profile_token or not token:
+        return False
+    return hmac.compare_digest(token, settings.profile_token)
+
+
+def should_profile(token: Optional[str]) -> bool:
+    """Decide whether the current request is profiled."""
+    if token is not None and token_valid(token):
+        return True
+    rate = settings.profile_sample_rate
+    return rate > 0 and random.random() < rate
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if filename.startswith(_ROOT_DIR):
+        filename = filename[len(_ROOT_DIR):]
+    else:
+        idx = filename.rfind(_SITE_PACKAGES)
+        if idx != -1:
+            filename = filename[idx + len(_SITE_PACKAGES):]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread's stack at a fixed interval until stopped."""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+                self.samples += 1
+
+    def start(self) -> "SamplingProfiler":
+        self.started = time.time()
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.time() - self.started
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_current_thread() -> SamplingProfiler:
+    """Return an unstarted profiler for the calling thread."""
+    return SamplingProfiler(threading.get_ident(), settings.profile_interval_ms / 1000)
+
+
+def save_profile(profiler: SamplingProfiler, meta: dict) -> str:
+    """Write a finished profile to ``profile_dir``; return its name."""
+    directory = Path(settings.profile_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = f"{int(profiler.started * 1000):013d}-{uuid.uuid4().hex[:8]}"
+
+    (directory / f"{name}.folded").write_text(profiler.collapsed())
+    (directory / f"{name}.json").write_text(json.dumps({
+        "name": name,
+        "started_at": profiler.started,
+        "duration_ms": profiler.duration * 1000,
+        "samples": profiler.samples,
+        "interval_ms": profiler.interval * 1000,
+        **meta,
+    }))
+
+    _prune(directory)
+    return name
+
+
+def _prune(directory: Path) -> None:
+    """Keep only the newest ``profile_max_files`` profiles."""
+    profiles = sorted(directory.glob("*.folded"))
+    for old in profiles[:max(0, len(profiles) - settings.profile_max_files)]:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".json").unlink(missing_ok=True)
+
+
+def list_profiles() -> list[dict]:
+    """Return metadata for stored profiles, newest first."""
+    directory = Path(settings.profile_dir)
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, json.JSONDecodeError):
+            continue
+    return profiles
+
+
+def read_profile(name: str) -> Optional[str]:
+    """Return the collapsed stacks of profile ``name``, or None if it doesn't exist."""
+    if not _PROFILE_NAME.match(name):
+        return None
+    path = Path(settings.profile_dir) / f"{name}.folded"
+    if not path.exists():
+        return None
+    return path.read_text()
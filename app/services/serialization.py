@@ -0,0 +1,46 @@
+"""Fast JSON encoding for API responses.
+
+FastAPI's default path for a ``response_model`` endpoint dumps the returned
+model to a dict, validates it against the response model again and then
+serializes it, with the validation hopping to the threadpool for sync
+endpoints. Endpoints that already hold validated models (or plain dicts
+built from them) return ``FastJSONResponse`` instead, which encodes once:
+models through pydantic-core's serializer, everything else through
+``orjson`` when it is installed and the stdlib ``json`` module otherwise.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Optional; falls back to the stdlib encoder
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    """Serialize ``value`` to compact UTF-8 JSON."""
+    if isinstance(value, BaseModel):
+        return value.__pydantic_serializer__.to_json(value)
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def loads(data: bytes | str) -> Any:
+    """Parse JSON produced by ``dumps``."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(Response):
+    """JSON response that serializes its content with ``dumps``, skipping response-model re-validation."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,168 @@
+"""Precomputed ``/services`` response bodies.
+
+The catalog only changes on refresh, so each view of it (the full catalog,
+or a projected/paginated slice) is serialized once per catalog version and
+kept together with gzip and, if the ``brotli`` package is installed,
+brotli variants and a strong ETag derived from the body. Requests then only
+pick a variant and compare ETags.
+"""
+
+import gzip
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from app.services.catalog import catalog_cached, get_catalog_version, list_categories
+from app.services.serialization import dumps
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip is always available
+    brotli = None
+
+CATEGORY_FIELDS = ("category", "initiators", "services")
+
+_MAX_VIEWS = 64  # Distinct (projection, page) views kept per catalog version
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 9
+
+
+class EncodedBody:
+    """One serialized view of the catalog with its compressed variants."""
+
+    __slots__ = ("identity", "etag", "version", "_encoded", "_lock")
+
+    def __init__(self, payload: dict, version: int = 0):
+        self.identity = dumps(payload)
+        self.version = version  # Catalog version the body was built from
+        self.etag = '"' + hashlib.sha256(self.identity).hexdigest()[:32] + '"'
+        self._encoded: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def encoded(self, encoding: str) -> bytes:
+        """Return the body in ``encoding`` (``identity``, ``gzip`` or ``br``), compressing once."""
+        if encoding == "identity":
+            return self.identity
+        body = self._encoded.get(encoding)
+        if body is None:
+            with self._lock:
+                body = self._encoded.get(encoding)
+                if body is None:
+                    if encoding == "br":
+                        body = brotli.compress(self.identity, quality=_BROTLI_QUALITY)
+                    else:
+                        body = gzip.compress(self.identity, _GZIP_LEVEL, mtime=0)
+                    self._encoded[encoding] = body
+        return body
+
+    def nbytes(self) -> int:
+        """Memory held by the body and the compressed variants built so far."""
+        return sys.getsizeof(self.identity) + sum(sys.getsizeof(body) for body in list(self._encoded.values()))
+
+    def etag_for(self, encoding: str) -> str:
+        """Strong ETags must differ between content codings."""
+        if encoding == "identity":
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """Return True if an ``If-None-Match`` header matches any variant of this body."""
+        if not if_none_match:
+            return False
+        base = self.etag[1:-1]
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            tag = tag.strip('"')
+            if tag == base or tag.startswith(base + "-"):
+                return True
+        return False
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> str:
+    """Pick the best supported coding from an ``Accept-Encoding`` header."""
+    if not accept_encoding:
+        return "identity"
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return "identity"
+
+
+def _build_payload(
+    fields: Optional[tuple[str, ...]],
+    service_fields: Optional[tuple[str, ...]],
+    offset: int,
+    limit: Optional[int],
+) -> dict:
+    categories = list_categories()
+    total = len(categories)
+    if offset or limit is not None:
+        categories = categories[offset:offset + limit if limit is not None else None]
+
+    # Services are ServiceRecords: only the requested keys are decoded
+    projected = []
+    for entry in categories:
+        item = {k: entry[k] for k in (fields or CATEGORY_FIELDS)}
+        if "services" in item:
+            if service_fields is None:
+                item["services"] = [dict(svc) for svc in item["services"]]
+            else:
+                item["services"] = [
+                    {k: svc[k] for k in service_fields if k in svc} for svc in item["services"]
+                ]
+        projected.append(item)
+
+    payload = {"services": projected}
+    if limit is not None:
+        payload["total"] = total
+        end = offset + len(projected)
+        payload["next_offset"] = end if end < total else None
+    return payload
+
+
+_views_lock = threading.Lock()
+
+
+def get_services_body(
+    fields: Optional[tuple[str, ...]] = None,
+    service_fields: Optional[tuple[str, ...]] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+) -> EncodedBody:
+    """Return the serialized ``/services`` view for the current catalog version.
+
+    ``fields`` selects category-level fields (see ``CATEGORY_FIELDS``),
+    ``service_fields`` selects keys of each service, and ``offset``/``limit``
+    page over categories. Views are cached with the current collection's
+    catalog until it is refreshed.
+    """
+    version, views = catalog_cached("services_views", lambda: (get_catalog_version(), OrderedDict()))
+    key = (fields, service_fields, offset, limit)
+    with _views_lock:
+        body = views.get(key)
+        if body is not None:
+            views.move_to_end(key)
+            return body
+
+    body = EncodedBody(_build_payload(fields, service_fields, offset, limit), version)
+    with _views_lock:
+        views[key] = body
+        while len(views) > _MAX_VIEWS:
+            views.popitem(last=False)
+    return body
@@ -0,0 +1,443 @@
+"""Plan skeletons: the recurring shapes of our plans with the request values cut out.
+
+Most plans are one of a handful of shapes (scrape -> normalize -> analyses,
+username fan-out across platforms, face search). A skeleton is such a shape
+with its request-specific values (URLs, usernames, hashtags, keywords, the
+platform, AI instructions) replaced by named slots.
+
+``build_skeleton_library`` mines skeletons from (prompt, plan) pairs: the
+few-shot examples, feedback corrections (parsed back from their message)
+and the generation log. ``SkeletonLibrary.match`` picks a skeleton for a
+prompt with a local TF-IDF nearest-neighbour classifier over the prompts
+each skeleton was mined from; the planner then asks the LLM only for the
+slot values and builds the plan with ``Skeleton.fill``.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Iterable, Iterator, Literal
+
+from pydantic import BaseModel, Field, create_model
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlmodel import Session
+
+from app.config import settings
+from app.models.feedback import QueryBuilderLog
+from app.models.step_types import QueryPlan, StepPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.assembler import PLATFORM_NAMES, describe_step
+from app.services.catalog import catalog_cached, list_categories
+from app.services.compact_plan import RELATED_SUFFIX, derive_metadata
+from app.services.message_parser import MessageParseError, parse_message
+
+logger = logging.getLogger(__name__)
+
+# Service params whose value comes from the request
+_SERVICE_SLOTS = ("url", "username", "keyword", "hashtag")
+# Scripter params whose value comes from the request
+_SCRIPTER_SLOTS = ("keywords", "target", "narrative_topics")
+
+SLOT_DESCRIPTIONS = {
+    "platform": "platform the data comes from, lowercase",
+    "url": "URL from the request, as given",
+    "username": "username without the @",
+    "hashtag": "hashtag without the #",
+    "keyword": "search keyword or phrase",
+    "keywords": "comma-separated keywords to match posts against",
+    "target": "entity the posts should mention",
+    "narrative_topics": "comma-separated narrative topics",
+    "instruction": "what this AI step should do, as one imperative sentence",
+}
+
+_URL = re.compile(r"https?://\S+")
+_MENTION = re.compile(r"@[\w.]+")
+_HASHTAG = re.compile(r"#\w+")
+_WORD = re.compile(r"[a-z0-9]+")
+_PLATFORM_WORDS = re.compile(
+    r"\b(" + "|".join(sorted([*PLATFORM_NAMES, "tweet", "tweets"], key=len, reverse=True)) + r")\b"
+)
+
+
+class SkeletonError(ValueError):
+    """Raised when a skeleton can't be filled into a valid plan."""
+
+
+def _slot_base(name: str) -> str:
+    """``keyword_2`` -> ``keyword``."""
+    return re.sub(r"_\d+$", "", name)
+
+
+def extract_skeleton(plan: QueryPlan) -> tuple[list[dict], dict[str, str]]:
+    """Split ``plan`` into template steps and the slot values cut out of it.
+
+    Slot references in the template are ``{"$slot": name}``; a service
+    category on the plan's only platform becomes
+    ``{"$slot": "platform", "suffix": "_posts"}``. Plans that span several
+    platforms (e.g. a username fan-out) keep their categories literal.
+    """
+    values: dict[str, str] = {}
+
+    def slot(base: str, value) -> dict:
+        value = str(value)
+        for name, existing in values.items():
+            if existing == value and _slot_base(name) == base:
+                return {"$slot": name}
+        name, n = base, 2
+        while name in values:
+            name, n = f"{base}_{n}", n + 1
+        values[name] = value
+        return {"$slot": name}
+
+    platforms = {
+        s.service_category.partition("_")[0]
+        for s in plan.steps
+        if s.type == "service" and s.service_category and s.service_category.partition("_")[0] in PLATFORM_NAMES
+    }
+    platform = next(iter(platforms)) if len(platforms) == 1 else None
+    if platform:
+        values["platform"] = platform
+
+    steps = []
+    for step in plan.steps:
+        template = {"type": step.type, "related_steps": list(step.related_steps)}
+        params = dict(step.params)
+        if step.type == "service":
+            category = step.service_category
+            if platform and category and category.startswith(platform + "_"):
+                category = {"$slot": "platform", "suffix": category[len(platform):]}
+            template["service_category"] = category
+            template["initiator"] = step.initiator
+            for key in _SERVICE_SLOTS:
+                if params.get(key):
+                    params[key] = slot(key, params[key])
+        elif step.type == "scripter":
+            if platform and params.get("platform") == platform:
+                params["platform"] = {"$slot": "platform"}
+            for key in _SCRIPTER_SLOTS:
+                if params.get(key):
+                    params[key] = slot(key, params[key])
+        else:
+            template["description"] = slot("instruction", RELATED_SUFFIX.sub("", step.description))
+        template["params"] = params
+        steps.append(template)
+    return steps, values
+
+
+def skeleton_id(steps: list[dict]) -> str:
+    return hashlib.sha1(json.dumps(steps, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def _resolve(value, values: dict[str, str]):
+    if isinstance(value, dict) and "$slot" in value:
+        return values[value["$slot"]] + value.get("suffix", "")
+    return value
+
+
+def _placeholder(value):
+    if isinstance(value, dict) and "$slot" in value:
+        return f"<{value['$slot']}>{value.get('suffix', '')}"
+    return value
+
+
+class Skeleton:
+    """A plan shape with named slots; see ``extract_skeleton``."""
+
+    __slots__ = ("id", "steps", "slots", "prompts", "support", "curated")
+
+    def __init__(self, steps: list[dict], slots: list[str]):
+        self.id = skeleton_id(steps)
+        self.steps = steps
+        self.slots = slots
+        self.prompts: list[str] = []
+        self.support = 0
+        self.curated = False
+
+    def outline(self) -> str:
+        """The skeleton in the compact plan format, with ``<slot>`` placeholders."""
+        steps = []
+        for template in self.steps:
+            step = {"t": template["type"]}
+            if template.get("service_category"):
+                step["c"] = _placeholder(template["service_category"])
+            if template.get("initiator"):
+                step["i"] = template["initiator"]
+            if template["params"]:
+                step["p"] = {key: _placeholder(value) for key, value in template["params"].items()}
+            if template["related_steps"]:
+                step["r"] = template["related_steps"]
+            if template.get("description"):
+                step["d"] = _placeholder(template["description"])
+            steps.append(step)
+        return json.dumps(steps, separators=(",", ":"), ensure_ascii=False)
+
+    def _platforms(self, categories: dict[str, set[str]]) -> list[str]:
+        """Platforms for which every platform-templated service step exists in the catalog."""
+        templated = [
+            (t["service_category"]["suffix"], t.get("initiator"))
+            for t in self.steps
+            if isinstance(t.get("service_category"), dict)
+        ]
+        return [
+            platform
+            for platform in PLATFORM_NAMES
+            if all(
+                f"{platform}{suffix}" in categories
+                and (initiator is None or initiator in categories[f"{platform}{suffix}"])
+                for suffix, initiator in templated
+            )
+        ]
+
+    def slot_model(self) -> type[BaseModel]:
+        """Pydantic model the LLM fills, cached with the current catalog.
+
+        Platform choices come from the current catalog; raises ``SkeletonError``
+        if the catalog no longer offers the skeleton's services.
+        """
+        return catalog_cached(("skeleton_slots", self.id), self._build_slot_model)
+
+    def _build_slot_model(self) -> type[BaseModel]:
+        categories = _catalog_initiators()
+        for template in self.steps:
+            category = template.get("service_category")
+            if template["type"] == "service" and not isinstance(category, dict):
+                _check_service(category, template.get("initiator"), categories)
+
+        fields: dict = {
+            "fits": (bool, Field(description="false if the plan doesn't do what the request asks, or the request's platform isn't offered")),
+        }
+        for name in self.slots:
+            base = _slot_base(name)
+            if base == "platform":
+                platforms = self._platforms(categories)
+                if not platforms:
+                    raise SkeletonError(f"skeleton {self.id}: no platform in the catalog offers its services")
+                fields[name] = (Literal[tuple(platforms)], Field(description=SLOT_DESCRIPTIONS[base]))
+            else:
+                fields[name] = (str, Field(description=SLOT_DESCRIPTIONS.get(base, base)))
+        return create_model("SkeletonSlots", **fields)
+
+    def fill(self, values: dict, prompt: str | None = None) -> QueryPlan:
+        """Build the plan for the given slot values; raise ``SkeletonError`` if it isn't valid.
+
+        With ``prompt``, a platform slot must name a platform the prompt
+        mentions (when it mentions any), so the LLM can't swap in another one.
+        """
+        cleaned: dict[str, str] = {}
+        for name in self.slots:
+            value = str(values.get(name) or "").strip()
+            base = _slot_base(name)
+            if base == "username":
+                value = value.lstrip("@")
+            elif base == "hashtag":
+                value = value.lstrip("#")
+            elif base == "platform":
+                value = value.lower()
+            if not value:
+                raise SkeletonError(f"slot {name} is empty")
+            cleaned[name] = value
+        if prompt is not None and "platform" in cleaned:
+            mentioned = mentioned_platforms(prompt)
+            if mentioned and cleaned["platform"] not in mentioned:
+                raise SkeletonError(f"the request asks for {', '.join(sorted(mentioned))}, not {cleaned['platform']}")
+
+        categories = _catalog_initiators()
+        steps = []
+        for number, template in enumerate(self.steps, 1):
+            step = StepPlan(
+                type=template["type"],
+                service_category=_resolve(template.get("service_category"), cleaned),
+                initiator=template.get("initiator"),
+                description=_resolve(template.get("description"), cleaned) or "",
+                related_steps=list(template["related_steps"]),
+                params={key: _resolve(value, cleaned) for key, value in template["params"].items()},
+            )
+            if step.type == "service":
+                _check_service(step.service_category, step.initiator, categories)
+            step.description = describe_step(step, number)
+            steps.append(step)
+        return QueryPlan(steps=steps, metadata=derive_metadata(steps))
+
+
+def _catalog_initiators() -> dict[str, set[str]]:
+    return catalog_cached(
+        "initiators_by_category", lambda: {c["category"]: set(c["initiators"]) for c in list_categories()}
+    )
+
+
+def _check_service(category: str | None, initiator: str | None, categories: dict[str, set[str]]) -> None:
+    initiators = categories.get(category)
+    if initiators is None or (initiator and initiator not in initiators):
+        raise SkeletonError(f"no {category} service for {initiator} in the catalog")
+
+
+def mentioned_platforms(prompt: str) -> set[str]:
+    return {"twitter" if word.startswith("tweet") else word for word in _PLATFORM_WORDS.findall(prompt.lower())}
+
+
+def tokenize(prompt: str) -> list[str]:
+    """Prompt words, with URLs, @mentions, #hashtags and platform names replaced by their kind."""
+    text = _URL.sub(" xurl ", prompt)
+    text = _MENTION.sub(" xuser ", text)
+    text = _HASHTAG.sub(" xhashtag ", text).lower()
+    text = _PLATFORM_WORDS.sub(" xplatform ", text)
+    return _WORD.findall(text)
+
+
+class IntentClassifier:
+    """TF-IDF nearest-neighbour classifier over labelled prompts.
+
+    A prompt's score for a label is its best cosine similarity to any
+    prompt with that label; lookups go through an inverted index, so the
+    cost grows with the prompt's words, not the number of examples.
+    """
+
+    def __init__(self, examples: Iterable[tuple[str, str]]):
+        documents = [(Counter(tokenize(prompt)), label) for prompt, label in examples]
+        df = Counter(token for counts, _ in documents for token in counts)
+        self._idf = {token: math.log((len(documents) + 1) / (n + 1)) + 1 for token, n in df.items()}
+        self._labels = [label for _, label in documents]
+        self._index: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        for doc, (counts, _) in enumerate(documents):
+            vector = self._vector(counts)
+            for token, weight in vector.items():
+                self._index[token].append((doc, weight))
+
+    def _vector(self, counts: Counter) -> dict[str, float]:
+        weights = {token: n * self._idf[token] for token, n in counts.items() if token in self._idf}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {token: w / norm for token, w in weights.items()}
+
+    def scores(self, prompt: str) -> dict[str, float]:
+        dots: dict[int, float] = defaultdict(float)
+        for token, weight in self._vector(Counter(tokenize(prompt))).items():
+            for doc, doc_weight in self._index[token]:
+                dots[doc] += weight * doc_weight
+        best: dict[str, float] = {}
+        for doc, score in dots.items():
+            label = self._labels[doc]
+            if score > best.get(label, 0.0):
+                best[label] = score
+        return best
+
+    def classify(self, prompt: str) -> tuple[str | None, float]:
+        scores = self.scores(prompt)
+        if not scores:
+            return None, 0.0
+        label = max(scores, key=scores.get)
+        return label, scores[label]
+
+
+class SkeletonLibrary:
+    def __init__(self, skeletons: list[Skeleton], min_score: float):
+        self.skeletons = {s.id: s for s in skeletons}
+        self.min_score = min_score
+        self._classifier = IntentClassifier((p, s.id) for s in skeletons for p in s.prompts)
+
+    def match(self, prompt: str) -> tuple[Skeleton, float] | None:
+        """Return the best skeleton for ``prompt`` and its score, if it scores at least ``min_score``."""
+        label, score = self._classifier.classify(prompt)
+        if label is None or score < self.min_score:
+            return None
+        return self.skeletons[label], score
+
+    def __len__(self) -> int:
+        return len(self.skeletons)
+
+
+def build_skeleton_library(
+    pairs: Iterable[tuple[str, QueryPlan, str]],
+    min_support: int,
+    min_score: float,
+    max_prompts: int = 50,
+) -> SkeletonLibrary:
+    """Mine skeletons from ``(prompt, plan, source)`` pairs.
+
+    Skeletons from the few-shot examples (source ``"example"``) are always
+    kept; mined ones need ``min_support`` occurrences. Each skeleton keeps
+    up to ``max_prompts`` distinct prompts for the classifier.
+    """
+    skeletons: dict[str, Skeleton] = {}
+    for prompt, plan, source in pairs:
+        steps, values = extract_skeleton(plan)
+        key = skeleton_id(steps)
+        skeleton = skeletons.get(key)
+        if skeleton is None:
+            skeleton = skeletons[key] = Skeleton(steps, list(values))
+        skeleton.support += 1
+        skeleton.curated = skeleton.curated or source == "example"
+        if len(skeleton.prompts) < max_prompts and prompt not in skeleton.prompts:
+            skeleton.prompts.append(prompt)
+    kept = [s for s in skeletons.values() if s.curated or s.support >= min_support]
+    return SkeletonLibrary(kept, min_score)
+
+
+def example_pairs() -> Iterator[tuple[str, QueryPlan, str]]:
+    for example in EXAMPLES:
+        yield example["input"], QueryPlan.model_validate(example["plan"]), "example"
+
+
+def correction_pairs(engine: Engine, limit: int) -> Iterator[tuple[str, QueryPlan, str]]:
+    """The most recent user-corrected plans whose message parses back into a plan."""
+    with Session(engine) as session:
+        rows = session.execute(
+            select(QueryBuilderLog.input_prompt, QueryBuilderLog.final_message)
+            .where(QueryBuilderLog.was_edited == True)  # noqa: E712
+            .order_by(QueryBuilderLog.id.desc())
+            .limit(limit)
+        ).all()
+    for prompt, message in rows:
+        try:
+            yield prompt, parse_message(message), "correction"
+        except (MessageParseError, ValueError) as e:
+            logger.debug("Skipping correction for %r: %s", prompt, e)
+
+
+def log_pairs(records: Iterable[dict], skip_prompts: set[str]) -> Iterator[tuple[str, QueryPlan, str]]:
+    """Generated plans from the generation log, except for prompts the user corrected."""
+    for record in records:
+        if not record.get("plan") or record.get("kind") == "refine" or record.get("prompt") in skip_prompts:
+            continue
+        try:
+            yield record["prompt"], QueryPlan.model_validate(record["plan"]), "log"
+        except ValueError:
+            continue
+
+
+def load_skeleton_library(
+    engine: Engine | None, records: Iterable[dict], min_support: int, min_score: float, corrections_limit: int
+) -> SkeletonLibrary:
+    """Mine the library from the few-shot examples, corrections and generation log records.
+
+    Reading corrections back into plans needs the catalog. If it can't be
+    loaded, the library is mined without them rather than failing start-up.
+    """
+    corrections = []
+    if engine is not None:
+        try:
+            corrections = list(correction_pairs(engine, corrections_limit))
+        except Exception:
+            logger.warning("Mining skeletons without corrections: the catalog is unavailable", exc_info=True)
+    corrected = {prompt for prompt, _, _ in corrections}
+    pairs = [*example_pairs(), *corrections, *log_pairs(records, corrected)]
+    return build_skeleton_library(pairs, min_support, min_score)
+
+
+_LIBRARY: SkeletonLibrary | None = None
+
+
+def get_skeleton_library() -> SkeletonLibrary:
+    """Return the active library; built from the few-shot examples alone until one is set."""
+    global _LIBRARY
+    if _LIBRARY is None:
+        _LIBRARY = build_skeleton_library(example_pairs(), settings.skeleton_min_support, settings.skeleton_min_score)
+    return _LIBRARY
+
+
+def set_skeleton_library(library: SkeletonLibrary | None) -> None:
+    global _LIBRARY
+    _LIBRARY = library
@@ -0,0 +1,277 @@
+"""Lightweight request tracing.
+
+Spans nest through a ``ContextVar``, so a span opened in the ASGI
+middleware is the parent of spans opened by the planner, catalog and
+assembler, including across Starlette's threadpool hop. Finished spans go
+to a background exporter:
+
+- ``file``: one OTLP-JSON span per line in ``tracing_file``
+- ``otlp``: batches POSTed as OTLP/HTTP JSON to ``tracing_otlp_endpoint``
+  (any OpenTelemetry collector, Jaeger or Tempo)
+
+With ``tracing_exporter=none`` (the default) every span is a shared no-op
+object and nothing is recorded. Log records get a ``trace_id`` attribute
+so plain-text logs can be correlated with spans.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import httpx
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_exporter: Optional["SpanExporter"] = None
+
+
+def _attr_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict) -> None:
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.end_ns:
+            return
+        self.end_ns = time.time_ns()
+        if self._token is not None:
+            try:
+                _current_span.reset(self._token)
+            except ValueError:
+                # Ended from a different context (e.g. an instructor hook); leave the var alone
+                pass
+            self._token = None
+        if _exporter is not None:
+            _exporter.export(self)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": k, "value": _attr_value(v)} for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+
+class _NoopSpan:
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: dict) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+def start_span(name: str, **attributes) -> Span | _NoopSpan:
+    """Start a span as a child of the current one and make it current. Call ``end()`` to finish it."""
+    if _exporter is None:
+        return NOOP_SPAN
+    span_ = Span(name, _current_span.get(), {k: v for k, v in attributes.items() if v is not None})
+    span_._token = _current_span.set(span_)
+    return span_
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span | _NoopSpan]:
+    """Context manager around ``start_span`` that records exceptions."""
+    if _exporter is None:
+        yield NOOP_SPAN
+        return
+    span_ = start_span(name, **attributes)
+    try:
+        yield span_
+    except BaseException as e:
+        span_.record_exception(e)
+        raise
+    finally:
+        span_.end()
+
+
+def current_trace_id() -> Optional[str]:
+    span_ = _current_span.get()
+    return span_.trace_id if span_ else None
+
+
+class SpanExporter:
+    """Batches finished spans on a background thread and writes them out."""
+
+    def __init__(self, kind: str, batch_size: int = 256, flush_interval: float = 1.0):
+        self.kind = kind
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._stopping = threading.Event()
+
+    def start(self) -> None:
+        if self.kind == "file":
+            Path(settings.tracing_file).parent.mkdir(parents=True, exist_ok=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        self._thread.join(timeout)
+
+    def export(self, span_: Span) -> None:
+        try:
+            self._queue.put_nowait(span_)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> list[Span]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._drain()
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception:
+                    logger.warning("Failed to export %d spans", len(batch), exc_info=True)
+            elif self._stopping.is_set():
+                return
+
+    def _write(self, batch: list[Span]) -> None:
+        if self.kind == "file":
+            with open(settings.tracing_file, "a", encoding="utf-8") as f:
+                for span_ in batch:
+                    f.write(json.dumps(span_.to_otlp()) + "\n")
+            return
+
+        body = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": settings.tracing_service_name}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.services.tracing"},
+                    "spans": [span_.to_otlp() for span_ in batch],
+                }],
+            }]
+        }
+        httpx.post(settings.tracing_otlp_endpoint, json=body, timeout=5).raise_for_status()
+
+
+def configure_tracing() -> None:
+    """Start the exporter selected by ``tracing_exporter`` (no-op for ``none``)."""
+    global _exporter
+    kind = settings.tracing_exporter.lower()
+    if kind == "none" or _exporter is not None:
+        return
+    if kind not in ("file", "otlp"):
+        raise ValueError(f"Unsupported TRACING_EXPORTER: {settings.tracing_exporter}")
+    exporter = SpanExporter(kind)
+    exporter.start()
+    _exporter = exporter
+    logger.info("Tracing enabled (%s exporter)", kind)
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans and stop the exporter."""
+    global _exporter
+    exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.stop()
+
+
+class TraceIdFilter(logging.Filter):
+    """Adds ``record.trace_id`` ("-" outside a trace) for log formatting."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = current_trace_id() or "-"
+        return True
+
+
+class TracingMiddleware:
+    """ASGI middleware that opens a root span per HTTP request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _exporter is None:
+            await self.app(scope, receive, send)
+            return
+
+        with span("http.request", **{"http.method": scope["method"], "http.route": scope["path"]}) as span_:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span_.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
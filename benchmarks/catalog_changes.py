@@ -0,0 +1,96 @@
+"""
+Client sync cost: full ``/services`` download vs ``/services/changes``.
+
+For each ``--sizes`` entry, loads a synthetic catalog, then reloads it
+with ``--changed`` services modified. Reports the bytes a mirroring client
+downloads to sync (gzip-encoded full body vs the delta), the time to
+build each response, and the time the reload spends diffing the catalogs.
+A stable catalog (no changes) is measured as well.
+
+Usage:
+    python -m benchmarks.catalog_changes
+    python -m benchmarks.catalog_changes --sizes 50000 --changed 10 --output changes.json
+"""
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import catalog
+from app.services.catalog_changes import diff_catalogs
+from app.services.catalog_records import compact_catalog
+from app.services.serialization import dumps
+from app.services.services_response import get_services_body
+from benchmarks.synthetic import synthetic_catalog
+
+
+def _modified(data: dict, count: int) -> dict:
+    changed = {"services": [{**group, "services": list(group["services"])} for group in data["services"]]}
+    for i in range(count):
+        group = changed["services"][i % len(changed["services"])]["services"]
+        group[0] = {**group[0], "description": f"{group[0]['description']} Updated {i}."}
+    return changed
+
+
+def run(sizes: list[int], changed: int) -> dict:
+    results = {}
+    for size in sizes:
+        data = synthetic_catalog(size)
+        served = [data]
+        with patch("app.services.catalog._fetch_catalog_from_qdrant", side_effect=lambda name: served[-1]):
+            catalog.reload_catalog()
+            since = catalog.get_catalog_version()
+
+            start = time.perf_counter()
+            full = get_services_body().encoded("gzip")
+            full_ms = (time.perf_counter() - start) * 1000
+
+            old, new = compact_catalog(data), compact_catalog(_modified(data, changed))
+            start = time.perf_counter()
+            diff_catalogs(old, new)
+            diff_ms = (time.perf_counter() - start) * 1000
+
+            catalog.reload_catalog()  # Unchanged
+            stable = gzip.compress(dumps(catalog.get_catalog_changes(since)))
+            served.append(_modified(data, changed))
+            catalog.reload_catalog()
+            start = time.perf_counter()
+            delta = gzip.compress(dumps(catalog.get_catalog_changes(since)))
+            delta_ms = (time.perf_counter() - start) * 1000
+
+        results[str(size)] = {
+            "full_bytes": len(full),
+            "full_build_ms": full_ms,
+            "stable_delta_bytes": len(stable),
+            "delta_bytes": len(delta),
+            "delta_build_ms": delta_ms,
+            "diff_ms": diff_ms,
+        }
+        r = results[str(size)]
+        print(
+            f"services={size:<7} full {r['full_bytes']:>10,} B ({r['full_build_ms']:.0f} ms)  "
+            f"delta[{changed} changed] {r['delta_bytes']:>7,} B ({r['delta_build_ms']:.2f} ms)  "
+            f"stable {r['stable_delta_bytes']} B  diff on reload {r['diff_ms']:.1f} ms",
+            flush=True,
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Catalog sizes (services)")
+    parser.add_argument("--changed", type=int, default=10, help="Services modified between the two versions")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.changed)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
@@ -0,0 +1,93 @@
+"""
+Per-worker memory of the service catalog: plain dicts vs ``ServiceRecord``s.
+
+For each ``--sizes`` entry, synthetic Qdrant points are grouped the way
+``_fetch_catalog_from_qdrant`` does, once into plain service dicts (the
+old representation) and once into compact records. Reports the memory
+each catalog keeps alive (tracemalloc, after the points are released) and
+the time per call of the request-path reads (``find_service`` name and
+initiators) and of decoding a service's nested fields.
+
+Usage:
+    python -m benchmarks.catalog_memory
+    python -m benchmarks.catalog_memory --sizes 1000,50000 --output catalog_memory.json
+"""
+
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import catalog
+from app.services.catalog_records import compact_catalog
+from benchmarks.microbench import measure
+from benchmarks.synthetic import synthetic_catalog
+
+
+def retained_bytes(build) -> tuple[int, object]:
+    """Return the bytes still allocated after ``build()`` returns, and its result."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = build()
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return after - before, result
+
+
+def run(sizes: list[int], min_time: float) -> dict:
+    results = {}
+    for size in sizes:
+        plain_bytes, plain = retained_bytes(lambda: synthetic_catalog(size))
+        compact_bytes, compact = retained_bytes(lambda: compact_catalog(synthetic_catalog(size)))
+
+        last = compact["services"][-1]["category"]
+        with patch("app.services.catalog._fetch_catalog_from_qdrant", return_value=compact):
+            catalog.reload_catalog()
+        record = catalog.find_service(last, "image")
+        cases = {
+            "find_service": lambda: catalog.find_service(last, "image")["initiators"],
+            "decode_sample_input": lambda: record["sample_input"],
+            "decode_service": lambda: dict(record),
+        }
+        timings = {name: measure(func, min_time)["median_us"] for name, func in cases.items()}
+
+        results[str(size)] = {
+            "plain_mb": plain_bytes / 2**20,
+            "compact_mb": compact_bytes / 2**20,
+            "reduction": 1 - compact_bytes / plain_bytes,
+            "bytes_per_service": compact_bytes / size,
+            "timings_us": timings,
+        }
+        del plain
+        r = results[str(size)]
+        print(
+            f"services={size:<7} plain {r['plain_mb']:8.1f} MB  compact {r['compact_mb']:8.1f} MB  "
+            f"({r['reduction']:.0%} less, {r['bytes_per_service']:.0f} B/service)  "
+            + "  ".join(f"{k} {v:.1f} µs" for k, v in timings.items()),
+            flush=True,
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Catalog sizes (services)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each case")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.min_time)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
@@ -0,0 +1,76 @@
+"""
+Latency of ``/services/search`` queries against synthetic catalogs.
+
+For each ``--sizes`` entry, builds the search index of a synthetic catalog
+(reporting the build time, paid once per catalog version) and measures the
+median time of each query in ``QUERIES`` with ``measure``, plus the size
+of the response compared with the full ``/services`` body a client would
+otherwise download to search locally.
+
+Usage:
+    python -m benchmarks.catalog_search
+    python -m benchmarks.catalog_search --sizes 1000,50000 --output search.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services import catalog
+from app.services.catalog_search import get_search_index, search_services
+from app.services.serialization import dumps
+from app.services.services_response import get_services_body
+from benchmarks.microbench import measure
+from benchmarks.synthetic import synthetic_catalog
+
+# (query, initiators)
+QUERIES = [
+    ("twitter", None),
+    ("twit user", None),
+    ("instagram posts url", None),
+    ("facebook gro", ("url",)),
+    ("scraper", None),
+    ("tiktok videos variant 4", None),
+    ("", ("image",)),
+]
+
+
+def run(sizes: list[int], min_time: float) -> dict:
+    results = {}
+    for size in sizes:
+        with patch("app.services.catalog._fetch_catalog_from_qdrant", return_value=synthetic_catalog(size)):
+            catalog.reload_catalog()
+        start = time.perf_counter()
+        index = get_search_index()
+        build_ms = (time.perf_counter() - start) * 1000
+        full_bytes = len(get_services_body().identity)
+        print(f"services={size}  index build {build_ms:.0f} ms  full /services {full_bytes:,} B", flush=True)
+
+        cases = {}
+        for query, initiators in QUERIES:
+            key = f"{query!r}" + (f" initiators={','.join(initiators)}" if initiators else "")
+            timing = measure(lambda: index.search(query, initiators, 10), min_time)
+            body = len(dumps(search_services(query, initiators, 10)))
+            cases[key] = {"median_us": timing["median_us"], "response_bytes": body}
+            print(f"  {key:<38} {timing['median_us']:10.1f} µs  {body:>6} B", flush=True)
+        results[str(size)] = {"index_build_ms": build_ms, "full_services_bytes": full_bytes, "queries": cases}
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Catalog sizes (services)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each query")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(",")], args.min_time)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
@@ -0,0 +1,26 @@
+"""Shared helpers for the benchmark scripts."""
+
+import math
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Return the ``pct`` percentile (0-100) of ``values`` using nearest-rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize_latencies(latencies_ms: list[float]) -> dict:
+    """Return count/mean/p50/p95/p99/max for a list of latencies in milliseconds."""
+    if not latencies_ms:
+        return {"count": 0, "mean_ms": 0.0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+    return {
+        "count": len(latencies_ms),
+        "mean_ms": sum(latencies_ms) / len(latencies_ms),
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+        "max_ms": max(latencies_ms),
+    }
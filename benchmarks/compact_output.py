@@ -0,0 +1,116 @@
+"""
+Output tokens and latency of the full vs compact plan output formats.
+
+1. Token counts: every few-shot example plan, and synthetic plans of each
+   ``--steps`` size, serialized as the LLM would write them in each format
+   and counted with litellm's tokenizer for ``--model``.
+2. End-to-end generation: ``generate_plan`` runs each example prompt in
+   both formats. By default it talks to the fake LLM server, which delays
+   each response by ``--token-latency`` seconds per output token; with
+   ``--live`` it uses the configured model (and Qdrant catalog) and
+   reports real completion tokens and latency.
+
+Usage:
+    python -m benchmarks.compact_output
+    python -m benchmarks.compact_output --token-latency 0.02 --output compact.json
+    python -m benchmarks.compact_output --live --repeats 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.compact_plan import compact_json, compact_plan
+from app.services.planner import generate_plan
+from benchmarks.fake_servers import FakeLLMServer, FakeQdrantServer
+from benchmarks.synthetic import synthetic_plan
+
+
+def count_tokens(model: str, text: str) -> int:
+    import litellm
+
+    return litellm.token_counter(model=model, text=text)
+
+
+def token_counts(model: str, steps: list[int]) -> list[dict]:
+    plans = [(f"example {i}", QueryPlan.model_validate(ex["plan"])) for i, ex in enumerate(EXAMPLES, 1)]
+    plans += [(f"synthetic {n} steps", synthetic_plan(n)) for n in steps]
+
+    rows = []
+    for name, plan in plans:
+        full = count_tokens(model, plan.model_dump_json(exclude_none=True))
+        compact = count_tokens(model, compact_json(compact_plan(plan)))
+        rows.append({"plan": name, "full_tokens": full, "compact_tokens": compact, "reduction": 1 - compact / full})
+    return rows
+
+
+def generation_latency(repeats: int) -> dict:
+    results = {}
+    for output_format in ("full", "compact"):
+        latencies, tokens = [], []
+        for _ in range(repeats):
+            for ex in EXAMPLES:
+                stats: dict = {}
+                generate_plan(ex["input"], stats=stats, use_cache=False, output_format=output_format)
+                latencies.append(stats["llm_latency_ms"])
+                if stats.get("completion_tokens") is not None:
+                    tokens.append(stats["completion_tokens"])
+        results[output_format] = {
+            "median_latency_ms": statistics.median(latencies),
+            "mean_completion_tokens": statistics.mean(tokens) if tokens else None,
+        }
+    full, compact = results["full"], results["compact"]
+    results["latency_reduction"] = 1 - compact["median_latency_ms"] / full["median_latency_ms"]
+    if full["mean_completion_tokens"] and compact["mean_completion_tokens"]:
+        results["token_reduction"] = 1 - compact["mean_completion_tokens"] / full["mean_completion_tokens"]
+    return results
+
+
+def _print_generation(results: dict) -> None:
+    for output_format in ("full", "compact"):
+        r = results[output_format]
+        tokens = f"{r['mean_completion_tokens']:.0f}" if r["mean_completion_tokens"] else "-"
+        print(f"{output_format:<8} median LLM latency {r['median_latency_ms']:8.1f} ms  mean completion tokens {tokens}")
+    print(f"latency reduction {results['latency_reduction']:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="gpt-4o-mini", help="Tokenizer used for the token counts")
+    parser.add_argument("--steps", default="5,20,50", help="Synthetic plan sizes")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Fake LLM seconds per output token")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--live", action="store_true", help="Use the configured LLM instead of the fake server")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    rows = token_counts(args.model, [int(s) for s in args.steps.split(",")])
+    print(f"{'plan':<22} {'full':>6} {'compact':>8} {'saved':>7}")
+    for row in rows:
+        print(f"{row['plan']:<22} {row['full_tokens']:>6} {row['compact_tokens']:>8} {row['reduction']:>7.1%}")
+
+    if args.live:
+        generation = generation_latency(args.repeats)
+    else:
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        with FakeLLMServer(token_latency=args.token_latency) as llm, FakeQdrantServer() as qdrant, patch.multiple(
+            settings, llm_provider="openai", model_name=args.model, openai_api_base=f"{llm.url}/v1",
+            qdrant_url=qdrant.url, qdrant_api_key="",
+        ):
+            generation = generation_latency(args.repeats)
+    print()
+    _print_generation(generation)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"tokens": rows, "generation": generation, "live": args.live}, f, indent=2)
+        print(f"\nSaved results to {args.output}")
@@ -0,0 +1,128 @@
+"""
+Hit rate and accuracy of the entity-abstracted plan cache.
+
+Replays (prompt, plan) pairs in order through an exact-match ``PlanCache``
+and the ``EntityPlanCache``: each pair is looked up first and stored on a
+miss, as ``generate_plan`` does. Reports the share of requests each layer
+would have answered without the LLM, how often an entity hit matches the
+plan the LLM actually produced (steps and metadata), and lookup latency.
+
+Pairs come from ``--log-dir`` (a generation log), or by default from
+templated synthetic traffic: the few-shot examples with their URLs,
+@usernames and #hashtags swapped for values from small pools.
+
+Usage:
+    python -m benchmarks.entity_cache
+    python -m benchmarks.entity_cache --requests 20000 --output entity_cache.json
+    python -m benchmarks.entity_cache --log-dir ./generation_log
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.entity_cache import EntityPlanCache, extract_entities
+from app.services.generation_log import iter_records
+from app.services.plan_cache import PlanCache, plan_cache_key
+
+MODEL = "bench-model"
+POOL = ["alpha", "bravo", "charlie", "delta", "echo", "foxtrot", "golf", "hotel", "india", "juliet"]
+
+
+def synthetic_pairs(count: int, seed: int = 0) -> list[tuple[str, QueryPlan]]:
+    """Few-shot requests with their entities replaced by random pool values (plans updated to match)."""
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        example = rng.choice(EXAMPLES)
+        prompt, plan_json = example["input"], json.dumps(example["plan"])
+        for value in extract_entities(prompt)[1]:
+            new = value.rsplit("/", 1)[0] + "/" + rng.choice(POOL) if value.startswith("http") else rng.choice(POOL) + str(rng.randrange(100))
+            prompt = prompt.replace(value, new)
+            plan_json = plan_json.replace(value, new)
+        pairs.append((prompt, QueryPlan.model_validate_json(plan_json)))
+    return pairs
+
+
+def log_pairs(log_dir: str, limit: int) -> list[tuple[str, QueryPlan]]:
+    pairs = []
+    for record in iter_records(log_dir):
+        if record.get("plan") and record.get("kind") != "refine":
+            pairs.append((record["prompt"], QueryPlan.model_validate(record["plan"])))
+            if len(pairs) >= limit:
+                break
+    return pairs
+
+
+def _same(a: QueryPlan, b: QueryPlan) -> bool:
+    return (
+        [(s.type, s.service_category, s.initiator, s.params, s.related_steps) for s in a.steps]
+        == [(s.type, s.service_category, s.initiator, s.params, s.related_steps) for s in b.steps]
+        and a.metadata == b.metadata
+    )
+
+
+def replay(pairs: list[tuple[str, QueryPlan]], cache_size: int) -> dict:
+    exact = PlanCache(cache_size, ttl=10**9)
+    entity = EntityPlanCache(cache_size, ttl=10**9)
+    exact_hits = entity_hits = agree = stored = 0
+    lookup_ns = 0
+    for prompt, plan in pairs:
+        key = plan_cache_key(MODEL, prompt)
+        start = time.perf_counter_ns()
+        cached = exact.get(key)
+        if cached is None:
+            cached = entity.get(MODEL, prompt)
+            lookup_ns += time.perf_counter_ns() - start
+            if cached is not None:
+                entity_hits += 1
+                agree += _same(cached, plan)
+                continue
+        else:
+            lookup_ns += time.perf_counter_ns() - start
+            exact_hits += 1
+            continue
+        exact.put(key, plan)
+        stored += entity.put(MODEL, prompt, None, plan)
+
+    n = len(pairs)
+    return {
+        "requests": n,
+        "exact_hit_rate": exact_hits / n,
+        "entity_hit_rate": entity_hits / n,
+        "llm_calls_saved": (exact_hits + entity_hits) / n,
+        "entity_agreement": agree / entity_hits if entity_hits else None,
+        "generalized_plans": stored,
+        "mean_lookup_us": lookup_ns / n / 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="Synthetic requests (or log records to read)")
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--log-dir", help="Replay this generation log instead of synthetic traffic")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    pairs = log_pairs(args.log_dir, args.requests) if args.log_dir else synthetic_pairs(args.requests)
+    results = replay(pairs, args.cache_size)
+    print(f"requests            {results['requests']}")
+    print(f"exact hit rate      {results['exact_hit_rate']:.1%}")
+    print(f"entity hit rate     {results['entity_hit_rate']:.1%}")
+    print(f"LLM calls saved     {results['llm_calls_saved']:.1%}")
+    if results["entity_agreement"] is not None:
+        print(f"entity agreement    {results['entity_agreement']:.1%}")
+    print(f"mean lookup         {results['mean_lookup_us']:.1f} us")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
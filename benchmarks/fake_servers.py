@@ -0,0 +1,201 @@
+"""Local stand-ins for the LLM and Qdrant used by the load tests.
+
+Both run on stdlib ``ThreadingHTTPServer`` in background threads so the
+benchmark has no external dependencies and measures only our own service.
+
+- ``FakeLLMServer`` speaks the OpenAI chat-completions protocol and answers
+  every tool call with the plan of the closest few-shot example (as a
+  ``CompactPlan`` when that is the requested tool; a ``PlanPatch`` request
+  gets a patch appending a sentiment step to the current plan, and a
+  ``SkeletonSlots`` request gets its slots filled from the request text),
+  after a fixed delay
+  plus an optional per-output-token delay that mimics decoding speed.
+- ``FakeQdrantServer`` serves ``/collections/{name}/points/scroll`` over a
+  synthetic catalog of configurable size.
+"""
+
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.compact_plan import compact_json, compact_plan
+from benchmarks.synthetic import synthetic_points
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class _BackgroundServer:
+    handler_class: type[BaseHTTPRequestHandler]
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), self.handler_class)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self.requests = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "_BackgroundServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def pick_example(prompt: str) -> dict:
+    """Return the few-shot example whose input shares the most words with ``prompt``."""
+    words = set(prompt.lower().split())
+    return max(EXAMPLES, key=lambda ex: len(words & set(ex["input"].lower().split())))
+
+
+def sentiment_patch(message: str) -> str:
+    """Return a ``PlanPatch`` adding a sentiment step after the last step of the refine message's plan."""
+    current = message.split("Current plan:", 1)[-1].split("\n\nChange:", 1)[0]
+    last = len(json.loads(current)["s"])
+    step = {"t": "scripter", "p": {"operation": "sentiment"}, "r": [last]}
+    return json.dumps({"ops": [{"op": "insert", "at": last, "step": step}]})
+
+
+def fill_slots(properties: dict, message: str) -> str:
+    """Fill a ``SkeletonSlots`` schema from the "Request:" part of a skeleton message."""
+    request = message.split("Request:", 1)[-1]
+    patterns = {"url": r"https?://\S+", "username": r"@([\w.]+)", "hashtag": r"#(\w+)"}
+    values: dict = {"fits": True}
+    for name, schema in properties.items():
+        if name == "fits":
+            continue
+        base = re.sub(r"_\d+$", "", name)
+        choices = schema.get("enum") or ([schema["const"]] if "const" in schema else None)
+        if choices:
+            values[name] = next((c for c in choices if c in request.lower()), choices[0])
+        elif base in patterns and (match := re.search(patterns[base], request)):
+            values[name] = match.group(match.lastindex or 0)
+        else:
+            values[name] = " ".join(request.split()[-2:]) or base
+    return json.dumps(values)
+
+
+class _LLMHandler(_QuietHandler):
+    def do_POST(self):
+        owner: FakeLLMServer = self.server.owner
+        owner.requests += 1
+        body = self._read_json()
+
+        user_messages = [m for m in body.get("messages", []) if m.get("role") == "user"]
+        prompt = user_messages[-1]["content"] if user_messages else ""
+        if isinstance(prompt, list):
+            prompt = " ".join(part.get("text", "") for part in prompt if isinstance(part, dict))
+        tools = body.get("tools") or [{"function": {"name": "QueryPlan"}}]
+        plan = pick_example(prompt)["plan"]
+        if tools[0]["function"]["name"] == "PlanPatch":
+            arguments = sentiment_patch(prompt)
+        elif tools[0]["function"]["name"] == "SkeletonSlots":
+            arguments = fill_slots(tools[0]["function"]["parameters"]["properties"], prompt)
+        elif tools[0]["function"]["name"] == "CompactPlan":
+            arguments = compact_json(compact_plan(QueryPlan.model_validate(plan)))
+        else:
+            arguments = json.dumps(plan)
+
+        delay = owner.latency + owner.token_latency * (len(arguments) // 4)
+        if delay:
+            time.sleep(delay)
+
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in body.get("messages", []))
+        self._send_json(200, {
+            "id": f"chatcmpl-fake-{owner.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": f"call_{owner.requests}",
+                        "type": "function",
+                        "function": {"name": tools[0]["function"]["name"], "arguments": arguments},
+                    }],
+                },
+            }],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(arguments) // 4,
+                "total_tokens": (prompt_chars + len(arguments)) // 4,
+            },
+        })
+
+
+class FakeLLMServer(_BackgroundServer):
+    handler_class = _LLMHandler
+
+    def __init__(self, latency: float = 0.0, token_latency: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.token_latency = token_latency  # Seconds per completion token (~4 chars)
+
+
+class _QdrantHandler(_QuietHandler):
+    def do_POST(self):
+        owner: FakeQdrantServer = self.server.owner
+        owner.requests += 1
+        if not self.path.endswith("/points/scroll"):
+            self._send_json(404, {"status": {"error": "not found"}})
+            return
+
+        body = self._read_json()
+        limit = int(body.get("limit", 10))
+        offset = int(body.get("offset") or 0)
+        page = owner.points[offset:offset + limit]
+        next_offset = offset + limit if offset + limit < len(owner.points) else None
+
+        if owner.page_latency:
+            time.sleep(owner.page_latency)
+        self._send_json(200, {
+            "result": {"points": page, "next_page_offset": next_offset},
+            "status": "ok",
+            "time": 0.0,
+        })
+
+
+class FakeQdrantServer(_BackgroundServer):
+    handler_class = _QdrantHandler
+
+    def __init__(self, catalog_size: int = 500, page_latency: float = 0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.points = synthetic_points(catalog_size)
+        self.page_latency = page_latency
@@ -0,0 +1,291 @@
+"""
+End-to-end load test for the query builder.
+
+Starts a fake LLM and a fake Qdrant (see ``benchmarks/fake_servers.py``),
+launches the real app under uvicorn pointed at them, then drives
+``/generate``, ``/services`` and ``/feedback`` at each concurrency level.
+For every (endpoint, concurrency) pair it reports throughput, p50/p99
+latency and the server's resident memory.
+
+Results are written to ``benchmarks/results/<commit>-<timestamp>.json``.
+``--compare`` prints the change against an earlier result file and exits
+non-zero when throughput or p99 latency regress past ``--threshold``.
+
+Usage:
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 1,16,64 --requests 500 --llm-latency 0.2
+    python -m benchmarks.load_test --compare benchmarks/results/abc1234-20260101T120000.json
+    python -m benchmarks.load_test --prompts training/data/catalog_pairs.jsonl
+
+``--prompts`` replaces the built-in /generate prompts with the ``input``
+of each line of a pairs file (e.g. from training/generate_from_catalog.py).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.common import summarize_latencies
+from benchmarks.fake_servers import FakeLLMServer, FakeQdrantServer
+
+ROOT_DIR = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+
+PROMPTS = [
+    "Scrape posts from this Facebook group: https://facebook.com/groups/example",
+    "Search Twitter for posts about climate change",
+    "Get Instagram posts from @bbc and also search for #breakingnews",
+    "Scrape TikTok videos about #cooking and normalize the data",
+    "Find Instagram posts by #iranprotest and detect photo locations",
+    "Find all social media profiles for username johndoe123",
+]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb(pid: int) -> dict:
+    """Return current and peak resident memory of ``pid`` in MB (Linux only)."""
+    values = {}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key, value = line.split(":", 1)
+                    values[key] = int(value.split()[0]) / 1024
+    except OSError:
+        return {"rss_mb": None, "peak_rss_mb": None}
+    return {"rss_mb": values.get("VmRSS"), "peak_rss_mb": values.get("VmHWM")}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_prompts(path: Path, limit: int) -> list[str]:
+    """Read up to ``limit`` prompts from a pairs JSONL file."""
+    prompts = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                prompts.append(json.loads(line)["input"])
+                if len(prompts) >= limit:
+                    break
+    if not prompts:
+        raise ValueError(f"No prompts in {path}")
+    return prompts
+
+
+def _request_for(endpoint: str, i: int, prompts: list[str] = PROMPTS) -> tuple[str, str, dict | None]:
+    if endpoint == "/generate":
+        return "POST", endpoint, {"prompt": f"{prompts[i % len(prompts)]} (run {i})"}
+    if endpoint == "/feedback":
+        return "POST", endpoint, {
+            "user_id": i % 100,
+            "input_prompt": prompts[i % len(prompts)],
+            "generated_message": "1. [service] Search Twitter",
+            "final_message": "1. [service] Search Twitter for posts" if i % 3 else "1. [service] Search Twitter",
+            "rating": 1 + i % 5,
+        }
+    return "GET", endpoint, None
+
+
+async def run_scenario(
+    base_url: str, endpoint: str, concurrency: int, requests: int, prompts: list[str] = PROMPTS
+) -> dict:
+    """Send ``requests`` calls to ``endpoint`` with at most ``concurrency`` in flight."""
+    latencies: list[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+
+        async def worker() -> None:
+            nonlocal errors
+            for i in counter:
+                method, path, body = _request_for(endpoint, i, prompts)
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.request(method, path, json=body)
+                    await resp.aread()
+                    if resp.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        **summarize_latencies(latencies),
+    }
+
+
+def app_env(llm: FakeLLMServer, qdrant: FakeQdrantServer, tmp_dir: Path, plan_cache_size: int = 0) -> dict:
+    """Environment that points the app at the fake servers and a scratch database."""
+    return {
+        **os.environ,
+        "LLM_PROVIDER": "openai",
+        "MODEL_NAME": "gpt-4o-mini",
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_API_BASE": f"{llm.url}/v1",
+        "QDRANT_URL": qdrant.url,
+        "QDRANT_API_KEY": "",
+        "DATABASE_URL": f"sqlite:///{tmp_dir / 'bench.db'}",
+        "GENERATION_LOG_DIR": str(tmp_dir / "generation_log"),
+        "PLAN_CACHE_SIZE": str(plan_cache_size),
+        "ENTITY_CACHE_SIZE": str(plan_cache_size),
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+        "LOG_LEVEL": "warning",
+    }
+
+
+def _start_app(port: int, llm: FakeLLMServer, qdrant: FakeQdrantServer, tmp_dir: Path, args) -> subprocess.Popen:
+    env = app_env(llm, qdrant, tmp_dir, args.plan_cache_size)
+    cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+    return subprocess.Popen(cmd, cwd=ROOT_DIR, env=env)
+
+
+def wait_healthy(base_url: str, timeout: float = 60.0) -> float:
+    """Block until ``/health`` answers; return the seconds it took."""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"App did not become healthy within {timeout}s")
+
+
+def run(args) -> dict:
+    endpoints = [e if e.startswith("/") else f"/{e}" for e in args.endpoints.split(",")]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    prompts = load_prompts(args.prompts, args.requests * len(levels)) if args.prompts else PROMPTS
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeLLMServer(latency=args.llm_latency) as llm, \
+            FakeQdrantServer(catalog_size=args.catalog_size) as qdrant:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        proc = _start_app(port, llm, qdrant, Path(tmp), args)
+        try:
+            startup_s = wait_healthy(base_url)
+            # First /services call pays the catalog load; keep it out of the measurements
+            httpx.get(f"{base_url}/services", timeout=120)
+            results = []
+            for endpoint in endpoints:
+                for level in levels:
+                    result = asyncio.run(run_scenario(base_url, endpoint, level, args.requests, prompts))
+                    result.update(rss_mb(proc.pid))
+                    results.append(result)
+                    print(
+                        f"{endpoint:<10} c={level:<4} {result['throughput_rps']:8.1f} req/s  "
+                        f"p50={result['p50_ms']:7.1f}ms  p99={result['p99_ms']:7.1f}ms  "
+                        f"rss={result['rss_mb'] or 0:.0f}MB  errors={result['errors']}",
+                        flush=True,
+                    )
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "requests": args.requests,
+            "concurrency": levels,
+            "llm_latency_s": args.llm_latency,
+            "catalog_size": args.catalog_size,
+            "workers": args.workers,
+            "plan_cache_size": args.plan_cache_size,
+        },
+        "startup_s": startup_s,
+        "llm_requests": llm.requests,
+        "qdrant_requests": qdrant.requests,
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print per-scenario deltas; return descriptions of regressions beyond ``threshold`` (a fraction)."""
+    base = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for r in current["results"]:
+        old = base.get((r["endpoint"], r["concurrency"]))
+        if old is None:
+            continue
+        rps_delta = (r["throughput_rps"] - old["throughput_rps"]) / (old["throughput_rps"] or 1)
+        p99_delta = (r["p99_ms"] - old["p99_ms"]) / (old["p99_ms"] or 1)
+        print(f"{r['endpoint']:<10} c={r['concurrency']:<4} throughput {rps_delta:+7.1%}  p99 {p99_delta:+7.1%}")
+        if rps_delta < -threshold or p99_delta > threshold:
+            regressions.append(f"{r['endpoint']} c={r['concurrency']}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="/generate,/services,/feedback")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM response delay in seconds")
+    parser.add_argument("--catalog-size", type=int, default=500, help="Services in the fake Qdrant collection")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--plan-cache-size", type=int, default=0, help="0 measures uncached generation")
+    parser.add_argument("--prompts", type=Path, help="Pairs JSONL whose inputs replace the built-in prompts")
+    parser.add_argument("--output", type=Path, help="Result file (default: benchmarks/results/<commit>-<ts>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed regression as a fraction")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    output = args.output
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        output = RESULTS_DIR / f"{report['commit']}-{stamp}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved results to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print(f"\nRegressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
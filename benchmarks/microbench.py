@@ -0,0 +1,168 @@
+"""
+Microbenchmarks for the CPU-side hot paths.
+
+Catalog views (``get_services_summary``, ``build_system_prompt``,
+``find_service``, ``list_categories``, the cached ``/services`` body) run against synthetic catalogs of
+each ``--sizes`` entry; assembly (``build_message``, ``build_response``)
+runs against synthetic plans of each ``--steps`` entry. For every case we
+record the median time per call and the peak memory allocated by one call
+(tracemalloc).
+
+With ``--baseline`` the run is compared with an earlier result file and
+exits non-zero when any case is slower, or allocates more, than
+``--threshold`` allows.
+
+Usage:
+    python -m benchmarks.microbench
+    python -m benchmarks.microbench --sizes 100,1000,50000 --steps 1,10,100 --output base.json
+    python -m benchmarks.microbench --baseline base.json --threshold 0.2
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.prompts.system_prompt import build_system_prompt
+from app.services import catalog
+from app.services.assembler import build_message, build_response
+from app.services.services_response import get_services_body
+from benchmarks.synthetic import synthetic_catalog, synthetic_plan
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2, repeats: int = 5) -> dict:
+    """Return median seconds per call and peak bytes allocated by a single call."""
+    func()  # warm up caches and lazy imports
+
+    # Calibrate the loop count so each repeat runs for about min_time / repeats
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_time / repeats or loops >= 1_000_000:
+            break
+        loops *= 2 if elapsed == 0 else max(2, int((min_time / repeats) / elapsed) + 1)
+
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            for _ in range(loops):
+                func()
+            timings.append((time.perf_counter() - t0) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"median_us": statistics.median(timings) * 1e6, "peak_alloc_kb": peak / 1024, "loops": loops}
+
+
+def _install_catalog(data: dict) -> None:
+    with patch("app.services.catalog._fetch_catalog_from_qdrant", return_value=data):
+        catalog.reload_catalog()
+
+
+def run(sizes: list[int], steps: list[int], min_time: float) -> dict:
+    results = {}
+
+    for size in sizes:
+        data = synthetic_catalog(size)
+        _install_catalog(data)
+        last = data["services"][-1]["category"]
+        cases = {
+            "get_services_summary": catalog.get_services_summary,
+            "build_system_prompt": build_system_prompt,
+            "find_service": lambda: catalog.find_service(last, "image"),
+            "list_categories": catalog.list_categories,
+            "services_body": lambda: get_services_body().encoded("gzip"),
+        }
+        for name, func in cases.items():
+            key = f"{name}[services={size}]"
+            results[key] = measure(func, min_time)
+            _print(key, results[key])
+
+    for count in steps:
+        plan = synthetic_plan(count)
+        message = build_message(plan)
+        cases = {
+            "build_message": lambda: build_message(plan),
+            "build_response": lambda: build_response(plan, message),
+        }
+        for name, func in cases.items():
+            key = f"{name}[steps={count}]"
+            results[key] = measure(func, min_time)
+            _print(key, results[key])
+
+    return results
+
+
+def _print(key: str, result: dict) -> None:
+    print(f"{key:<45} {result['median_us']:12.1f} µs  {result['peak_alloc_kb']:10.1f} KB", flush=True)
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """Return descriptions of cases that regressed past ``threshold`` (a fraction)."""
+    regressions = []
+    for key, result in current.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        time_delta = (result["median_us"] - old["median_us"]) / (old["median_us"] or 1)
+        alloc_delta = (result["peak_alloc_kb"] - old["peak_alloc_kb"]) / (old["peak_alloc_kb"] or 1)
+        flag = ""
+        if time_delta > threshold or alloc_delta > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<45} time {time_delta:+7.1%}  alloc {alloc_delta:+7.1%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,1000,10000,50000", help="Catalog sizes (services)")
+    parser.add_argument("--steps", default="1,10,100", help="Plan lengths (steps)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each case")
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="Earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression as a fraction")
+    args = parser.parse_args()
+
+    results = run(
+        [int(s) for s in args.sizes.split(",")],
+        [int(s) for s in args.steps.split(",")],
+        args.min_time,
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline}:")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed beyond {args.threshold:.0%}")
+            sys.exit(1)
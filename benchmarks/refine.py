@@ -0,0 +1,127 @@
+"""
+Tokens and latency of refining a plan with a patch vs regenerating it.
+
+For each few-shot example the "edit" is adding a sentiment step at the end:
+
+1. Token counts: the ``PlanPatch`` the LLM writes for the edit vs the full
+   (and compact) plan it would write when regenerating, counted with
+   litellm's tokenizer for ``--model``. Synthetic plans of each ``--steps``
+   size show how the gap grows with plan length.
+2. End-to-end: ``refine_plan`` vs ``generate_plan`` (cache off) against
+   the fake LLM server, which delays each response by ``--token-latency``
+   seconds per output token; with ``--live`` both use the configured model
+   (and Qdrant catalog) with ``--instruction`` as the change request.
+
+Usage:
+    python -m benchmarks.refine
+    python -m benchmarks.refine --token-latency 0.02 --output refine.json
+    python -m benchmarks.refine --live --instruction "also add sentiment"
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.compact_plan import compact_json, compact_plan
+from app.services.planner import generate_plan, refine_plan
+from benchmarks.compact_output import count_tokens
+from benchmarks.fake_servers import FakeLLMServer, FakeQdrantServer, sentiment_patch
+from benchmarks.synthetic import synthetic_plan
+
+
+def token_counts(model: str, steps: list[int]) -> list[dict]:
+    plans = [(f"example {i}", QueryPlan.model_validate(ex["plan"])) for i, ex in enumerate(EXAMPLES, 1)]
+    plans += [(f"synthetic {n} steps", synthetic_plan(n)) for n in steps]
+
+    rows = []
+    for name, plan in plans:
+        compact = compact_json(compact_plan(plan))
+        patch_tokens = count_tokens(model, sentiment_patch(f"Current plan: {compact}\n\nChange: add sentiment"))
+        full = count_tokens(model, plan.model_dump_json(exclude_none=True))
+        rows.append({
+            "plan": name,
+            "full_tokens": full,
+            "compact_tokens": count_tokens(model, compact),
+            "patch_tokens": patch_tokens,
+            "reduction": 1 - patch_tokens / full,
+        })
+    return rows
+
+
+def generation_latency(repeats: int, instruction: str) -> dict:
+    plans = [(ex["input"], QueryPlan.model_validate(ex["plan"])) for ex in EXAMPLES]
+    runs = {
+        "regenerate": lambda prompt, plan, stats: generate_plan(
+            f"{prompt}, {instruction}", stats=stats, use_cache=False, output_format="full"
+        ),
+        "refine": lambda prompt, plan, stats: refine_plan(plan, instruction, stats=stats),
+    }
+    results = {}
+    for name, run in runs.items():
+        latencies, tokens = [], []
+        for _ in range(repeats):
+            for prompt, plan in plans:
+                stats: dict = {}
+                run(prompt, plan, stats)
+                latencies.append(stats["llm_latency_ms"])
+                if stats.get("completion_tokens") is not None:
+                    tokens.append(stats["completion_tokens"])
+        results[name] = {
+            "median_latency_ms": statistics.median(latencies),
+            "mean_completion_tokens": statistics.mean(tokens) if tokens else None,
+        }
+    full, refined = results["regenerate"], results["refine"]
+    results["latency_reduction"] = 1 - refined["median_latency_ms"] / full["median_latency_ms"]
+    if full["mean_completion_tokens"] and refined["mean_completion_tokens"]:
+        results["token_reduction"] = 1 - refined["mean_completion_tokens"] / full["mean_completion_tokens"]
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="gpt-4o-mini", help="Tokenizer used for the token counts")
+    parser.add_argument("--steps", default="5,20,50", help="Synthetic plan sizes")
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Fake LLM seconds per output token")
+    parser.add_argument("--instruction", default="also analyze sentiment")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--live", action="store_true", help="Use the configured LLM instead of the fake server")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    rows = token_counts(args.model, [int(s) for s in args.steps.split(",")])
+    print(f"{'plan':<22} {'full':>6} {'compact':>8} {'patch':>6} {'saved':>7}")
+    for row in rows:
+        print(
+            f"{row['plan']:<22} {row['full_tokens']:>6} {row['compact_tokens']:>8} "
+            f"{row['patch_tokens']:>6} {row['reduction']:>7.1%}"
+        )
+
+    if args.live:
+        generation = generation_latency(args.repeats, args.instruction)
+    else:
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        with FakeLLMServer(token_latency=args.token_latency) as llm, FakeQdrantServer() as qdrant, patch.multiple(
+            settings, llm_provider="openai", model_name=args.model, openai_api_base=f"{llm.url}/v1",
+            qdrant_url=qdrant.url, qdrant_api_key="",
+        ):
+            generation = generation_latency(args.repeats, args.instruction)
+    print()
+    for name in ("regenerate", "refine"):
+        r = generation[name]
+        tokens = f"{r['mean_completion_tokens']:.0f}" if r["mean_completion_tokens"] else "-"
+        print(f"{name:<10} median LLM latency {r['median_latency_ms']:8.1f} ms  mean completion tokens {tokens}")
+    print(f"latency reduction {generation['latency_reduction']:.1%}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"tokens": rows, "generation": generation, "live": args.live}, f, indent=2)
+        print(f"\nSaved results to {args.output}")
@@ -0,0 +1,105 @@
+"""
+Replay the generation log against a running query builder as a load test.
+
+Each logged /generate call is re-sent with its original prompt, options and
+catalog collection; logged refinements go to /generate/refine with their
+base plan.
+By default requests are fired as fast as the concurrency limit allows;
+``--speed`` instead preserves the recorded inter-arrival times (2.0 = twice
+as fast as production).
+
+Usage:
+    python -m benchmarks.replay_generation_log --url http://127.0.0.1:8100 --concurrency 8
+    python -m benchmarks.replay_generation_log --limit 500 --speed 1.0
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.services.generation_log import iter_records
+from benchmarks.common import summarize_latencies
+
+
+def request_for(record: dict) -> tuple[str, dict]:
+    """Return the endpoint and body that reproduce a logged call."""
+    if record.get("kind") == "refine":
+        path, body = "/generate/refine", {"plan": record["base_plan"], "instruction": record["prompt"]}
+    else:
+        path, body = "/generate", {"prompt": record["prompt"]}
+    body["options"] = record.get("options") or {}
+    if record.get("collection"):
+        body["collection"] = record["collection"]
+    return path, body
+
+
+async def replay(
+    records: list[dict],
+    url: str,
+    concurrency: int = 4,
+    speed: float | None = None,
+    timeout: float = 120.0,
+) -> dict:
+    """Re-send every record to ``url`` and return throughput and latency stats."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    errors = 0
+    origin_ts = records[0].get("ts", 0) if records else 0
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        started = time.perf_counter()
+
+        async def send(record: dict) -> None:
+            nonlocal errors
+            if speed:
+                delay = (record.get("ts", origin_ts) - origin_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            async with semaphore:
+                t0 = time.perf_counter()
+                try:
+                    path, body = request_for(record)
+                    resp = await client.post(path, json=body)
+                    if resp.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        await asyncio.gather(*(send(r) for r in records))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(records),
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(records) / elapsed if elapsed else 0.0,
+        **summarize_latencies(latencies),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log-dir", default=settings.generation_log_dir)
+    parser.add_argument("--url", default=f"http://127.0.0.1:{settings.port}")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--limit", type=int, help="Replay only the first N records")
+    parser.add_argument("--speed", type=float, help="Preserve recorded pacing, scaled by this factor")
+    args = parser.parse_args()
+
+    records = list(itertools.islice(iter_records(args.log_dir), args.limit))
+    if not records:
+        print(f"No generation log records found in {args.log_dir}")
+        sys.exit(1)
+
+    stats = asyncio.run(replay(records, args.url, args.concurrency, args.speed))
+    print(json.dumps(stats, indent=2))
@@ -0,0 +1,92 @@
+"""
+Per-response serialization cost of ``/generate``.
+
+Compares, for synthetic plans of each ``--steps`` size, the work done
+after the plan is known:
+
+- ``fastapi_default``: validated response models returned to FastAPI, which
+  re-validates them against ``response_model`` and serializes them
+- ``fast``: ``build_response`` (constructed without re-validation) rendered
+  by ``FastJSONResponse``
+
+Both paths produce the same JSON document; the savings column is the
+per-response difference.
+
+Usage:
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --steps 1,10,50,100 --output serialization.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.routing import serialize_response
+
+from app.main import app
+from app.models.schemas import GenerateResponse
+from app.services.assembler import build_message, build_response
+from app.services.serialization import FastJSONResponse
+from benchmarks.microbench import measure
+from benchmarks.synthetic import synthetic_plan
+
+
+def _generate_route():
+    return next(r for r in app.routes if getattr(r, "path", None) == "/generate")
+
+
+def run(steps: list[int], min_time: float) -> dict:
+    field = _generate_route().response_field
+    loop = asyncio.new_event_loop()
+    results = {}
+
+    for count in steps:
+        plan = synthetic_plan(count)
+        message = build_message(plan)
+
+        def fastapi_default() -> bytes:
+            # What the endpoint did before: validated models, then FastAPI's
+            # response-model validation and serialization (minus the threadpool hop)
+            result = GenerateResponse.model_validate(build_response(plan, message).model_dump())
+            return loop.run_until_complete(serialize_response(
+                field=field, response_content=result, is_coroutine=True, dump_json=True,
+            ))
+
+        def fast() -> bytes:
+            return FastJSONResponse(build_response(plan, message)).body
+
+        assert json.loads(fastapi_default()) == json.loads(fast())
+        old, new = measure(fastapi_default, min_time), measure(fast, min_time)
+        results[count] = {
+            "fastapi_default_us": old["median_us"],
+            "fast_us": new["median_us"],
+            "saved_us": old["median_us"] - new["median_us"],
+            "speedup": old["median_us"] / new["median_us"] if new["median_us"] else None,
+        }
+        r = results[count]
+        print(
+            f"steps={count:<4} default {r['fastapi_default_us']:9.1f} µs  fast {r['fast_us']:9.1f} µs  "
+            f"saved {r['saved_us']:9.1f} µs  ({r['speedup']:.1f}x)",
+            flush=True,
+        )
+
+    loop.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", default="1,5,10,25,50,100", help="Plan sizes (steps)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds spent timing each case")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.steps.split(",")], args.min_time)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.output}")
@@ -0,0 +1,141 @@
+"""
+Skeleton planning vs full planning.
+
+1. Classifier: how many of ``PROMPTS`` (paraphrases of the few-shot
+   requests plus a few that match nothing) get a skeleton, and how long
+   ``SkeletonLibrary.match`` takes per prompt.
+2. Generation: ``generate_plan`` (cache off) for each prompt with skeleton
+   planning off and on, reporting median LLM latency, prompt and completion
+   tokens and how often the skeleton path fell back. By default it talks to
+   the fake LLM server, which delays each response by ``--token-latency``
+   seconds per output token; ``--live`` uses the configured model and
+   catalog.
+
+``--log-dir`` mines the library from a generation log as well as the
+few-shot examples (as the server does at startup).
+
+Usage:
+    python -m benchmarks.skeletons
+    python -m benchmarks.skeletons --token-latency 0.02 --output skeletons.json
+    python -m benchmarks.skeletons --live --log-dir ./generation_log
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.services.generation_log import recent_records
+from app.services.planner import generate_plan
+from app.services.skeletons import get_skeleton_library, load_skeleton_library, set_skeleton_library
+from benchmarks.fake_servers import FakeLLMServer, FakeQdrantServer
+
+PROMPTS = [
+    "Scrape posts from this Twitter page: https://twitter.com/nasa",
+    "Search Twitter for posts about electric cars",
+    "Search TikTok for posts about street food",
+    "Get Twitter posts from @bbcworld and also search for #ukraine",
+    "Scrape TikTok videos about #skincare and normalize the data",
+    "Analyze sentiment and narratives of Twitter posts about @nasa mentioning Artemis, with keywords: moon, rocket",
+    "Find Instagram posts by #wildfire and detect photo locations",
+    "Find all social media profiles for username janedoe",
+    "Run a face search on this picture to find matching profiles",
+    "Compare engagement of three competitors over the last quarter",
+    "Which subreddits discuss our product the most?",
+]
+
+
+def classifier_stats(repeats: int = 200) -> dict:
+    library = get_skeleton_library()
+    matched = [p for p in PROMPTS if library.match(p) is not None]
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for prompt in PROMPTS:
+            library.match(prompt)
+    per_match_us = (time.perf_counter() - start) / (repeats * len(PROMPTS)) * 1e6
+    return {"skeletons": len(library), "prompts": len(PROMPTS), "matched": len(matched), "match_us": per_match_us}
+
+
+def generation_stats(repeats: int) -> dict:
+    results = {}
+    for mode, enabled in (("full", False), ("skeleton", True)):
+        latencies, prompt_tokens, completion_tokens, used, fallbacks = [], [], [], 0, 0
+        with patch.object(settings, "skeleton_planning", enabled):
+            for _ in range(repeats):
+                for prompt in PROMPTS:
+                    stats: dict = {}
+                    generate_plan(prompt, stats=stats, use_cache=False, output_format="full")
+                    attempt = stats.get("skeleton_fallback") or {}
+                    latencies.append(stats["llm_latency_ms"] + (attempt.get("llm_latency_ms") or 0))
+                    if stats.get("prompt_tokens") is not None:
+                        prompt_tokens.append(stats["prompt_tokens"] + (attempt.get("prompt_tokens") or 0))
+                        completion_tokens.append(stats["completion_tokens"] + (attempt.get("completion_tokens") or 0))
+                    used += stats.get("skeleton") is not None
+                    fallbacks += bool(attempt)
+        results[mode] = {
+            "median_latency_ms": statistics.median(latencies),
+            "mean_prompt_tokens": statistics.mean(prompt_tokens) if prompt_tokens else None,
+            "mean_completion_tokens": statistics.mean(completion_tokens) if completion_tokens else None,
+            "skeleton_used": used,
+            "fallbacks": fallbacks,
+        }
+    results["latency_reduction"] = 1 - results["skeleton"]["median_latency_ms"] / results["full"]["median_latency_ms"]
+    return results
+
+
+def _run(args) -> dict:
+    if args.log_dir:
+        set_skeleton_library(load_skeleton_library(
+            None, recent_records(args.log_dir, settings.skeleton_log_limit),
+            settings.skeleton_min_support, settings.skeleton_min_score, 0,
+        ))
+    classifier = classifier_stats()
+    print(
+        f"{classifier['skeletons']} skeletons; matched {classifier['matched']}/{classifier['prompts']} prompts; "
+        f"{classifier['match_us']:.1f} us per match"
+    )
+    generation = generation_stats(args.repeats)
+    for mode in ("full", "skeleton"):
+        r = generation[mode]
+        tokens = (
+            f"prompt {r['mean_prompt_tokens']:.0f} / completion {r['mean_completion_tokens']:.0f} tokens"
+            if r["mean_prompt_tokens"] is not None else "tokens -"
+        )
+        print(
+            f"{mode:<9} median LLM latency {r['median_latency_ms']:8.1f} ms  {tokens}  "
+            f"skeleton used {r['skeleton_used']}, fell back {r['fallbacks']}"
+        )
+    print(f"latency reduction {generation['latency_reduction']:.1%}")
+    return {"classifier": classifier, "generation": generation}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Fake LLM seconds per output token")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--log-dir", help="Also mine skeletons from this generation log")
+    parser.add_argument("--live", action="store_true", help="Use the configured LLM instead of the fake server")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    if args.live:
+        results = _run(args)
+    else:
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+        with FakeLLMServer(token_latency=args.token_latency) as llm, FakeQdrantServer() as qdrant, patch.multiple(
+            settings, llm_provider="openai", model_name="gpt-4o-mini", openai_api_base=f"{llm.url}/v1",
+            qdrant_url=qdrant.url, qdrant_api_key="",
+        ):
+            results = _run(args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({**results, "live": args.live}, f, indent=2)
+        print(f"\nSaved results to {args.output}")
@@ -0,0 +1,173 @@
+"""
+Worker start-up benchmark.
+
+Measures three things:
+
+- import time of ``app.main`` (``python -X importtime``), with the slowest
+  modules it imports directly, and whether the LLM SDKs were pulled in eagerly
+- cold start to first ``/generate`` response for each launcher: plain
+  ``uvicorn --workers N`` and ``python -m app.serve`` with and without
+  preload, against the fake LLM and Qdrant servers
+- proportional set size (PSS) summed over the server processes, which
+  counts pages shared copy-on-write between forked workers only once
+
+Usage:
+    python -m benchmarks.startup
+    python -m benchmarks.startup --workers 4 --catalog-size 5000 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_servers import FakeLLMServer, FakeQdrantServer
+from benchmarks.load_test import ROOT_DIR, app_env, free_port, git_commit
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+LAUNCHERS = {
+    "uvicorn": ["-m", "uvicorn", "app.main:app", "--no-access-log"],
+    "serve-preload": ["-m", "app.serve"],
+    "serve-no-preload": ["-m", "app.serve", "--no-preload"],
+}
+
+
+def measure_import_time(top: int = 10) -> dict:
+    """Import ``app.main`` in a fresh interpreter and break down where the time goes."""
+    code = "import sys, app.main; print(sorted(m for m in ('litellm', 'instructor') if m in sys.modules))"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        env={**os.environ, "LITELLM_LOCAL_MODEL_COST_MAP": "True"},
+    )
+    modules = []
+    total = None
+    for line in proc.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name, cumulative_ms = match.group(4), int(match.group(2)) / 1000
+        if name == "app.main":
+            total = cumulative_ms
+        elif len(match.group(3)) == 3:  # modules imported directly by app.main
+            modules.append((name, cumulative_ms))
+    modules.sort(key=lambda m: m[1], reverse=True)
+    return {
+        "app_main_ms": total,
+        "slowest": [{"module": name, "cumulative_ms": ms} for name, ms in modules[:top]],
+        "eager_llm_sdks": json.loads(proc.stdout.strip().replace("'", '"')),
+    }
+
+
+def _children(pid: int) -> list[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def _pss_mb(pid: int) -> float | None:
+    """Sum PSS over ``pid`` and its descendants in MB (Linux only)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(_children(current))
+        try:
+            with open(f"/proc/{current}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+        except OSError:
+            return None
+    return total / 1024
+
+
+def measure_cold_start(launcher: str, workers: int, catalog_size: int) -> dict:
+    """Start the app with ``launcher``; time /health and the first /generate on every worker."""
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeLLMServer(latency=0.0) as llm, \
+            FakeQdrantServer(catalog_size=catalog_size) as qdrant:
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        cmd = [
+            sys.executable, *LAUNCHERS[launcher],
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+        ]
+        started = time.perf_counter()
+        proc = subprocess.Popen(cmd, cwd=ROOT_DIR, env=app_env(llm, qdrant, Path(tmp)))
+        try:
+            health_s = None
+            while time.perf_counter() - started < 120:
+                try:
+                    if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                        health_s = time.perf_counter() - started
+                        break
+                except httpx.HTTPError:
+                    time.sleep(0.02)
+            if health_s is None:
+                raise RuntimeError(f"{launcher} did not become healthy")
+
+            # One request per worker on separate connections; the slowest is
+            # the worst first request a user sees
+            first_generate = []
+            for i in range(workers):
+                t0 = time.perf_counter()
+                httpx.post(f"{base_url}/generate", json={"prompt": f"Search Twitter for #startup{i}"}, timeout=120)
+                first_generate.append((time.perf_counter() - t0) * 1000)
+            ready_s = time.perf_counter() - started
+            pss = _pss_mb(proc.pid)
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    return {
+        "launcher": launcher,
+        "workers": workers,
+        "health_s": health_s,
+        "first_generate_ms": first_generate,
+        "first_generate_ready_s": ready_s,
+        "pss_mb": pss,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--catalog-size", type=int, default=500)
+    parser.add_argument("--launchers", default=",".join(LAUNCHERS))
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    imports = measure_import_time()
+    print(f"import app.main: {imports['app_main_ms']:.0f}ms  eager LLM SDKs: {imports['eager_llm_sdks'] or 'none'}")
+    for entry in imports["slowest"]:
+        print(f"  {entry['module']:<32} {entry['cumulative_ms']:8.1f}ms")
+
+    results = []
+    for launcher in args.launchers.split(","):
+        result = measure_cold_start(launcher, args.workers, args.catalog_size)
+        results.append(result)
+        print(
+            f"{launcher:<18} healthy={result['health_s']:.2f}s  "
+            f"first /generate ready={result['first_generate_ready_s']:.2f}s  "
+            f"slowest first request={max(result['first_generate_ms']):.0f}ms  "
+            f"pss={result['pss_mb'] or 0:.0f}MB",
+            flush=True,
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"commit": git_commit(), "imports": imports, "cold_start": results}, f, indent=2)
+        print(f"\nSaved results to {args.output}")
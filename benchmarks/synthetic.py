@@ -0,0 +1,103 @@
+"""Synthetic catalogs and plans for benchmarks.
+
+Everything here is deterministic for a given size, so results are
+comparable between runs and commits.
+"""
+
+from collections import defaultdict
+
+from app.models.step_types import QueryMetadata, QueryPlan, StepPlan
+
+PLATFORMS = ["twitter", "instagram", "facebook", "tiktok", "youtube", "telegram", "reddit", "linkedin"]
+KINDS = ["posts", "profiles", "comments", "videos", "groups", "search"]
+INITIATORS = ["url", "keyword", "username", "hashtag", "image"]
+
+
+def synthetic_points(count: int) -> list[dict]:
+    """Return ``count`` Qdrant points shaped like the production collection."""
+    categories = [f"{platform}_{kind}" for platform in PLATFORMS for kind in KINDS]
+    points = []
+    for i in range(count):
+        category = categories[i % len(categories)]
+        initiator = INITIATORS[(i // len(categories)) % len(INITIATORS)]
+        points.append({
+            "id": i,
+            "payload": {
+                "metadata": {
+                    "category": category,
+                    "initiator": initiator,
+                    "name": f"{category.replace('_', ' ').title()} Scraper {i}",
+                    "type": "apify",
+                    "identifier": f"bench/{category}-{i}",
+                    "api_slug": f"bench~{category}-{i}",
+                    "description": f"Scrape {category.replace('_', ' ')} by {initiator}. Variant {i}.",
+                    "sample_input": {"startUrls": ["{URL}"], "maxItems": 50, "proxy": {"useApifyProxy": True}},
+                    "output_mapping": {"text": "description", "id": "post_id", "author": "author_username"},
+                    "pagination": {"isEnabled": i % 2 == 0, "pageSize": 50},
+                    "source": "bench",
+                },
+            },
+        })
+    return points
+
+
+def synthetic_catalog(count: int) -> dict:
+    """Return a grouped catalog (``_fetch_catalog_from_qdrant`` format) with ``count`` services."""
+    grouped: dict[str, list[dict]] = defaultdict(list)
+    for point in synthetic_points(count):
+        meta = point["payload"]["metadata"]
+        service = {
+            k: v for k, v in meta.items()
+            if k not in ("category", "initiator", "source", "blobType", "loc")
+        }
+        service["initiators"] = [meta["initiator"]]
+        grouped[meta["category"]].append(service)
+    return {
+        "services": [
+            {"category": cat, "services": svcs}
+            for cat, svcs in sorted(grouped.items())
+        ]
+    }
+
+
+def synthetic_plan(step_count: int) -> QueryPlan:
+    """Return a plan with one scrape step followed by ``step_count - 1`` processing steps."""
+    operations = [
+        {"operation": "normalize", "platform": "twitter"},
+        {"operation": "sentiment"},
+        {"operation": "keywords", "keywords": "EV, electric, stock"},
+        {"operation": "mentions_target", "target": "Tesla"},
+        {"operation": "narratives", "narrative_topics": "economy, politics"},
+    ]
+    steps = [
+        StepPlan(
+            type="service",
+            service_category="twitter_posts",
+            initiator="keyword",
+            description="Search Twitter for posts with keyword: climate change",
+            params={"keyword": "climate change"},
+        )
+    ]
+    for i in range(1, step_count):
+        if i % 3 == 0:
+            steps.append(StepPlan(
+                type="ai",
+                description=f"Classify posts by topic group {i}. Related step {i}.",
+                related_steps=[i],
+            ))
+        else:
+            steps.append(StepPlan(
+                type="scripter",
+                description=f"Process posts, stage {i}. Related step {i}.",
+                related_steps=[i],
+                params=operations[i % len(operations)],
+            ))
+    return QueryPlan(
+        steps=steps,
+        metadata=QueryMetadata(
+            source="twitter_posts",
+            target_name="elonmusk",
+            keywords="climate change",
+            narrative_topics="economy, politics",
+        ),
+    )
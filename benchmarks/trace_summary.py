@@ -0,0 +1,72 @@
+"""
+Summarize spans written by the ``file`` tracing exporter.
+
+Prints per-stage latency percentiles, then the share of request time each
+stage takes in the slowest requests, which shows what dominates tail
+latency without needing an external tracing backend.
+
+Usage:
+    python -m benchmarks.trace_summary traces/spans.jsonl [--tail 0.01]
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.common import summarize_latencies
+
+
+def load_spans(path: Path) -> list[dict]:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                span["duration_ms"] = (int(span["endTimeUnixNano"]) - int(span["startTimeUnixNano"])) / 1e6
+                spans.append(span)
+    return spans
+
+
+def summarize(spans: list[dict], tail: float = 0.01) -> dict:
+    by_name: dict[str, list[float]] = defaultdict(list)
+    by_trace: dict[str, list[dict]] = defaultdict(list)
+    for span in spans:
+        by_name[span["name"]].append(span["duration_ms"])
+        by_trace[span["traceId"]].append(span)
+
+    roots = [s for s in spans if "parentSpanId" not in s]
+    roots.sort(key=lambda s: s["duration_ms"], reverse=True)
+    tail_roots = roots[:max(1, int(len(roots) * tail))] if roots else []
+
+    stage_share: dict[str, float] = defaultdict(float)
+    tail_total = sum(r["duration_ms"] for r in tail_roots) or 1.0
+    for root in tail_roots:
+        for span in by_trace[root["traceId"]]:
+            if span is not root:
+                stage_share[span["name"]] += span["duration_ms"] / tail_total
+
+    return {
+        "stages": {name: summarize_latencies(values) for name, values in by_name.items()},
+        "tail_requests": len(tail_roots),
+        "tail_stage_share": dict(sorted(stage_share.items(), key=lambda kv: kv[1], reverse=True)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("spans", type=Path)
+    parser.add_argument("--tail", type=float, default=0.01, help="Fraction of slowest requests to break down")
+    args = parser.parse_args()
+
+    summary = summarize(load_spans(args.spans), args.tail)
+    print(f"{'stage':<28} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in sorted(summary["stages"].items(), key=lambda kv: kv[1]["p99_ms"], reverse=True):
+        print(f"{name:<28} {stats['count']:>7} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}")
+
+    print(f"\nTime share in the slowest {summary['tail_requests']} request(s) (nested stages overlap):")
+    for name, share in summary["tail_stage_share"].items():
+        print(f"  {name:<28} {share:6.1%}")
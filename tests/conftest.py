@@ -1,5 +1,7 @@
+import json
 from unittest.mock import patch
 
+import litellm
 import pytest
 
 _TEST_CATALOG = {
@@ -89,6 +91,35 @@ _TEST_CATALOG = {
 }
 
 
+def tool_call_completion(name: str, arguments: dict, calls: list | None = None, usage: dict | None = None):
+    """Return a litellm completion stand-in that answers every call with one ``name`` tool call.
+
+    The keyword arguments of each call are appended to ``calls`` when given.
+    """
+    def completion(**kwargs):
+        if calls is not None:
+            calls.append(kwargs)
+        return litellm.ModelResponse(
+            model=kwargs["model"],
+            choices=[{
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": "call_1",
+                        "type": "function",
+                        "function": {"name": name, "arguments": json.dumps(arguments)},
+                    }],
+                },
+            }],
+            **({"usage": usage} if usage else {}),
+        )
+
+    return completion
+
+
 @pytest.fixture(autouse=True)
 def mock_qdrant_catalog():
     """Patch _fetch_catalog_from_qdrant to return a test fixture so tests
@@ -96,10 +127,21 @@ def mock_qdrant_catalog():
     with patch("app.services.catalog._fetch_catalog_from_qdrant", return_value=_TEST_CATALOG):
         # Reset the cached catalog so _load_catalog re-fetches via the mock
         import app.services.catalog as cat_mod
-        cat_mod._CATALOG = None
-        cat_mod._CATALOG_LOADED_AT = 0
+        cat_mod._COLLECTIONS.clear()
         yield
 
 
+@pytest.fixture(autouse=True)
+def clear_plan_cache():
+    """Start every test with an empty plan cache."""
+    from app.services.entity_cache import entity_plan_cache
+    from app.services.plan_cache import plan_cache
+    plan_cache.clear()
+    entity_plan_cache.clear()
+    yield
+    plan_cache.clear()
+    entity_plan_cache.clear()
+
+
 def pytest_configure(config):
     config.addinivalue_line("markers", "slow: marks tests as slow (requiring LLM)")
@@ -1,8 +1,10 @@
+import time
 from unittest.mock import patch
 
 from fastapi.testclient import TestClient
 from sqlmodel import SQLModel
 
+from app.config import settings
 from app.main import app, engine
 from app.models.step_types import QueryMetadata, QueryPlan, StepPlan
 
@@ -37,6 +39,16 @@ class TestHealthEndpoint:
         assert response.json() == {"status": "ok"}
 
 
+class TestMetricsEndpoint:
+    def test_metrics_reports_catalog_state(self):
+        client.get("/services")
+        data = client.get("/metrics").json()
+        assert data["catalog"]["loaded"] is True
+        assert data["catalog"]["circuit"] == "closed"
+        assert data["catalog"]["consecutive_failures"] == 0
+        assert set(data["plan_cache"]) == {"size", "hits", "misses"}
+
+
 class TestServicesEndpoint:
     def test_services_returns_list(self):
         response = client.get("/services")
@@ -53,6 +65,50 @@ class TestServicesEndpoint:
         assert "initiators" in first
         assert "services" in first
 
+    def test_services_include_decoded_service_fields(self):
+        twitter = client.get("/services").json()["services"][0]
+        assert twitter["category"] == "twitter_posts"
+        assert twitter["services"][0]["sample_input"] == {"searchTerms": ["{KEYWORD}"]}
+        assert twitter["services"][0]["initiators"] == ["keyword"]
+
+    def test_services_for_another_collection(self, monkeypatch):
+        monkeypatch.setattr(settings, "qdrant_collections", "staging")
+        staging = {"services": [{"category": "staging_posts", "services": []}]}
+        with patch("app.services.catalog._fetch_catalog_from_qdrant", side_effect=lambda name: staging):
+            response = client.get("/services?collection=staging")
+        assert [c["category"] for c in response.json()["services"]] == ["staging_posts"]
+
+    def test_services_unknown_collection(self):
+        assert client.get("/services?collection=nope").status_code == 400
+
+    def test_services_etag_returns_304(self):
+        first = client.get("/services")
+        etag = first.headers["etag"]
+        assert etag.startswith('"')
+        second = client.get("/services", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+
+    def test_services_gzip_variant(self):
+        response = client.get("/services", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+        assert response.json() == client.get("/services", headers={"Accept-Encoding": "identity"}).json()
+
+    def test_services_projection_and_pagination(self):
+        response = client.get("/services?fields=category,initiators&limit=2")
+        data = response.json()
+        assert data["total"] == 3
+        assert data["next_offset"] == 2
+        assert [set(c) for c in data["services"]] == [{"category", "initiators"}] * 2
+
+        rest = client.get("/services?offset=2&limit=2&service_fields=name").json()
+        assert rest["next_offset"] is None
+        assert rest["services"][0]["services"] == [{"name": "Photo Location Finder"}]
+
+    def test_services_unknown_field(self):
+        assert client.get("/services?fields=bogus").status_code == 400
+
 
 class TestGenerateEndpoint:
     @patch("app.main.generate_plan")
@@ -87,6 +143,40 @@ class TestGenerateEndpoint:
         })
         assert response.status_code == 500
 
+    @patch("app.main.generate_plan")
+    def test_generate_include_plan(self, mock_plan):
+        mock_plan.return_value = _mock_plan()
+
+        response = client.post("/generate", json={"prompt": "climate change tweets", "include_plan": True})
+        assert response.status_code == 200
+        assert response.json()["plan"]["metadata"]["keywords"] == "climate change"
+        assert "plan" not in client.post("/generate", json={"prompt": "climate change tweets"}).json()
+
+
+class TestRefineEndpoint:
+    @patch("app.main.refine_plan")
+    def test_refine_success(self, mock_refine):
+        mock_refine.return_value = _mock_plan()
+        base = _mock_plan().model_dump()
+
+        response = client.post("/generate/refine", json={"plan": base, "instruction": "use 100 posts"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["step_count"] == 1
+        assert data["plan"]["steps"][0]["service_category"] == "twitter_posts"
+        plan, instruction = mock_refine.call_args.args[:2]
+        assert isinstance(plan, QueryPlan)
+        assert instruction == "use 100 posts"
+
+    @patch("app.main.refine_plan", side_effect=Exception("LLM error"))
+    def test_refine_error(self, mock_refine):
+        response = client.post("/generate/refine", json={"plan": _mock_plan().model_dump(), "instruction": "x"})
+        assert response.status_code == 500
+
+    def test_refine_rejects_invalid_plan(self):
+        response = client.post("/generate/refine", json={"plan": {"steps": []}, "instruction": "x"})
+        assert response.status_code == 422
+
 
 class TestFeedbackEndpoint:
     def test_feedback_success(self):
@@ -111,3 +201,37 @@ class TestFeedbackEndpoint:
             "rating": 6,
         })
         assert response.status_code == 422
+
+
+class TestProfiling:
+    @patch("app.main.generate_plan")
+    def test_token_triggers_profile(self, mock_plan, tmp_path):
+        def slow_plan(*args, **kwargs):
+            time.sleep(0.05)
+            return _mock_plan()
+
+        mock_plan.side_effect = slow_plan
+        with patch.multiple("app.services.profiler.settings",
+                            profile_token="secret", profile_dir=str(tmp_path), profile_interval_ms=1):
+            response = client.post(
+                "/generate", json={"prompt": "Search Twitter"}, headers={"X-Profile-Token": "secret"},
+            )
+            assert response.status_code == 200
+            name = response.headers["X-Profile-Id"]
+
+            listing = client.get("/debug/profiles", headers={"X-Profile-Token": "secret"})
+            assert listing.json()["profiles"][0]["name"] == name
+            assert listing.json()["profiles"][0]["samples"] > 0
+
+            folded = client.get(f"/debug/profiles/{name}", headers={"X-Profile-Token": "secret"})
+            assert folded.status_code == 200
+            assert "slow_plan" in folded.text
+
+    @patch("app.main.generate_plan")
+    def test_no_profile_without_token(self, mock_plan, tmp_path):
+        mock_plan.return_value = _mock_plan()
+        with patch.multiple("app.services.profiler.settings", profile_token="secret", profile_dir=str(tmp_path)):
+            response = client.post("/generate", json={"prompt": "x"}, headers={"X-Profile-Token": "wrong"})
+            assert "X-Profile-Id" not in response.headers
+            assert client.get("/debug/profiles").status_code == 403
+            assert client.get("/debug/profiles", headers={"X-Profile-Token": "wrong"}).status_code == 403
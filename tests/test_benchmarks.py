@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+from app.services.catalog import _qdrant_scroll
+from app.services.planner import generate_plan
+from benchmarks.common import percentile
+from benchmarks.fake_servers import FakeLLMServer, FakeQdrantServer
+from benchmarks.microbench import compare, measure
+
+
+class TestFakeServers:
+    def test_fake_qdrant_pages_through_catalog(self):
+        with FakeQdrantServer(catalog_size=250) as qdrant, \
+                patch("app.services.catalog.settings.qdrant_url", qdrant.url):
+            points, offset = _qdrant_scroll("bench", limit=100)
+            seen = len(points)
+            while offset is not None:
+                points, offset = _qdrant_scroll("bench", limit=100, offset=offset)
+                seen += len(points)
+        assert seen == 250
+
+    def test_fake_llm_serves_query_plans(self):
+        with FakeLLMServer() as llm, \
+                patch("app.services.planner.settings.llm_provider", "openai"), \
+                patch("app.services.planner.settings.openai_api_base", f"{llm.url}/v1"), \
+                patch.dict("os.environ", {"OPENAI_API_KEY": "sk-fake"}):
+            stats: dict = {}
+            plan = generate_plan(
+                "Search Twitter for posts about climate change", stats=stats, model="gpt-4o-mini", use_cache=False
+            )
+        assert plan.steps[0].service_category == "twitter_posts"
+        assert stats["attempts"] == 1
+        assert stats["completion_tokens"] > 0
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 99) == 0.0
+
+
+class TestMicrobench:
+    def test_measure_reports_time_and_allocations(self):
+        result = measure(lambda: [0] * 10_000, min_time=0.01, repeats=2)
+        assert result["median_us"] > 0
+        assert result["peak_alloc_kb"] >= 70  # ~80 KB list
+
+    def test_compare_flags_regressions(self):
+        baseline = {"a": {"median_us": 10.0, "peak_alloc_kb": 1.0}, "b": {"median_us": 10.0, "peak_alloc_kb": 1.0}}
+        current = {"a": {"median_us": 11.0, "peak_alloc_kb": 1.0}, "b": {"median_us": 15.0, "peak_alloc_kb": 1.0}}
+        assert compare(current, baseline, threshold=0.2) == ["b"]
@@ -0,0 +1,91 @@
+import json
+
+from training.build_dataset import assign_split, build_dataset, iter_split, minhash
+from training.fine_tune import iter_training_data, prepare_unsloth_format
+
+
+def _write_pairs(path, prompts, source) -> None:
+    with open(path, "w") as f:
+        for prompt in prompts:
+            f.write(json.dumps({"input": prompt, "message": f"1. [service] {prompt}", "source": source}) + "\n")
+
+
+def _all_examples(dataset_dir) -> list[dict]:
+    return [pair for split in ("train", "val", "test") for pair in iter_split(dataset_dir, split)]
+
+
+class TestMinhash:
+    def test_similar_prompts_share_most_rows(self):
+        a = minhash("Get the latest Instagram posts from @nasa about the moon landing mission")
+        b = minhash("get the latest instagram posts from @nasa about the moon landing mission please")
+        c = minhash("Analyze sentiment of TikTok videos with hashtag cooking")
+        assert sum(x == y for x, y in zip(a, b)) > len(a) // 2
+        assert sum(x == y for x, y in zip(a, c)) < len(a) // 4
+
+
+class TestBuildDataset:
+    def test_near_duplicates_keep_the_higher_priority_source(self, tmp_path):
+        corrections, synthetic = tmp_path / "corrections.jsonl", tmp_path / "pairs.jsonl"
+        _write_pairs(corrections, ["Get the latest Instagram posts from @nasa about the moon landing mission"], "user_correction")
+        _write_pairs(synthetic, [
+            "get the latest instagram posts from @nasa about the moon landing mission please",
+            "Analyze sentiment of TikTok videos with hashtag cooking",
+        ], "synthetic")
+        with open(synthetic, "a") as f:
+            f.write("not json\n" + json.dumps({"input": "no target"}) + "\n")
+
+        manifest = build_dataset([("corrections", corrections), ("synthetic", synthetic)], tmp_path / "dataset")
+
+        assert manifest["sources"] == {
+            "corrections": {"read": 1, "kept": 1},
+            "synthetic": {"read": 4, "near_duplicates": 1, "kept": 1, "invalid": 2},
+        }
+        assert sorted(p["source"] for p in _all_examples(tmp_path / "dataset")) == ["synthetic", "user_correction"]
+
+    def test_split_is_deterministic_and_ignores_entities(self):
+        a = assign_split("Scrape posts from @bbc", 0.3, 0.3)
+        assert assign_split("Scrape posts from @cnn", 0.3, 0.3) == a
+        splits = {assign_split(f"Request number {i}", 0.2, 0.2) for i in range(200)}
+        assert splits == {"train", "val", "test"}
+
+    def test_packs_by_length_into_shards(self, tmp_path):
+        source = tmp_path / "pairs.jsonl"
+        prompts = [f"Search Twitter for keyword {i} " + f"w{i} " * (80 if i % 2 else 2) for i in range(40)]
+        _write_pairs(source, prompts, "synthetic")
+
+        manifest = build_dataset([("synthetic", source)], tmp_path / "dataset", 0.0, 0.0, max_tokens=512, shard_size=3)
+
+        train = manifest["splits"]["train"]
+        assert train["examples"] == 40
+        assert len(train["shards"]) == -(-train["packs"] // 3)
+        for name in train["shards"]:
+            with open(tmp_path / "dataset" / name) as f:
+                for line in f:
+                    pack = json.loads(line)
+                    assert pack["tokens"] <= 512
+                    assert len({len(e["input"]) > 200 for e in pack["examples"]}) == 1  # Short and long never mixed
+        assert sorted(p["input"] for p in iter_split(tmp_path / "dataset", "train")) == sorted(prompts)
+
+    def test_rebuild_replaces_the_dataset(self, tmp_path):
+        source = tmp_path / "pairs.jsonl"
+        _write_pairs(source, ["Scrape posts from @bbc"], "synthetic")
+        build_dataset([("synthetic", source)], tmp_path / "dataset", 0.0, 0.0)
+        _write_pairs(source, ["Analyze sentiment of TikTok videos"], "synthetic")
+        build_dataset([("synthetic", source)], tmp_path / "dataset", 0.0, 0.0)
+
+        assert [p["input"] for p in _all_examples(tmp_path / "dataset")] == ["Analyze sentiment of TikTok videos"]
+        assert [p.name for p in tmp_path.iterdir() if p.name.startswith(".")] == []
+
+
+class TestFineTuneFromDataset:
+    def test_streams_the_train_split(self, tmp_path):
+        source = tmp_path / "pairs.jsonl"
+        _write_pairs(source, ["Scrape posts from @bbc", "Analyze sentiment of TikTok videos"], "synthetic")
+        build_dataset([("synthetic", source)], tmp_path / "dataset", 0.0, 0.0)
+
+        out = tmp_path / "unsloth.json"
+        count = prepare_unsloth_format(iter_training_data(tmp_path / "dataset"), str(out))
+
+        with open(out) as f:
+            assert [row["input"] for row in json.load(f)] == ["Scrape posts from @bbc", "Analyze sentiment of TikTok videos"]
+        assert count == 2
@@ -0,0 +1,270 @@
+import itertools
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+import app.services.catalog as cat_mod
+from app.prompts.system_prompt import build_system_prompt
+from app.services.catalog import (
+    CatalogUnavailableError,
+    UnknownCollectionError,
+    find_service,
+    get_catalog_cache_stats,
+    get_catalog_status,
+    get_catalog_version,
+    list_categories,
+    refresh_hot_collections,
+    reload_catalog,
+    use_collection,
+)
+from app.services.catalog_records import ServiceRecord, compact_catalog
+from tests.conftest import _TEST_CATALOG
+
+
+@pytest.fixture
+def stale():
+    """The default collection holding a catalog whose TTL has expired."""
+    entry = cat_mod._collection()
+    entry.catalog = _TEST_CATALOG
+    entry.loaded_at = -cat_mod._CACHE_TTL
+    return entry
+
+
+@pytest.fixture
+def qdrant_down():
+    with patch.object(cat_mod, "_fetch_catalog_from_qdrant", side_effect=ConnectionError("qdrant down")) as fetch:
+        yield fetch
+
+
+class TestRefreshBackoff:
+    def test_stale_catalog_served_without_refetch_during_backoff(self, qdrant_down, stale):
+        for _ in range(5):
+            assert cat_mod._load_catalog() is _TEST_CATALOG
+
+        assert qdrant_down.call_count == 1
+        status = get_catalog_status()
+        assert status["stale"] and status["consecutive_failures"] == 1
+        assert status["backoff_remaining_s"] > 0
+        assert status["last_error"] == "ConnectionError: qdrant down"
+
+    def test_backoff_doubles_up_to_the_maximum(self, qdrant_down, stale, monkeypatch):
+        monkeypatch.setattr(cat_mod.settings, "catalog_backoff_base", 10)
+        monkeypatch.setattr(cat_mod.settings, "catalog_backoff_max", 30)
+        delays = []
+        for _ in range(4):
+            stale.refresh.next_attempt_at = 0  # Backoff expired
+            cat_mod._load_catalog()
+            delays.append(round(get_catalog_status()["backoff_remaining_s"]))
+        assert delays == [10, 20, 30, 30]
+
+    def test_circuit_fails_fast_without_a_catalog(self, qdrant_down, monkeypatch):
+        monkeypatch.setattr(cat_mod.settings, "catalog_circuit_threshold", 2)
+        entry = cat_mod._collection()
+        for _ in range(2):
+            entry.refresh.next_attempt_at = 0
+            with pytest.raises(ConnectionError):
+                cat_mod._load_catalog()
+        assert get_catalog_status()["circuit"] == "open"
+
+        with pytest.raises(CatalogUnavailableError, match="qdrant down"):
+            cat_mod._load_catalog()
+        assert qdrant_down.call_count == 2
+
+        entry.refresh.next_attempt_at = 0
+        assert get_catalog_status()["circuit"] == "half_open"
+
+    def test_concurrent_cold_loads_share_one_failed_attempt(self, qdrant_down):
+        def slow_failure(name):
+            time.sleep(0.2)  # Long enough for every thread to queue on the refresh lock
+            raise ConnectionError("qdrant down")
+
+        qdrant_down.side_effect = slow_failure
+        errors = []
+
+        def load():
+            try:
+                cat_mod._load_catalog()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=load) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert qdrant_down.call_count == 1
+        assert sorted(type(e).__name__ for e in errors) == ["CatalogUnavailableError"] * 7 + ["ConnectionError"]
+
+    def test_success_after_backoff_closes_the_circuit(self, qdrant_down, stale):
+        cat_mod._load_catalog()
+        version = get_catalog_version()
+
+        qdrant_down.side_effect = None
+        qdrant_down.return_value = _TEST_CATALOG
+        assert cat_mod._load_catalog() is _TEST_CATALOG and qdrant_down.call_count == 1  # Still backing off
+        stale.refresh.next_attempt_at = 0
+        cat_mod._load_catalog()
+
+        assert qdrant_down.call_count == 2
+        assert get_catalog_version() != version
+        status = get_catalog_status()
+        assert status["circuit"] == "closed" and status["consecutive_failures"] == 0
+        assert not status["stale"]
+
+    def test_reload_ignores_backoff(self, qdrant_down, stale):
+        cat_mod._load_catalog()
+        qdrant_down.side_effect = None
+        qdrant_down.return_value = _TEST_CATALOG
+
+        reload_catalog()
+
+        assert qdrant_down.call_count == 2
+        assert get_catalog_status()["consecutive_failures"] == 0
+
+
+class TestCompactCatalog:
+    def test_records_read_like_the_original_services(self):
+        original = _TEST_CATALOG["services"][0]["services"][0]
+        record = compact_catalog(_TEST_CATALOG)["services"][0]["services"][0]
+
+        assert list(record) == list(original)
+        assert record["sample_input"] == original["sample_input"]
+        assert "pagination" in record and "missing" not in record
+        assert dict(record) == {**original, "initiators": tuple(original["initiators"])}
+
+    def test_nested_fields_stay_encoded_until_read(self):
+        record = compact_catalog(_TEST_CATALOG)["services"][0]["services"][0]
+        assert record.raw("sample_input") == b'{"searchTerms":["{KEYWORD}"]}'
+        # Each read decodes a fresh copy, so callers can't mutate the catalog
+        record["sample_input"]["searchTerms"].append("x")
+        assert record["sample_input"] == {"searchTerms": ["{KEYWORD}"]}
+
+    def test_layouts_and_strings_are_shared(self):
+        first, second = compact_catalog(_TEST_CATALOG)["services"][0]["services"][:2]
+        assert first._layout is second._layout
+        assert first["type"] is second["type"]
+
+    def test_find_service_returns_a_record(self):
+        service = find_service("twitter_posts", "username")
+        assert isinstance(service, ServiceRecord)
+        assert service["name"] == "Tweet Scraper by Username"
+        assert service["sample_input"] == {"usernames": ["{USERNAME}"]}
+
+
+STAGING_CATALOG = {"services": [_TEST_CATALOG["services"][2]]}  # photo_location only
+
+
+@pytest.fixture
+def collections(monkeypatch):
+    monkeypatch.setattr(cat_mod.settings, "qdrant_collections", "staging")
+    catalogs = {cat_mod.settings.qdrant_collection: _TEST_CATALOG, "staging": STAGING_CATALOG}
+    with patch.object(cat_mod, "_fetch_catalog_from_qdrant", side_effect=lambda name: catalogs[name]) as fetch:
+        yield fetch
+
+
+class TestCollections:
+    def test_each_collection_has_its_own_catalog_and_prompt(self, collections):
+        default_prompt = build_system_prompt()
+        with use_collection("staging"):
+            assert [c["category"] for c in list_categories()] == ["photo_location"]
+            staging_prompt = build_system_prompt()
+            staging_version = get_catalog_version()
+
+        assert "  twitter_posts: " in default_prompt and "  twitter_posts: " not in staging_prompt
+        assert build_system_prompt() is default_prompt
+        assert get_catalog_version() != staging_version
+        assert collections.call_count == 2
+
+    def test_unknown_collection_rejected(self, collections):
+        with pytest.raises(UnknownCollectionError):
+            with use_collection("prod-secret"):
+                pass
+
+    def test_least_recently_used_collection_evicted_over_budget(self, collections, monkeypatch):
+        monkeypatch.setattr(cat_mod.settings, "catalog_memory_budget_mb", 0)
+        list_categories()
+        with use_collection("staging"):
+            list_categories()
+
+        stats = get_catalog_cache_stats()
+        assert list(stats["collections"]) == ["staging"]
+        assert stats["evictions"] >= 1
+        list_categories()  # Loaded again on demand
+        assert collections.call_count == 3
+
+    def test_derived_artefacts_count_toward_the_budget(self, collections, monkeypatch):
+        list_categories()
+        with use_collection("staging"):
+            list_categories()
+        records_only = sum(entry.nbytes for entry in cat_mod._COLLECTIONS.values())
+        monkeypatch.setattr(cat_mod.settings, "catalog_memory_budget_mb", (records_only + 1) / 2**20)
+
+        build_system_prompt()  # The default collection's prompt pushes the total over the budget
+
+        assert list(get_catalog_cache_stats()["collections"]) == [cat_mod.settings.qdrant_collection]
+
+    def test_collections_that_failed_to_load_are_not_evicted(self, collections, monkeypatch):
+        monkeypatch.setattr(cat_mod.settings, "catalog_memory_budget_mb", 0)
+        collections.side_effect = ConnectionError("qdrant down")
+        with use_collection("staging"), pytest.raises(ConnectionError):
+            list_categories()
+        collections.side_effect = lambda name: _TEST_CATALOG
+
+        list_categories()
+
+        assert get_catalog_status("staging")["consecutive_failures"] == 1
+
+    def test_budget_checks_race_with_lookups(self, collections):
+        list_categories()
+        with use_collection("staging"):
+            list_categories()
+        stop = threading.Event()
+        errors = []
+
+        def build_artefacts():
+            for i in itertools.count():
+                if stop.is_set():
+                    return
+                try:
+                    cat_mod.catalog_cached(("test", i), lambda: ["x" * 100] * 100)
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        def look_up():
+            while not stop.is_set():
+                with use_collection("staging"):
+                    list_categories()
+                list_categories()
+
+        threads = [threading.Thread(target=build_artefacts), threading.Thread(target=look_up)]
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads often enough to hit the race
+        try:
+            for thread in threads:
+                thread.start()
+            time.sleep(1)
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            sys.setswitchinterval(switch_interval)
+
+        assert errors == []
+
+    def test_only_hot_collections_refreshed_in_background(self, collections, monkeypatch):
+        monkeypatch.setattr(cat_mod.settings, "catalog_hot_uses", 3)
+        for _ in range(3):
+            list_categories()
+        with use_collection("staging"):
+            list_categories()
+        for entry in cat_mod._COLLECTIONS.values():
+            entry.loaded_at -= cat_mod._CACHE_TTL - 1  # About to expire
+
+        assert refresh_hot_collections() == [cat_mod.settings.qdrant_collection]
+        assert not get_catalog_status()["stale"]
+        assert collections.call_count == 3
@@ -0,0 +1,183 @@
+import copy
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.services.catalog as cat_mod
+from app.main import app
+from app.services.catalog import get_catalog_changes, get_catalog_version, reload_catalog
+from app.services.catalog_changes import CatalogHistory, diff_catalogs
+from app.services.catalog_records import compact_catalog
+from tests.conftest import _TEST_CATALOG
+
+client = TestClient(app)
+_fetch_catalog_from_qdrant = cat_mod._fetch_catalog_from_qdrant  # The real one; tests patch it per test
+
+
+def _changed_catalog() -> dict:
+    """The test catalog with a service modified, one removed and one added."""
+    catalog = copy.deepcopy(_TEST_CATALOG)
+    twitter = catalog["services"][0]["services"]
+    twitter[0]["description"] = "Scrape tweets by keyword, faster."
+    del twitter[3]  # By username
+    catalog["services"][1]["services"].append({**twitter[1], "name": "Instagram Reels", "initiators": ["url"]})
+    return catalog
+
+
+@pytest.fixture
+def catalogs():
+    """Serve whatever catalog is at the end of the list on each fetch."""
+    served = [_TEST_CATALOG]
+    with patch.object(cat_mod, "_fetch_catalog_from_qdrant", side_effect=lambda name: served[-1]):
+        yield served
+
+
+class TestDiffCatalogs:
+    def test_added_removed_and_modified_services(self):
+        diff = diff_catalogs(compact_catalog(_TEST_CATALOG), compact_catalog(_changed_catalog()))
+
+        assert set(diff) == {"twitter_posts", "instagram_posts"}
+        assert {key: op for key, (op, _) in diff["twitter_posts"].items()} == {
+            ("Tweet Scraper", ("keyword",)): "modified",
+            ("Tweet Scraper by Username", ("username",)): "removed",
+        }
+        assert [op for op, _ in diff["instagram_posts"].values()] == ["added"]
+
+    def test_changes_to_services_sharing_a_key_cannot_be_diffed(self):
+        catalog = copy.deepcopy(_TEST_CATALOG)
+        twitter = catalog["services"][0]["services"]
+        twitter.append({**twitter[0], "description": "A second point for the same scraper."})
+        changed = copy.deepcopy(catalog)
+        changed["services"][0]["services"][-1]["description"] = "Changed."
+
+        assert diff_catalogs(compact_catalog(catalog), compact_catalog(copy.deepcopy(catalog))) == {}
+        assert diff_catalogs(compact_catalog(catalog), compact_catalog(changed)) is None
+        del changed["services"][0]["services"][-1]
+        assert diff_catalogs(compact_catalog(catalog), compact_catalog(changed)) is None
+
+    def test_identical_catalogs_have_no_diff(self):
+        assert diff_catalogs(compact_catalog(_TEST_CATALOG), compact_catalog(copy.deepcopy(_TEST_CATALOG))) == {}
+
+
+class TestCatalogHistory:
+    KEY = ("Reels", ("url",))
+    SERVICE = {"name": "Reels", "initiators": ["url"]}
+
+    def test_changes_are_merged_per_service(self):
+        history = CatalogHistory(base_version=1, max_size=10)
+        history.record(1, 2, {"instagram_posts": {self.KEY: ("added", self.SERVICE)}})
+        history.record(2, 3, {"instagram_posts": {self.KEY: ("modified", {**self.SERVICE, "type": "x"})}})
+
+        assert history.changes_since(1, 3) == {"instagram_posts": {"added": [{**self.SERVICE, "type": "x"}]}}
+        assert history.changes_since(2, 3) == {"instagram_posts": {"modified": [{**self.SERVICE, "type": "x"}]}}
+        assert history.changes_since(3, 3) == {}
+
+    def test_added_then_removed_cancels_out(self):
+        history = CatalogHistory(base_version=1, max_size=10)
+        history.record(1, 2, {"instagram_posts": {self.KEY: ("added", self.SERVICE)}})
+        history.record(2, 3, {"instagram_posts": {self.KEY: ("removed", None)}})
+        assert history.changes_since(1, 3) == {}
+        assert history.changes_since(2, 3) == {"instagram_posts": {"removed": [self.SERVICE]}}
+
+    def test_versions_outside_the_window_need_a_resync(self):
+        history = CatalogHistory(base_version=1, max_size=1)
+        history.record(1, 2, {"a": {self.KEY: ("added", self.SERVICE)}})
+        history.record(2, 3, {"a": {self.KEY: ("removed", None)}})
+        assert history.changes_since(1, 3) is None
+        assert history.changes_since(2, 3) is not None
+        assert history.changes_since(4, 3) is None
+
+    def test_versions_are_matched_not_ordered(self):
+        history = CatalogHistory(base_version=900, max_size=10)
+        history.record(900, 5, {"a": {self.KEY: ("added", self.SERVICE)}})
+        history.record(5, 700, {"a": {self.KEY: ("modified", {**self.SERVICE, "type": "x"})}})
+
+        assert history.changes_since(5, 700) == {"a": {"modified": [{**self.SERVICE, "type": "x"}]}}
+        assert history.changes_since(900, 5) == {"a": {"added": [self.SERVICE]}}  # Newer diff not published yet
+        assert history.changes_since(6, 700) is None
+
+
+class TestChangeFeed:
+    def test_reload_records_the_delta(self, catalogs):
+        since = get_catalog_version()
+        catalogs.append(_changed_catalog())
+        reload_catalog()
+
+        body = get_catalog_changes(since)
+        assert body["version"] == get_catalog_version() and body["since"] == since
+        assert body["changes"]["twitter_posts"]["removed"] == [
+            {"name": "Tweet Scraper by Username", "initiators": ["username"]}
+        ]
+        assert body["changes"]["twitter_posts"]["modified"][0]["description"] == "Scrape tweets by keyword, faster."
+
+    def test_stable_catalog_has_an_empty_delta(self, catalogs):
+        since = get_catalog_version()
+        reload_catalog()
+        assert get_catalog_changes(since) == {"version": get_catalog_version(), "since": since, "changes": {}}
+
+    def test_services_version_header_feeds_the_change_endpoint(self, catalogs):
+        version = client.get("/services").headers["x-catalog-version"]
+        catalogs.append(_changed_catalog())
+        reload_catalog()
+
+        data = client.get(f"/services/changes?since={version}").json()
+        assert set(data["changes"]) == {"twitter_posts", "instagram_posts"}
+        assert client.get("/services/changes?since=0").json() == {"version": data["version"], "resync": True}
+
+    def test_ambiguous_change_needs_a_resync(self, catalogs):
+        catalog = copy.deepcopy(_TEST_CATALOG)
+        twitter = catalog["services"][0]["services"]
+        twitter.append({**twitter[0], "description": "A second point for the same scraper."})
+        catalogs.append(catalog)
+        reload_catalog()
+        since = get_catalog_version()
+        changed = copy.deepcopy(catalog)
+        del changed["services"][0]["services"][-1]
+        catalogs.append(changed)
+        reload_catalog()
+
+        assert get_catalog_changes(since) == {"version": get_catalog_version(), "resync": True}
+
+    def test_versions_agree_across_workers(self, catalogs):
+        version = get_catalog_version()
+        catalogs.append(_changed_catalog())
+        reload_catalog()
+        changed_version = get_catalog_version()
+
+        cat_mod._COLLECTIONS.clear()  # Another worker, or a restart, that only ever loaded the changed catalog
+        assert get_catalog_version() == changed_version
+        assert get_catalog_changes(changed_version)["changes"] == {}
+        assert get_catalog_changes(version) == {"version": changed_version, "resync": True}
+
+    def test_reverted_catalog_gets_its_old_version_back(self, catalogs):
+        version = get_catalog_version()
+        catalogs.append(_changed_catalog())
+        reload_catalog()
+        changed_version = get_catalog_version()
+        catalogs.append(_TEST_CATALOG)
+        reload_catalog()
+
+        assert get_catalog_version() == version
+        assert get_catalog_changes(version)["changes"] == {}
+        assert get_catalog_changes(changed_version)["changes"]["twitter_posts"]["added"][0]["name"] == (
+            "Tweet Scraper by Username"
+        )
+
+    def test_version_of_a_catalog_fetched_from_qdrant(self):
+        points = [
+            {"id": i, "payload": {"metadata": {**service, "category": group["category"], "initiator": initiator}}}
+            for i, (group, service, initiator) in enumerate(
+                (group, service, initiator)
+                for group in _TEST_CATALOG["services"]
+                for service in group["services"]
+                for initiator in service["initiators"]
+            )
+        ]
+        pages = {None: (points[:3], 3), 3: (points[3:], None)}
+        with patch.object(cat_mod, "_fetch_catalog_from_qdrant", _fetch_catalog_from_qdrant), \
+                patch.object(cat_mod, "_qdrant_scroll", side_effect=lambda name, limit, offset: pages[offset]):
+            version = get_catalog_version()
+            cat_mod._COLLECTIONS.clear()
+            assert get_catalog_version() == version
+        assert 0 < version < 2**53
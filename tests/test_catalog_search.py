@@ -0,0 +1,83 @@
+import copy
+import random
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.catalog import reload_catalog
+from app.services import catalog_search
+from app.services.catalog_search import CatalogIndex, get_search_index
+from tests.conftest import _TEST_CATALOG
+
+client = TestClient(app)
+
+
+def _names(results: list[dict]) -> list[str]:
+    return [r["name"] for r in results]
+
+
+class TestCatalogIndex:
+    index = CatalogIndex(_TEST_CATALOG["services"])
+
+    def test_every_word_must_match(self):
+        assert _names(self.index.search("tweets username")) == ["Tweet Scraper by Username"]
+        assert self.index.search("tweets weather") == []
+
+    def test_prefixes_match_while_typing(self):
+        assert _names(self.index.search("insta hash")) == ["Instagram Scraper"]
+        assert "Photo Location Finder" in _names(self.index.search("loc"))
+
+    def test_category_and_name_outrank_description(self):
+        # "hashtag" is an initiator of both; only the Twitter one has it in its name
+        results = self.index.search("hashtag")
+        assert results[0]["name"] == "Tweet Scraper by Hashtag"
+        assert results[0]["score"] > results[1]["score"]
+
+    def test_initiator_filter_and_limit(self):
+        assert _names(self.index.search("scraper", initiators=("url", "image"))) == ["Tweet Scraper by URL"]
+        assert len(self.index.search("scraper", limit=2)) == 2
+        assert _names(self.index.search("", initiators=("image",))) == ["Photo Location Finder"]
+
+    def test_ties_rank_in_catalog_order_with_many_candidates(self):
+        # "ro" expands to "rock" and "rope", which score the same; "box" is in the name or the description
+        rng = random.Random(7)
+        materials = ["rock", "rope"] * 750
+        rng.shuffle(materials)
+        services = [
+            {"name": f"{material} box n{i}" if rng.random() < 0.5 else f"{material} n{i}", "initiators": ["keyword"],
+             "description": "a box"}
+            for i, material in enumerate(materials)
+        ]
+        index = CatalogIndex([{"category": "things", "services": services}])
+        assert len(services) > catalog_search._DIRECT_SCORING
+
+        results = index.search("ro box", limit=20)
+
+        # Everything matches; the best have "box" in the name too, and rank in catalog order
+        expected = [service["name"] for service in services if " box " in service["name"]][:20]
+        assert _names(results) == expected
+        assert len({r["score"] for r in results}) == 1
+
+    def test_results_carry_light_fields_only(self):
+        assert set(self.index.search("tweet")[0]) == {"category", "name", "initiators", "description", "score"}
+
+
+class TestSearchEndpoint:
+    def test_search(self):
+        data = client.get("/services/search?q=twitter+url").json()
+        assert _names(data["results"]) == ["Tweet Scraper by URL"]
+        assert data["results"][0]["category"] == "twitter_posts"
+
+    def test_index_rebuilt_per_catalog_version(self):
+        index = get_search_index()
+        assert get_search_index() is index
+        reload_catalog()
+        assert get_search_index() is index  # Unchanged content keeps its version
+
+        changed = copy.deepcopy(_TEST_CATALOG)
+        changed["services"][0]["services"][0]["description"] = "Scrape tweets by keyword, faster."
+        with patch("app.services.catalog._fetch_catalog_from_qdrant", return_value=changed):
+            reload_catalog()
+        assert get_search_index() is not index
+        assert client.get("/services/search?q=tweet").json()["version"] == get_search_index().version
@@ -0,0 +1,82 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models.compact_plan import CompactPlan
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.prompts.system_prompt import build_system_prompt
+from app.services.compact_plan import compact_json, compact_plan, expand_plan
+from app.services.planner import generate_plan, set_completion_override
+from tests.conftest import tool_call_completion
+
+
+@pytest.fixture
+def reset_completion_override():
+    yield
+    set_completion_override(None)
+
+
+class TestCompactPlan:
+    @pytest.mark.parametrize("example", EXAMPLES, ids=lambda ex: ex["input"][:30])
+    def test_round_trip_keeps_steps_and_metadata(self, example):
+        plan = QueryPlan.model_validate(example["plan"])
+        expanded = expand_plan(CompactPlan.model_validate_json(compact_json(compact_plan(plan))))
+
+        assert [(s.type, s.service_category, s.initiator, s.params, s.related_steps) for s in expanded.steps] == [
+            (s.type, s.service_category, s.initiator, s.params, s.related_steps) for s in plan.steps
+        ]
+        assert expanded.metadata == plan.metadata
+
+    def test_descriptions_generated(self):
+        plan = expand_plan(CompactPlan.model_validate({"s": [
+            {"t": "service", "c": "twitter_posts", "i": "hashtag", "p": {"hashtag": "ai"}},
+            {"t": "scripter", "p": {"platform": "twitter"}, "r": [1]},
+            {"t": "ai", "d": "Keep posts about robots", "r": [2]},
+            {"t": "service", "c": "photo_location", "i": "image", "r": [1]},
+        ]}))
+        assert [s.description for s in plan.steps] == [
+            "Scrap Twitter posts associated with hashtags: #ai",
+            "Normalize Twitter data to standard format. Related step 1.",
+            "Keep posts about robots. Related step 2.",
+            "Run Photo Location Finder. Related step 1.",
+        ]
+        assert plan.metadata.keywords == "ai"
+        assert plan.metadata.source == "twitter_posts"
+
+    def test_ai_step_requires_description(self):
+        with pytest.raises(ValidationError, match="required for ai"):
+            CompactPlan.model_validate({"s": [{"t": "ai"}]})
+
+    def test_related_steps_must_point_backwards(self):
+        with pytest.raises(ValidationError, match="earlier steps"):
+            CompactPlan.model_validate({"s": [{"t": "scripter", "r": [1]}]})
+
+    def test_overrides_win_over_derived_metadata(self):
+        plan = expand_plan(CompactPlan.model_validate({
+            "s": [{"t": "service", "c": "twitter_posts", "i": "username", "p": {"username": "@bbc"}}],
+            "m": {"n": 200, "tn": "BBC News", "df": "2026-01-01"},
+        }))
+        assert plan.metadata.post_count == 200
+        assert plan.metadata.target_name == "BBC News"
+        assert plan.metadata.date_from == "2026-01-01"
+
+
+class TestCompactGeneration:
+    def test_compact_prompt_uses_compact_examples(self):
+        prompt = build_system_prompt(compact=True)
+        assert "OUTPUT FORMAT (CompactPlan)" in prompt
+        assert prompt.endswith("Generate a CompactPlan for the following user request:")
+        assert '"service_category"' not in prompt
+        assert '"service_category"' in build_system_prompt()
+
+    def test_generate_plan_expands_compact_output(self, reset_completion_override):
+        arguments = {"s": [{"t": "service", "c": "twitter_posts", "i": "keyword", "p": {"keyword": "rain"}}]}
+        calls = []
+        set_completion_override(tool_call_completion("CompactPlan", arguments, calls))
+        stats: dict = {}
+        plan = generate_plan("rain tweets", stats=stats, model="openai/test-model", output_format="compact")
+
+        assert calls[0]["tools"][0]["function"]["name"] == "CompactPlan"
+        assert stats["output_format"] == "compact"
+        assert plan.steps[0].description == "Search Twitter posts with keyword: rain"
+        assert plan.metadata.keywords == "rain"
@@ -0,0 +1,53 @@
+from sqlalchemy import inspect, text
+from sqlmodel import Session
+
+from app.database import create_db_engine, init_db
+from app.models.feedback import QueryBuilderLog
+
+
+def _index_columns(engine) -> set[str]:
+    indexes = inspect(engine).get_indexes("query_builder_logs")
+    return {col for idx in indexes for col in idx["column_names"]}
+
+
+class TestSqliteEngine:
+    def test_pragmas_applied(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+
+    def test_memory_database_shares_connection(self):
+        engine = create_db_engine("sqlite://")
+        init_db(engine)
+        with Session(engine) as session:
+            session.add(QueryBuilderLog(
+                user_id=1, input_prompt="p", generated_message="a", final_message="b", rating=3,
+            ))
+            session.commit()
+        with Session(engine) as session:
+            assert session.get(QueryBuilderLog, 1) is not None
+
+
+class TestMigrations:
+    def test_init_db_creates_indexes(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'test.db'}")
+        init_db(engine)
+        assert {"was_edited", "created_at", "user_id"} <= _index_columns(engine)
+
+    def test_migrate_adds_indexes_to_existing_table(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE query_builder_logs ("
+                "id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, input_prompt VARCHAR NOT NULL, "
+                "generated_message VARCHAR NOT NULL, final_message VARCHAR NOT NULL, "
+                "rating INTEGER NOT NULL, was_edited BOOLEAN NOT NULL, created_at DATETIME NOT NULL)"
+            ))
+        assert _index_columns(engine) == set()
+
+        init_db(engine)
+        init_db(engine)  # idempotent
+
+        assert {"was_edited", "created_at", "user_id"} <= _index_columns(engine)
@@ -0,0 +1,128 @@
+import json
+
+from app.main import _generated_plan
+from app.models.compact_plan import CompactPlan
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.generation_log import GenerationLog
+from app.services.planner import generate_plan, set_completion_override
+from tests.conftest import tool_call_completion
+from training.distill import distill
+
+EXAMPLE = EXAMPLES[1]  # Its services are all in the test catalog
+
+
+def _write_jsonl(path, rows) -> None:
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def _read_jsonl(path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def _plan(category: str = "twitter_posts", initiator: str = "keyword") -> dict:
+    return {
+        "steps": [{
+            "type": "service",
+            "service_category": category,
+            "initiator": initiator,
+            "params": {initiator: "rain"},
+            "description": "Search Twitter for posts with keyword: rain",
+        }],
+        "metadata": {"source": category, "keywords": "rain"},
+    }
+
+
+def _sources(tmp_path):
+    corrections = tmp_path / "corrections.jsonl"
+    _write_jsonl(corrections, [
+        {"input": EXAMPLE["input"], "message": EXAMPLE["message"], "source": "user_correction"},
+        {"input": "Check the weather", "message": "1. [service] Run the weather forecast", "source": "user_correction"},
+    ])
+    log_dir = tmp_path / "log"
+    log_dir.mkdir()
+    _write_jsonl(log_dir / "gen-0000000000001-1-000001.jsonl", [
+        {"prompt": "Tweets about rain", "options": {"post_count": 50}, "model": "big", "plan": _plan()},
+        {"prompt": "  TWEETS about rain ", "options": None, "model": "big", "plan": _plan()},
+        {"prompt": EXAMPLE["input"], "model": "big", "plan": _plan()},  # The user corrected this one
+        {"prompt": "Rain photos", "model": "big", "plan": _plan("photo_location", "keyword")},
+        {"prompt": "Old service", "model": "big", "plan": _plan("myspace_posts")},
+        {"prompt": "Tweets about snow", "model": "small", "plan": _plan()},
+        {"kind": "refine", "prompt": "also add sentiment", "model": "big", "plan": _plan()},
+    ])
+    return corrections, log_dir
+
+
+class TestDistill:
+    def test_collects_valid_unique_pairs_corrections_first(self, tmp_path):
+        corrections, log_dir = _sources(tmp_path)
+        out = tmp_path / "out"
+
+        stats = distill(out, corrections, log_dir, models={"big"})
+
+        assert stats["by_source"] == {"user_correction": 1, "generation_log": 1}
+        assert stats["rejected"] == {
+            "correction_unparsed": 1, "duplicate": 2, "unsupported_initiator": 1,
+            "unknown_category": 1, "log_other_model": 1,
+        }
+        plans = _read_jsonl(out / "plans.jsonl")
+        assert [(p["input"], p["source"]) for p in plans] == [
+            (EXAMPLE["input"], "user_correction"), ("Tweets about rain", "generation_log"),
+        ]
+        corrected = QueryPlan.model_validate(plans[0]["plan"])
+        assert [s.service_category for s in corrected.steps] == [
+            s["service_category"] for s in EXAMPLE["plan"]["steps"]
+        ]
+        assert plans[1]["options"] == {}  # post_count is applied after generation
+
+    def test_openai_examples_answer_with_the_planner_tool_call(self, tmp_path):
+        corrections, log_dir = _sources(tmp_path)
+        out = tmp_path / "out"
+        distill(out, corrections, log_dir)
+
+        example = _read_jsonl(out / "openai.jsonl")[0]
+        system, user, assistant = example["messages"]
+        assert "twitter_posts" in system["content"]
+        assert user["content"] == EXAMPLE["input"]
+        call = assistant["tool_calls"][0]["function"]
+        assert call["name"] == example["tools"][0]["function"]["name"] == "QueryPlan"
+        assert QueryPlan.model_validate_json(call["arguments"]).steps[0].service_category == "twitter_posts"
+
+        alpaca = _read_jsonl(out / "alpaca.jsonl")
+        assert [row["input"] for row in alpaca] == [EXAMPLE["input"], "Tweets about rain", "Tweets about snow"]
+
+    def test_compact_format(self, tmp_path):
+        corrections, log_dir = _sources(tmp_path)
+        out = tmp_path / "out"
+        distill(out, corrections, None, output_format="compact")
+
+        call = _read_jsonl(out / "openai.jsonl")[0]["messages"][2]["tool_calls"][0]["function"]
+        assert call["name"] == "CompactPlan"
+        CompactPlan.model_validate_json(call["arguments"])
+        assert not list(out.glob(".*"))  # No temporary files left behind
+
+    def test_logged_plans_match_inputs_without_counts_and_dates(self, tmp_path):
+        options = {"post_count": 500, "date_from": "2026-01-01"}
+        set_completion_override(tool_call_completion("QueryPlan", EXAMPLE["plan"]))
+        try:
+            stats: dict = {}
+            plan = generate_plan(EXAMPLE["input"], options, stats=stats, model="big")
+        finally:
+            set_completion_override(None)
+        log = GenerationLog(tmp_path / "log", segment_max_bytes=1 << 20, flush_interval=0.05)
+        log.start()
+        log.append({
+            "prompt": EXAMPLE["input"], "options": options, "model": "big", "plan": _generated_plan(plan, stats),
+        })
+        log.stop()
+
+        distill(tmp_path / "out", tmp_path / "missing.jsonl", tmp_path / "log")
+
+        (pair,) = _read_jsonl(tmp_path / "out" / "plans.jsonl")
+        # The input drops counts and dates, so the target must not carry them either
+        assert pair["options"] == {}
+        assert pair["plan"]["metadata"]["post_count"] == QueryPlan.model_validate(EXAMPLE["plan"]).metadata.post_count
+        assert pair["plan"]["metadata"]["date_from"] == EXAMPLE["plan"]["metadata"].get("date_from")
@@ -0,0 +1,95 @@
+import pytest
+
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.entity_cache import EntityPlanCache, extract_entities
+from app.services.planner import generate_plan, set_completion_override
+from tests.conftest import tool_call_completion
+
+MODEL = "test-model"
+URL_PLAN = QueryPlan.model_validate(EXAMPLES[0]["plan"])  # Facebook group URL
+HANDLE_PLAN = QueryPlan.model_validate(EXAMPLES[2]["plan"])  # @bbc and #breakingnews
+
+
+@pytest.fixture
+def cache():
+    return EntityPlanCache(max_size=16, ttl=60)
+
+
+class TestExtractEntities:
+    def test_entities_become_placeholders(self):
+        template, values = extract_entities(
+            'Get posts from @bbc, #news and https://facebook.com/groups/a. Match "climate change"'
+        )
+        assert template == 'Get posts from <username_1>, <hashtag_1> and <url_1:facebook.com>. Match <quoted_1>'
+        assert values == ["bbc", "news", "https://facebook.com/groups/a", "climate change"]
+
+    def test_emails_are_not_usernames(self):
+        assert extract_entities("write to me@example.com")[1] == []
+
+
+class TestEntityPlanCache:
+    def test_hit_substitutes_new_url(self, cache):
+        assert cache.put(MODEL, EXAMPLES[0]["input"], None, URL_PLAN)
+
+        plan = cache.get(MODEL, "Scrape posts from this Facebook group: https://facebook.com/groups/other")
+
+        assert plan.steps[0].params == {"url": "https://facebook.com/groups/other"}
+        assert plan.steps[0].description == "Scrap posts from Facebook group: https://facebook.com/groups/other"
+        assert plan.metadata.target_url == "https://facebook.com/groups/other"
+
+    def test_hit_substitutes_handles_everywhere(self, cache):
+        cache.put(MODEL, EXAMPLES[2]["input"], None, HANDLE_PLAN)
+
+        plan = cache.get(MODEL, "Get Instagram posts from @nasa and also search for #artemis")
+
+        assert [s.params for s in plan.steps] == [{"username": "nasa"}, {"hashtag": "artemis"}]
+        assert "@nasa" in plan.steps[0].description
+        assert plan.metadata.target_name == "nasa"
+        assert plan.metadata.keywords == "artemis"
+
+    def test_different_url_host_misses(self, cache):
+        cache.put(MODEL, EXAMPLES[0]["input"], None, URL_PLAN)
+        assert cache.get(MODEL, "Scrape posts from this Facebook group: https://twitter.com/groups/other") is None
+
+    def test_different_template_or_options_miss(self, cache):
+        cache.put(MODEL, EXAMPLES[0]["input"], None, URL_PLAN)
+        assert cache.get(MODEL, "Scrape comments from this Facebook group: https://facebook.com/groups/b") is None
+        assert cache.get(MODEL, EXAMPLES[0]["input"], {"post_count": 10}) is None
+
+    def test_entity_missing_from_plan_not_stored(self, cache):
+        assert not cache.put(MODEL, "Scrape https://facebook.com/groups/zzz", None, URL_PLAN)
+
+    def test_entity_in_rest_of_prompt_not_stored(self, cache):
+        # "bbc" also appears as a plain word, so it isn't clear which occurrences are the entity
+        assert not cache.put(MODEL, "Get bbc Instagram posts from @bbc and also search for #breakingnews", None, HANDLE_PLAN)
+
+    def test_rewritten_entity_not_stored(self, cache):
+        plan = HANDLE_PLAN.model_copy(deep=True)
+        plan.metadata.keywords = "BreakingNews"
+        assert not cache.put(MODEL, EXAMPLES[2]["input"], None, plan)
+
+    def test_overlapping_entities_not_stored(self, cache):
+        plan = HANDLE_PLAN.model_copy(deep=True)
+        plan.steps[1].params = {"hashtag": "bbcnews"}
+        assert not cache.put(MODEL, "Get Instagram posts from @bbc and also search for #bbcnews", None, plan)
+
+
+class TestGeneratePlanEntityCache:
+    def test_second_prompt_skips_the_llm(self):
+        calls = []
+        set_completion_override(tool_call_completion("QueryPlan", EXAMPLES[0]["plan"], calls))
+        try:
+            generate_plan(EXAMPLES[0]["input"], model="openai/test-model")
+            stats: dict = {}
+            plan = generate_plan(
+                "Scrape posts from this Facebook group: https://facebook.com/groups/b",
+                {"post_count": 20}, stats=stats, model="openai/test-model",
+            )
+        finally:
+            set_completion_override(None)
+
+        assert len(calls) == 1
+        assert stats["cache"] == "entity"
+        assert plan.metadata.target_url == "https://facebook.com/groups/b"
+        assert plan.metadata.post_count == 20
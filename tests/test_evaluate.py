@@ -0,0 +1,81 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.services.planner import set_completion_override
+from tests.conftest import tool_call_completion
+from training.evaluate import ResponseCassette, evaluate
+
+_PLAN = {
+    "steps": [
+        {
+            "type": "service",
+            "service_category": "twitter_posts",
+            "initiator": "keyword",
+            "description": "Search Twitter for posts with keyword: AI",
+            "related_steps": [],
+            "params": {"keyword": "AI"},
+        }
+    ],
+    "metadata": {"source": "twitter_posts", "keywords": "AI"},
+}
+
+_PAIRS = [
+    {"input": "Search Twitter for AI", "expected_step_count": 1,
+     "expected_category": "twitter_posts", "expected_initiator": "keyword"},
+    {"input": "Search Twitter for ML", "expected_step_count": 2,
+     "expected_category": "twitter_posts", "expected_initiator": "hashtag"},
+]
+
+
+_fake_completion = tool_call_completion(
+    "QueryPlan", _PLAN, usage={"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_completion_override():
+    yield
+    set_completion_override(None)
+
+
+class TestEvaluate:
+    def test_scores_and_reports_latency_and_tokens(self):
+        set_completion_override(_fake_completion)
+        results = evaluate(_PAIRS, model="openai/test-model", workers=2)
+
+        assert results["parse_rate"] == 1.0
+        assert results["step_count_match"] == 1
+        assert results["initiator_match"] == 1
+        assert results["prompt_tokens"] == 200
+        assert results["retries"] == 0
+        assert results["latency"]["count"] == 2
+        assert results["latency"]["p99_ms"] >= results["latency"]["p50_ms"]
+
+
+class TestResponseCassette:
+    def test_record_then_replay_offline(self, tmp_path):
+        path = tmp_path / "cassette.jsonl"
+
+        with patch("training.evaluate.litellm.completion", side_effect=_fake_completion) as live:
+            recorder = ResponseCassette(path, "record")
+            set_completion_override(recorder.completion)
+            recorded = evaluate(_PAIRS, model="openai/test-model", workers=2)
+            assert live.call_count == 2
+            assert recorder.recorded == 2
+
+        with patch("training.evaluate.litellm.completion", side_effect=AssertionError("LLM called")):
+            player = ResponseCassette(path, "replay")
+            set_completion_override(player.completion)
+            replayed = evaluate(_PAIRS, model="openai/test-model", workers=2)
+
+        assert player.hits == 2
+        for metric in ("parse_success", "step_count_match", "initiator_match", "prompt_tokens"):
+            assert replayed[metric] == recorded[metric]
+
+    def test_replay_miss_is_an_error(self, tmp_path):
+        player = ResponseCassette(tmp_path / "empty.jsonl", "replay")
+        set_completion_override(player.completion)
+        results = evaluate(_PAIRS[:1], model="openai/test-model")
+        assert results["parse_success"] == 0
+        assert "No recorded LLM response" in results["errors"][0]["error"]
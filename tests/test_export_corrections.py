@@ -0,0 +1,73 @@
+import json
+
+from sqlmodel import Session
+
+from app.database import create_db_engine, init_db
+from app.models.feedback import QueryBuilderLog
+from training.export_corrections import export_corrections, load_watermark
+
+
+def _add_logs(engine, count: int, edited: bool = True) -> None:
+    with Session(engine) as session:
+        for i in range(count):
+            session.add(QueryBuilderLog(
+                user_id=1,
+                input_prompt=f"prompt {i}",
+                generated_message="1. [service] Search Twitter",
+                final_message="1. [service] Search Twitter for posts" if edited else "1. [service] Search Twitter",
+                rating=4,
+                was_edited=edited,
+            ))
+        session.commit()
+
+
+def _read_lines(path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestExportCorrections:
+    def test_full_export_streams_only_edited_rows(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'fb.db'}")
+        init_db(engine)
+        _add_logs(engine, 7, edited=True)
+        _add_logs(engine, 5, edited=False)
+
+        out = tmp_path / "corrections.jsonl"
+        count = export_corrections(out, chunk_size=3, engine=engine, watermark_path=tmp_path / "wm.json")
+
+        assert count == 7
+        rows = _read_lines(out)
+        assert [r["input"] for r in rows] == [f"prompt {i}" for i in range(7)]
+        assert rows[0]["message"] == "1. [service] Search Twitter for posts"
+        assert rows[0]["source"] == "user_correction"
+
+    def test_incremental_appends_only_new_rows(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'fb.db'}")
+        init_db(engine)
+        out = tmp_path / "corrections.jsonl"
+        wm = tmp_path / "wm.json"
+
+        _add_logs(engine, 4)
+        assert export_corrections(out, incremental=True, engine=engine, watermark_path=wm) == 4
+        assert load_watermark(wm)["last_id"] == 4
+
+        assert export_corrections(out, incremental=True, engine=engine, watermark_path=wm) == 0
+
+        _add_logs(engine, 2)
+        assert export_corrections(out, incremental=True, engine=engine, watermark_path=wm) == 2
+        assert len(_read_lines(out)) == 6
+        assert load_watermark(wm) == {"last_id": 6}
+
+    def test_incremental_without_watermark_rewrites_the_output(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path / 'fb.db'}")
+        init_db(engine)
+        out = tmp_path / "corrections.jsonl"
+        wm = tmp_path / "wm.json"
+        _add_logs(engine, 3)
+        export_corrections(out, incremental=True, engine=engine, watermark_path=wm)
+        wm.unlink()
+
+        assert export_corrections(out, incremental=True, engine=engine, watermark_path=wm) == 3
+        assert len(_read_lines(out)) == 3
+        assert load_watermark(wm)["last_id"] == 3
@@ -0,0 +1,60 @@
+import json
+
+from app.services.generation_log import GenerationLog
+from benchmarks.replay_generation_log import request_for
+from training.export_generations import export_generations
+
+PLAN = {
+    "steps": [{
+        "type": "service",
+        "service_category": "twitter_posts",
+        "initiator": "keyword",
+        "params": {"keyword": "rain"},
+        "description": "Search Twitter posts with keyword: rain",
+    }],
+    "metadata": {"source": "twitter_posts", "keywords": "rain"},
+}
+GENERATE = {"prompt": "Tweets about rain", "options": {"post_count": 10}, "model": "m", "plan": PLAN}
+REFINE = {"kind": "refine", "prompt": "also add sentiment", "base_plan": PLAN, "model": "m", "plan": PLAN}
+
+
+def _write_log(directory, records) -> None:
+    log = GenerationLog(directory, segment_max_bytes=1 << 20, flush_interval=0.05)
+    log.start()
+    for record in records:
+        log.append(record)
+    log.stop()
+
+
+class TestExportGenerations:
+    def test_refinements_are_not_exported(self, tmp_path):
+        _write_log(tmp_path / "log", [GENERATE, REFINE])
+        out = tmp_path / "generations.jsonl"
+
+        assert export_generations(tmp_path / "log", out) == 1
+        with open(out) as f:
+            assert [json.loads(line)["input"] for line in f] == ["Tweets about rain"]
+
+    def test_exports_one_collection(self, tmp_path):
+        _write_log(tmp_path / "log", [GENERATE, {**GENERATE, "prompt": "EU tweets", "collection": "catalog_eu"}])
+        out = tmp_path / "generations.jsonl"
+
+        assert export_generations(tmp_path / "log", out, "catalog_eu") == 1
+        with open(out) as f:
+            row = json.loads(f.readline())
+        assert (row["input"], row["collection"]) == ("EU tweets", "catalog_eu")
+        assert export_generations(tmp_path / "log", out) == 1
+
+
+class TestReplayRequests:
+    def test_refinements_replay_against_refine(self):
+        assert request_for(GENERATE) == ("/generate", {"prompt": "Tweets about rain", "options": {"post_count": 10}})
+        assert request_for(REFINE) == (
+            "/generate/refine", {"plan": PLAN, "instruction": "also add sentiment", "options": {}},
+        )
+
+    def test_collection_is_replayed(self):
+        _, body = request_for({**GENERATE, "collection": "catalog_eu"})
+        assert body["collection"] == "catalog_eu"
+        _, body = request_for({**REFINE, "collection": "catalog_eu"})
+        assert body["collection"] == "catalog_eu"
@@ -0,0 +1,86 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.models.step_types import QueryPlan
+from app.services.assembler import build_message
+from app.services.catalog import list_categories
+from app.services.message_parser import parse_message
+from training.distill import distill
+from training.generate_from_catalog import CatalogPairGenerator, generate_from_catalog
+
+
+def _structure(plan: QueryPlan) -> list[tuple]:
+    return [(s.type, s.service_category, s.initiator, s.params, s.related_steps) for s in plan.steps]
+
+
+class TestCatalogPairGenerator:
+    def test_covers_every_category_and_initiator(self):
+        generator = CatalogPairGenerator(list_categories())
+        pairs = list(generator.pairs(len(generator.units)))
+
+        covered = {(plan.steps[0].service_category, plan.steps[0].initiator) for _, plan, _ in pairs}
+        expected = {(c["category"], i) for c in list_categories() for i in c["initiators"]}
+        assert covered == expected
+
+    def test_plans_match_the_assembled_message(self):
+        for prompt, plan, message in CatalogPairGenerator(list_categories(), seed=3).pairs(300):
+            assert message == build_message(plan)
+            # Corrections are read back with the same parser, so generated messages must parse to the same plan
+            assert _structure(parse_message(message)) == _structure(plan), prompt
+
+    def test_chains_normalize_before_sentiment_and_narratives(self):
+        chains = set()
+        for prompt, plan, _ in CatalogPairGenerator(list_categories()).pairs(500):
+            scripters = plan.steps[1:]
+            if not scripters:
+                continue
+            platform = plan.steps[0].service_category.split("_")[0]
+            assert scripters[0].params == {"platform": platform} and scripters[0].related_steps == [1]
+            assert all(s.related_steps == [2] for s in scripters[1:])
+            chains.add(tuple(s.params.get("operation") for s in scripters[1:]))
+            if plan.metadata.narrative_topics:
+                assert plan.metadata.narrative_topics in prompt
+        assert chains == {(), ("sentiment",), ("narratives",), ("sentiment", "narratives")}
+
+    def test_entities_appear_in_the_prompt(self):
+        for prompt, plan, _ in CatalogPairGenerator(list_categories()).pairs(200):
+            value = plan.steps[0].params.get(plan.steps[0].initiator)
+            if value is not None:
+                assert value in prompt
+
+
+class TestGenerateFromCatalog:
+    def test_output_is_deterministic(self, tmp_path):
+        generate_from_catalog(50, tmp_path / "a.jsonl", seed=1)
+        generate_from_catalog(50, tmp_path / "b.jsonl", seed=1)
+
+        assert (tmp_path / "a.jsonl").read_text() == (tmp_path / "b.jsonl").read_text()
+        rows = [json.loads(line) for line in (tmp_path / "a.jsonl").read_text().splitlines()]
+        assert len(rows) == 50
+        assert rows[0]["source"] == "catalog_synthetic"
+        assert build_message(QueryPlan.model_validate(rows[0]["plan"])) == rows[0]["message"]
+
+    def test_interrupted_run_keeps_the_previous_output(self, tmp_path):
+        out = tmp_path / "pairs.jsonl"
+        generate_from_catalog(10, out)
+        before = out.read_text()
+
+        def interrupted(self, count):
+            yield self.pair(*self.units[0])
+            raise KeyboardInterrupt
+
+        with patch.object(CatalogPairGenerator, "pairs", interrupted), pytest.raises(KeyboardInterrupt):
+            generate_from_catalog(10, out)
+
+        assert out.read_text() == before
+        assert [p.name for p in tmp_path.iterdir()] == ["pairs.jsonl"]
+
+    def test_pairs_feed_distillation(self, tmp_path):
+        pairs = tmp_path / "catalog_pairs.jsonl"
+        generate_from_catalog(30, pairs)
+
+        stats = distill(tmp_path / "out", tmp_path / "missing.jsonl", None, catalog_pairs_path=pairs)
+
+        assert stats["by_source"]["catalog_synthetic"] == stats["pairs"] > 0
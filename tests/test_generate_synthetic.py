@@ -0,0 +1,105 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+import training.generate_synthetic as gen
+
+
+def _write_messages(path, messages, jsonl=False):
+    with open(path, "w") as f:
+        if jsonl:
+            for m in messages:
+                f.write(json.dumps(m) + "\n")
+        else:
+            json.dump(messages, f, indent=2)
+
+
+def _read_pairs(path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class TestIterMessages:
+    def test_streams_json_array_across_chunks(self, tmp_path):
+        messages = [{"message": f"1. [service] Search Twitter {i} " + "x" * 50} for i in range(20)]
+        path = tmp_path / "messages.json"
+        _write_messages(path, messages)
+
+        with patch.object(gen, "_READ_CHUNK", 16):
+            assert list(gen.iter_messages(path)) == messages
+
+    def test_streams_jsonl(self, tmp_path):
+        messages = [{"message": "a"}, {"message": "b"}]
+        path = tmp_path / "messages.jsonl"
+        _write_messages(path, messages, jsonl=True)
+        assert list(gen.iter_messages(path)) == messages
+
+
+class TestGenerateFromMessages:
+    def _run(self, tmp_path, messages_path, reverse):
+        with patch.object(gen, "_reverse_generate", side_effect=reverse):
+            return asyncio.run(gen.generate_from_messages(
+                messages_path,
+                output_path=tmp_path / "pairs.jsonl",
+                checkpoint_path=tmp_path / "pairs.checkpoint",
+                concurrency=3,
+            ))
+
+    def test_writes_pairs_and_skips_duplicates(self, tmp_path):
+        path = tmp_path / "messages.json"
+        _write_messages(path, [{"message": "m1"}, {"message": "m2"}, {"message": "m1"}])
+
+        async def reverse(message):
+            return [f"prompt for {message}", "Shared Prompt", "shared   prompt"]
+
+        progress = self._run(tmp_path, path, reverse)
+
+        pairs = _read_pairs(tmp_path / "pairs.jsonl")
+        assert sorted(p["input"] for p in pairs) == ["Shared Prompt", "prompt for m1", "prompt for m2"]
+        assert progress.done == 2
+        assert progress.skipped == 1
+
+    def test_resumes_after_failure(self, tmp_path):
+        path = tmp_path / "messages.json"
+        _write_messages(path, [{"message": "m1"}, {"message": "m2"}])
+
+        async def flaky(message):
+            if message == "m2":
+                raise RuntimeError("rate limited")
+            return [f"prompt for {message}"]
+
+        first = self._run(tmp_path, path, flaky)
+        assert first.done == 1 and first.failed == 1
+
+        calls = []
+
+        async def reverse(message):
+            calls.append(message)
+            return [f"prompt for {message}"]
+
+        second = self._run(tmp_path, path, reverse)
+        assert calls == ["m2"]
+        assert second.skipped == 1
+        assert len(_read_pairs(tmp_path / "pairs.jsonl")) == 2
+
+    def test_worker_crash_stops_the_run(self, tmp_path):
+        path = tmp_path / "messages.json"
+        _write_messages(path, [{"message": f"m{i}"} for i in range(50)])
+
+        async def reverse(message):
+            return [f"prompt for {message}"]
+
+        async def run():
+            with patch.object(gen, "_reverse_generate", side_effect=reverse), \
+                    patch.object(gen, "_prompt_key", side_effect=OSError("disk full")):
+                await asyncio.wait_for(gen.generate_from_messages(
+                    path,
+                    output_path=tmp_path / "pairs.jsonl",
+                    checkpoint_path=tmp_path / "pairs.checkpoint",
+                    concurrency=2,
+                ), timeout=5)
+
+        with pytest.raises(OSError, match="disk full"):
+            asyncio.run(run())
@@ -0,0 +1,112 @@
+from unittest.mock import patch
+
+from app.config import settings
+from app.main import _generated_plan
+from app.models.step_types import QueryMetadata, QueryPlan, StepPlan
+from app.services.entity_cache import entity_plan_cache
+from app.services.generation_log import GenerationLog, iter_records, list_segments, recent_records
+from app.services.plan_cache import PlanCache, plan_cache
+from app.services.planner import generate_plan, warm_plan_cache
+
+
+def _plan() -> QueryPlan:
+    return QueryPlan(
+        steps=[
+            StepPlan(
+                type="service",
+                service_category="twitter_posts",
+                initiator="keyword",
+                description="Search Twitter for posts with keyword: climate change",
+            ),
+        ],
+        metadata=QueryMetadata(source="twitter_posts", keywords="climate change"),
+    )
+
+
+class TestGenerationLog:
+    def test_writes_records_in_order(self, tmp_path):
+        log = GenerationLog(tmp_path, segment_max_bytes=1 << 20, flush_interval=0.05)
+        log.start()
+        for i in range(5):
+            assert log.append({"prompt": f"p{i}", "plan": _plan()})
+        log.stop()
+
+        records = list(iter_records(tmp_path))
+        assert [r["prompt"] for r in records] == ["p0", "p1", "p2", "p3", "p4"]
+        assert records[0]["plan"]["steps"][0]["service_category"] == "twitter_posts"
+
+    def test_rotates_segments(self, tmp_path):
+        log = GenerationLog(tmp_path, segment_max_bytes=50, flush_interval=0.05)
+        log.start()
+        for i in range(4):
+            log.append({"prompt": f"prompt number {i}", "padding": "x" * 40})
+        log.stop()
+
+        assert len(list_segments(tmp_path)) == 4
+        assert [r["prompt"] for r in iter_records(tmp_path)][-1] == "prompt number 3"
+
+    def test_append_is_noop_when_not_started(self, tmp_path):
+        log = GenerationLog(tmp_path, segment_max_bytes=1 << 20)
+        assert log.append({"prompt": "p"}) is False
+
+    def test_recent_records_returns_newest(self, tmp_path):
+        log = GenerationLog(tmp_path, segment_max_bytes=30, flush_interval=0.05)
+        log.start()
+        for i in range(10):
+            log.append({"prompt": f"p{i}"})
+        log.stop()
+
+        assert [r["prompt"] for r in recent_records(tmp_path, 3)] == ["p7", "p8", "p9"]
+
+
+class TestPlanCache:
+    def test_lru_eviction(self):
+        cache = PlanCache(max_size=2, ttl=60)
+        cache.put("a", _plan())
+        cache.put("b", _plan())
+        cache.get("a")
+        cache.put("c", _plan())
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+
+    def test_hit_returns_independent_copy(self):
+        cache = PlanCache(max_size=2, ttl=60)
+        cache.put("a", _plan())
+        cache.get("a").metadata.post_count = 999
+        assert cache.get("a").metadata.post_count == 50
+
+
+class TestWarmPlanCache:
+    def test_warmed_plans_skip_the_llm(self):
+        records = [
+            {"prompt": "Search Twitter for climate change", "options": {}, "model": settings.litellm_model,
+             "plan": _plan().model_dump(mode="json")},
+            {"prompt": "ignored", "options": {}, "model": "other/model", "plan": _plan().model_dump(mode="json")},
+        ]
+        assert warm_plan_cache(records) == 1
+
+        stats: dict = {}
+        with patch("app.services.planner._get_client", side_effect=AssertionError("LLM called")):
+            plan = generate_plan("Search Twitter for climate change", stats=stats)
+
+        assert stats["cache_hit"] is True
+        assert plan.steps[0].service_category == "twitter_posts"
+
+    def test_logged_plans_do_not_carry_counts_or_dates(self):
+        prompt = "Search Twitter for climate change"
+        warm_plan_cache([{"prompt": prompt, "options": {}, "model": settings.litellm_model,
+                          "plan": _plan().model_dump(mode="json")}])
+        stats: dict = {}
+        plan = generate_plan(prompt, {"post_count": 500, "date_from": "2026-01-01"}, stats=stats)
+        logged = _generated_plan(plan, stats)
+        assert (plan.metadata.post_count, plan.metadata.date_from) == (500, "2026-01-01")
+
+        # After a restart, the next request without options must not get the logged request's count and date
+        plan_cache.clear()
+        entity_plan_cache.clear()
+        warm_plan_cache([{"prompt": prompt, "options": {"post_count": 500, "date_from": "2026-01-01"},
+                          "model": settings.litellm_model, "plan": logged.model_dump(mode="json")}])
+        with patch("app.services.planner._get_client", side_effect=AssertionError("LLM called")):
+            plan = generate_plan(prompt)
+
+        assert (plan.metadata.post_count, plan.metadata.date_from) == (50, None)
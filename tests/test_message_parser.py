@@ -0,0 +1,49 @@
+import pytest
+
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.message_parser import MessageParseError, parse_message
+
+
+def _structure(plan: QueryPlan) -> list[tuple]:
+    return [(s.type, s.service_category, s.initiator, s.params, s.related_steps) for s in plan.steps]
+
+
+class TestParseMessage:
+    # Examples whose services are all in the test catalog
+    @pytest.mark.parametrize("index", [1, 4, 5])
+    def test_example_messages_round_trip(self, index):
+        example = EXAMPLES[index]
+        expected = QueryPlan.model_validate(example["plan"])
+
+        plan = parse_message(example["message"])
+
+        assert _structure(plan) == _structure(expected)
+        assert plan.metadata == expected.metadata
+
+    def test_edited_values_are_read_back(self):
+        plan = parse_message(
+            "1. [service] Scrap Twitter posts from user: @nasa\n"
+            "2. [scripter] Normalize Twitter data to standard format. Related step 1.\n"
+            "3. [scripter] Check if posts mention target: Artemis II. Related step 2.\n"
+            "4. [ai] Keep only posts about the launch date. Related step 2."
+        )
+        assert plan.steps[0].params == {"username": "nasa"}
+        assert plan.steps[2].params == {"operation": "mentions_target", "target": "Artemis II"}
+        assert plan.steps[3].description == "Keep only posts about the launch date. Related step 2."
+        assert plan.metadata.target_name == "nasa"
+
+    def test_wrapped_lines_continue_the_step(self):
+        plan = parse_message("1. [service] Search Twitter posts\nwith keyword: rain")
+        assert plan.steps[0].params == {"keyword": "rain"}
+
+    @pytest.mark.parametrize("message, match", [
+        ("", "no steps"),
+        ("Scrape some tweets", "numbered step"),
+        ("1. [service] Search Twitter posts with keyword: a\n3. [scripter] Analyze sentiment", "out of order"),
+        ("1. [scripter] Analyze sentiment. Related step 1.", "isn't before it"),
+        ("1. [service] Run the weather forecast", "which service"),
+    ])
+    def test_unparseable_messages(self, message, match):
+        with pytest.raises(MessageParseError, match=match):
+            parse_message(message)
@@ -0,0 +1,62 @@
+import pytest
+
+from app.config import settings
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.catalog import use_collection
+from app.services.planner import generate_plan, set_completion_override, structural_options
+from tests.conftest import tool_call_completion
+
+
+@pytest.fixture
+def llm_calls():
+    calls = []
+    set_completion_override(tool_call_completion("QueryPlan", EXAMPLES[1]["plan"], calls))
+    yield calls
+    set_completion_override(None)
+
+
+class TestStructuralOptions:
+    def test_post_generation_options_removed(self):
+        assert structural_options({"post_count": 10, "date_from": "2026-01-01", "date_to": "2026-02-01"}) is None
+        assert structural_options({"post_count": 10, "language": "de"}) == {"language": "de"}
+        assert structural_options(None) is None
+
+    def test_counts_and_dates_stay_out_of_the_llm_input(self, llm_calls):
+        plan = generate_plan(
+            "Search Twitter for posts about climate change",
+            {"post_count": 200, "date_from": "2026-01-01"}, model="openai/test-model",
+        )
+        assert "Additional parameters" not in llm_calls[0]["messages"][-1]["content"]
+        assert plan.metadata.post_count == 200
+        assert plan.metadata.date_from == "2026-01-01"
+
+    def test_plans_shared_across_counts_and_dates(self, llm_calls):
+        prompt = "Search Twitter for posts about climate change"
+        first = generate_plan(prompt, {"post_count": 10}, model="openai/test-model")
+        stats: dict = {}
+        second = generate_plan(prompt, {"post_count": 500, "date_to": "2026-03-01"}, stats=stats, model="openai/test-model")
+
+        assert len(llm_calls) == 1
+        assert stats["cache_hit"] is True
+        assert (first.metadata.post_count, second.metadata.post_count) == (10, 500)
+        assert (first.metadata.date_to, second.metadata.date_to) == (None, "2026-03-01")
+
+    def test_structural_options_reach_the_llm(self, llm_calls):
+        prompt = "Search Twitter for posts about climate change"
+        generate_plan(prompt, {"language": "de", "post_count": 10}, model="openai/test-model")
+        generate_plan(prompt, {"language": "fr"}, model="openai/test-model")
+
+        assert len(llm_calls) == 2
+        assert llm_calls[0]["messages"][-1]["content"].endswith("Additional parameters: language: de")
+
+
+class TestCollectionScope:
+    def test_plans_not_shared_across_collections(self, llm_calls, monkeypatch):
+        monkeypatch.setattr(settings, "qdrant_collections", "staging")
+        prompt = "Search Twitter for posts about climate change"
+        generate_plan(prompt, model="openai/test-model")
+        with use_collection("staging"):
+            generate_plan(prompt, model="openai/test-model")
+            generate_plan(prompt, model="openai/test-model")
+
+        assert len(llm_calls) == 2
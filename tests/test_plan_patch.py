@@ -0,0 +1,105 @@
+import pytest
+
+from app.models.plan_patch import PlanPatch
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.plan_patch import PlanPatchError, apply_patch
+from app.services.planner import refine_plan, set_completion_override
+from tests.conftest import tool_call_completion
+
+# Example 5: scrape @elonmusk, normalize, sentiment, keywords, target, narratives
+PIPELINE = QueryPlan.model_validate(EXAMPLES[4]["plan"])
+
+
+def _patch(*ops, **metadata) -> PlanPatch:
+    return PlanPatch.model_validate({"ops": list(ops), "m": metadata})
+
+
+@pytest.fixture
+def reset_completion_override():
+    yield
+    set_completion_override(None)
+
+
+class TestApplyPatch:
+    def test_insert_renumbers_related_steps(self):
+        plan = apply_patch(PIPELINE, _patch(
+            {"op": "insert", "at": 2, "step": {"t": "ai", "d": "Drop posts about SpaceX", "r": [2]}},
+        ))
+        assert len(plan.steps) == 7
+        assert plan.steps[2].description == "Drop posts about SpaceX. Related step 2."
+        assert [s.related_steps for s in plan.steps] == [[], [1], [2], [2], [2], [2], [2]]
+        assert plan.steps[3].description.endswith("Related step 2.")
+
+    def test_insert_at_start_shifts_everything(self):
+        plan = apply_patch(PIPELINE, _patch(
+            {"op": "insert", "at": 0, "step": {"t": "service", "c": "twitter_posts", "i": "keyword", "p": {"keyword": "Tesla"}}},
+        ))
+        assert plan.steps[0].params == {"keyword": "Tesla"}
+        assert plan.steps[2].related_steps == [2]
+        assert plan.steps[2].description.endswith("Related step 2.")
+        assert plan.steps[3].related_steps == [3]
+        assert plan.steps[3].description.endswith("Related step 3.")
+
+    def test_delete_inherits_references(self):
+        # Deleting normalize re-attaches the analysis steps to the scrape
+        plan = apply_patch(PIPELINE, _patch({"op": "delete", "at": 2}))
+        assert len(plan.steps) == 5
+        assert [s.related_steps for s in plan.steps] == [[], [1], [1], [1], [1]]
+        assert plan.steps[1].description.endswith("Related step 1.")
+
+    def test_replace_keeps_numbering_and_rederives_metadata(self):
+        plan = apply_patch(PIPELINE, _patch(
+            {"op": "replace", "at": 1, "step": {"t": "service", "c": "twitter_posts", "i": "username", "p": {"username": "@nasa"}}},
+            n=200,
+        ))
+        assert plan.steps[0].description == "Scrap Twitter posts from user: @nasa"
+        assert plan.metadata.target_name == "nasa"
+        assert plan.metadata.post_count == 200
+        # Explicit metadata that wasn't derived from the steps is kept
+        assert plan.metadata.keywords == PIPELINE.metadata.keywords
+        assert plan.metadata.narrative_topics == PIPELINE.metadata.narrative_topics
+
+    def test_original_plan_unchanged(self):
+        before = PIPELINE.model_dump()
+        apply_patch(PIPELINE, _patch({"op": "delete", "at": 2}))
+        assert PIPELINE.model_dump() == before
+
+    @pytest.mark.parametrize("ops, match", [
+        ([{"op": "delete", "at": 7}], "outside the plan"),
+        ([{"op": "insert", "at": 7, "step": {"t": "scripter"}}], "outside the plan"),
+        ([{"op": "replace", "at": 1}], "needs a step"),
+        ([{"op": "delete", "at": 2}, {"op": "delete", "at": 2}], "more than once"),
+        ([{"op": "insert", "at": 1, "step": {"t": "scripter", "r": [3]}}], "later step"),
+        ([{"op": "insert", "at": 6, "step": {"t": "scripter", "r": [9]}}], "doesn't exist"),
+    ])
+    def test_invalid_patches(self, ops, match):
+        with pytest.raises(PlanPatchError, match=match):
+            apply_patch(PIPELINE, _patch(*ops))
+
+    def test_deleting_every_step(self):
+        single = QueryPlan.model_validate(EXAMPLES[0]["plan"])
+        ops = [{"op": "delete", "at": n} for n in range(1, len(single.steps) + 1)]
+        with pytest.raises(PlanPatchError, match="every step"):
+            apply_patch(single, _patch(*ops))
+
+    def test_validation_context_rejects_patch(self):
+        with pytest.raises(ValueError, match="outside the plan"):
+            PlanPatch.model_validate({"ops": [{"op": "delete", "at": 9}]}, context={"plan": PIPELINE})
+
+
+class TestRefinePlan:
+    def test_refine_plan_applies_llm_patch(self, reset_completion_override):
+        patch_args = {"ops": [{"op": "insert", "at": 2, "step": {"t": "scripter", "p": {"operation": "sentiment"}, "r": [2]}}]}
+        calls = []
+        set_completion_override(tool_call_completion("PlanPatch", patch_args, calls))
+        base = QueryPlan.model_validate(EXAMPLES[2]["plan"])
+        stats: dict = {}
+        plan = refine_plan(base, "also add sentiment", {"post_count": 300}, stats=stats, model="openai/test-model")
+
+        assert calls[0]["tools"][0]["function"]["name"] == "PlanPatch"
+        assert "Current plan: {" in calls[0]["messages"][-1]["content"]
+        assert stats["patch_ops"] == 1
+        assert len(plan.steps) == len(base.steps) + 1
+        assert plan.steps[2].params == {"operation": "sentiment"}
+        assert plan.metadata.post_count == 300
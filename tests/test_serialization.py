@@ -0,0 +1,35 @@
+import json
+from unittest.mock import patch
+
+from app.models.step_types import QueryMetadata, QueryPlan, StepPlan
+from app.services import serialization
+from app.services.assembler import build_message, build_response
+from app.services.serialization import FastJSONResponse, dumps
+
+
+def _plan() -> QueryPlan:
+    return QueryPlan(
+        steps=[
+            StepPlan(type="service", service_category="twitter_posts", initiator="keyword",
+                     description="Search Twitter for posts about café"),
+            StepPlan(type="ai", description="Classify posts", related_steps=[1]),
+        ],
+        metadata=QueryMetadata(source="twitter"),
+    )
+
+
+class TestDumps:
+    def test_model_matches_pydantic_json(self):
+        response = build_response(_plan(), build_message(_plan()))
+        assert json.loads(dumps(response)) == json.loads(response.model_dump_json())
+
+    def test_stdlib_fallback_matches_orjson(self):
+        value = {"a": [1, 2.5, None], "b": "ü"}
+        with patch.object(serialization, "orjson", None):
+            fallback = dumps(value)
+        assert json.loads(fallback) == json.loads(dumps(value)) == value
+
+    def test_response_renders_once(self):
+        response = FastJSONResponse({"ok": True}, headers={"X-Test": "1"})
+        assert response.body == b'{"ok":true}'
+        assert response.headers["content-type"] == "application/json"
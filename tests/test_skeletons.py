@@ -0,0 +1,196 @@
+from unittest.mock import patch
+
+import httpx
+import pytest
+from sqlmodel import Session
+
+from app.config import settings
+from app.database import create_db_engine, init_db
+from app.models.feedback import QueryBuilderLog
+from app.models.step_types import QueryPlan
+from app.prompts.few_shot_examples import EXAMPLES
+from app.services.planner import generate_plan, set_completion_override
+from app.services.skeletons import (
+    Skeleton,
+    SkeletonError,
+    build_skeleton_library,
+    example_pairs,
+    extract_skeleton,
+    get_skeleton_library,
+    load_skeleton_library,
+    set_skeleton_library,
+)
+from tests.conftest import tool_call_completion
+
+# Example 5: scrape @elonmusk, normalize, sentiment, keywords, target, narratives
+PIPELINE = QueryPlan.model_validate(EXAMPLES[4]["plan"])
+
+
+def _structure(plan: QueryPlan) -> list[tuple]:
+    return [(s.type, s.service_category, s.initiator, s.params, s.related_steps) for s in plan.steps]
+
+
+@pytest.fixture
+def skeleton_planning(monkeypatch):
+    monkeypatch.setattr(settings, "skeleton_planning", True)
+    set_skeleton_library(None)
+    yield
+    set_completion_override(None)
+    set_skeleton_library(None)
+
+
+class TestExtractSkeleton:
+    def test_values_become_slots(self):
+        steps, values = extract_skeleton(PIPELINE)
+        assert values == {"platform": "twitter", "username": "elonmusk", "keywords": "EV, electric, stock", "target": "Tesla"}
+        assert steps[0]["service_category"] == {"$slot": "platform", "suffix": "_posts"}
+        assert steps[1]["params"] == {"platform": {"$slot": "platform"}}
+
+    def test_fill_rebuilds_the_plan(self):
+        steps, values = extract_skeleton(PIPELINE)
+        plan = Skeleton(steps, list(values)).fill(values)
+        assert _structure(plan) == _structure(PIPELINE)
+        assert plan.metadata == PIPELINE.metadata
+
+    def test_same_shape_same_skeleton(self):
+        other = PIPELINE.model_copy(deep=True)
+        other.steps[0].params = {"username": "nasa"}
+        other.steps[4].params["target"] = "Mars"
+        assert extract_skeleton(other)[0] == extract_skeleton(PIPELINE)[0]
+
+    def test_repeated_value_shares_a_slot(self):
+        fan_out = QueryPlan.model_validate(EXAMPLES[6]["plan"])
+        steps, values = extract_skeleton(fan_out)
+        # Several platforms: categories stay literal, the username is one slot
+        assert values == {"username": "johndoe123"}
+        assert steps[1]["service_category"] == "instagram_profiles"
+
+    def test_ai_description_is_a_slot(self):
+        plan = QueryPlan.model_validate({
+            "steps": [
+                {"type": "service", "service_category": "twitter_posts", "initiator": "keyword",
+                 "description": "x", "params": {"keyword": "rain"}},
+                {"type": "ai", "description": "Keep posts about floods. Related step 1.", "related_steps": [1]},
+            ],
+            "metadata": {},
+        })
+        steps, values = extract_skeleton(plan)
+        assert values["instruction"] == "Keep posts about floods."
+        filled = Skeleton(steps, list(values)).fill({**values, "instruction": "Keep posts about storms"})
+        assert filled.steps[1].description == "Keep posts about storms. Related step 1."
+
+
+class TestSkeletonFill:
+    def _keyword_skeleton(self) -> Skeleton:
+        steps, values = extract_skeleton(QueryPlan.model_validate(EXAMPLES[1]["plan"]))
+        return Skeleton(steps, list(values))
+
+    def test_platform_choices_come_from_catalog(self):
+        schema = self._keyword_skeleton().slot_model().model_json_schema()
+        # Only twitter_posts supports keyword search in the test catalog
+        assert schema["properties"]["platform"]["const"] == "twitter"
+        assert set(schema["required"]) == {"fits", "platform", "keyword"}
+
+    def test_unknown_service_rejected(self):
+        with pytest.raises(SkeletonError, match="instagram_posts"):
+            self._keyword_skeleton().fill({"platform": "instagram", "keyword": "rain"})
+
+    def test_platform_must_match_prompt(self):
+        with pytest.raises(SkeletonError, match="asks for instagram"):
+            self._keyword_skeleton().fill({"platform": "twitter", "keyword": "rain"}, "Search Instagram for rain")
+
+    def test_empty_slot_rejected(self):
+        with pytest.raises(SkeletonError, match="empty"):
+            self._keyword_skeleton().fill({"platform": "twitter", "keyword": " "})
+
+
+class TestSkeletonLibrary:
+    def test_examples_are_matched(self):
+        library = get_skeleton_library()
+        assert len(library) == len(EXAMPLES)
+        skeleton, score = library.match("Analyze sentiment of Twitter posts about @nasa mentioning Mars, with keywords: moon")
+        assert skeleton.id == build_skeleton_library(example_pairs(), 1, 0).match(EXAMPLES[4]["input"])[0].id
+        assert score >= settings.skeleton_min_score
+
+    def test_unrelated_prompt_not_matched(self):
+        assert get_skeleton_library().match("What is the weather in Paris tomorrow?") is None
+
+    def test_mined_skeletons_need_support(self):
+        sentiment_only = {
+            "steps": [
+                {"type": "service", "service_category": "twitter_posts", "initiator": "hashtag",
+                 "description": "x", "params": {"hashtag": "ai"}},
+                {"type": "scripter", "description": "x", "related_steps": [1], "params": {"operation": "sentiment"}},
+            ],
+            "metadata": {},
+        }
+        records = [{"prompt": f"sentiment of #{tag}", "plan": sentiment_only} for tag in ("ai", "ml")]
+        assert len(load_skeleton_library(None, records, 3, 0.5, 0)) == len(EXAMPLES)
+        assert len(load_skeleton_library(None, records, 2, 0.5, 0)) == len(EXAMPLES) + 1
+
+    def test_corrections_replace_logged_plans(self):
+        engine = create_db_engine("sqlite://")
+        init_db(engine)
+        with Session(engine) as session:
+            session.add(QueryBuilderLog(
+                user_id=1, input_prompt="tweets by @nasa with sentiment", rating=2, was_edited=True,
+                generated_message="1. [service] Scrap Twitter posts from user: @nasa",
+                final_message=(
+                    "1. [service] Scrap Twitter posts from user: @nasa\n"
+                    "2. [scripter] Analyze sentiment of post content. Related step 1."
+                ),
+            ))
+            session.commit()
+        logged = {"steps": [{"type": "service", "service_category": "twitter_posts", "initiator": "username",
+                             "description": "x", "params": {"username": "nasa"}}], "metadata": {}}
+        records = [{"prompt": "tweets by @nasa with sentiment", "plan": logged}]
+
+        library = load_skeleton_library(engine, records, 1, 0.5, 100)
+
+        skeleton, _ = library.match("tweets by @esa with sentiment")
+        assert [step["type"] for step in skeleton.steps] == ["service", "scripter"]
+
+    def test_corrections_skipped_when_catalog_unavailable(self):
+        engine = create_db_engine("sqlite://")
+        init_db(engine)
+        with Session(engine) as session:
+            session.add(QueryBuilderLog(
+                user_id=1, input_prompt="tweets by @nasa", rating=2, was_edited=True,
+                generated_message="1. [service] Scrap Twitter posts", final_message="1. [service] Scrap Twitter posts from user: @nasa",
+            ))
+            session.commit()
+
+        with patch("app.services.catalog._fetch_catalog_from_qdrant", side_effect=httpx.ConnectError("down")):
+            library = load_skeleton_library(engine, [], 1, 0.5, 100)
+
+        assert len(library) == len(EXAMPLES)
+
+
+class TestSkeletonPlanning:
+    def test_slots_filled_by_llm(self, skeleton_planning):
+        set_completion_override(tool_call_completion("SkeletonSlots", {"fits": True, "platform": "twitter", "keyword": "rain"}))
+        stats: dict = {}
+        plan = generate_plan("Search Twitter for posts about rain", stats=stats, model="openai/test-model")
+
+        assert stats["skeleton"] is not None
+        assert plan.steps[0].params == {"keyword": "rain"}
+        assert plan.steps[0].description == "Search Twitter posts with keyword: rain"
+        assert plan.metadata.keywords == "rain"
+
+    def test_falls_back_when_skeleton_does_not_fit(self, skeleton_planning):
+        calls = []
+        skeleton_reply = tool_call_completion("SkeletonSlots", {"fits": False, "platform": "twitter", "keyword": "rain"})
+        full_reply = tool_call_completion("QueryPlan", EXAMPLES[1]["plan"])
+
+        def completion(**kwargs):
+            calls.append(kwargs["tools"][0]["function"]["name"])
+            return (skeleton_reply if len(calls) == 1 else full_reply)(**kwargs)
+
+        set_completion_override(completion)
+        stats: dict = {}
+        plan = generate_plan("Search Twitter for posts about rain", stats=stats, model="openai/test-model")
+
+        assert calls == ["SkeletonSlots", "QueryPlan"]
+        assert "skeleton" not in stats
+        assert "doesn't fit" in stats["skeleton_fallback"]["error"]
+        assert plan.metadata.keywords == "climate change"
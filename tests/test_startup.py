@@ -0,0 +1,45 @@
+import copy
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import app.services.catalog as cat_mod
+from app.prompts import system_prompt
+from app.prompts.system_prompt import build_system_prompt
+from app.services.catalog import get_catalog_version
+from tests.conftest import _TEST_CATALOG
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+class TestLazyImports:
+    def test_app_import_does_not_load_llm_sdks(self):
+        code = "import sys, app.main; print('litellm' in sys.modules, 'instructor' in sys.modules)"
+        out = subprocess.run(
+            [sys.executable, "-c", code], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        assert out.split() == ["False", "False"]
+
+
+class TestPromptCache:
+    def test_prompt_rendered_once_per_catalog_version(self):
+        with patch.object(system_prompt, "get_services_summary", wraps=system_prompt.get_services_summary) as summary:
+            first = build_system_prompt()
+            assert build_system_prompt() is first
+            assert summary.call_count == 1
+
+            # A refresh that changes nothing keeps the version and the prompt
+            version = get_catalog_version()
+            cat_mod._collection().loaded_at = -cat_mod._CACHE_TTL
+            assert build_system_prompt() is first
+            assert get_catalog_version() == version
+
+            # A changed catalog gets a new version and re-renders the prompt
+            changed = copy.deepcopy(_TEST_CATALOG)
+            changed["services"][0]["services"][0]["name"] = "Tweet Scraper Pro"
+            cat_mod._collection().loaded_at = -cat_mod._CACHE_TTL
+            with patch.object(cat_mod, "_fetch_catalog_from_qdrant", return_value=changed):
+                assert "Tweet Scraper Pro" in build_system_prompt()
+            assert get_catalog_version() != version
+            assert summary.call_count == 2
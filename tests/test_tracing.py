@@ -0,0 +1,79 @@
+import json
+import logging
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models.step_types import QueryMetadata, QueryPlan, StepPlan
+from app.services import tracing
+from app.services.assembler import build_message
+from app.services.tracing import TraceIdFilter, span
+
+
+@pytest.fixture
+def span_file(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    with patch.multiple("app.services.tracing.settings", tracing_exporter="file", tracing_file=str(path)):
+        tracing.configure_tracing()
+        yield path
+        tracing.shutdown_tracing()
+
+
+def _read_spans(path) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def _plan() -> QueryPlan:
+    return QueryPlan(
+        steps=[StepPlan(type="ai", description="Classify posts")],
+        metadata=QueryMetadata(),
+    )
+
+
+class TestSpans:
+    def test_disabled_tracing_is_noop(self):
+        with span("anything", key="value") as span_:
+            assert span_ is tracing.NOOP_SPAN
+        assert tracing.current_trace_id() is None
+
+    def test_spans_nest_and_export(self, span_file):
+        with span("parent", component="test") as parent:
+            build_message(_plan())
+            with pytest.raises(ValueError):
+                with span("failing"):
+                    raise ValueError("boom")
+        tracing.shutdown_tracing()
+
+        spans = {s["name"]: s for s in _read_spans(span_file)}
+        assert spans["assembler.build_message"]["parentSpanId"] == parent.span_id
+        assert spans["assembler.build_message"]["traceId"] == parent.trace_id
+        assert spans["failing"]["status"]["code"] == 2
+        assert "parentSpanId" not in spans["parent"]
+        attrs = {a["key"]: a["value"] for a in spans["assembler.build_message"]["attributes"]}
+        assert attrs["plan.step_count"] == {"intValue": "1"}
+
+    def test_log_records_carry_trace_id(self, span_file):
+        record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", None, None)
+        with span("parent") as parent:
+            TraceIdFilter().filter(record)
+        assert record.trace_id == parent.trace_id
+
+
+class TestRequestTracing:
+    @patch("app.main.generate_plan", return_value=_plan())
+    def test_generate_request_has_root_span(self, mock_plan, span_file):
+        client = TestClient(app)
+        assert client.post("/generate", json={"prompt": "x"}).status_code == 200
+        time.sleep(0.05)
+        tracing.shutdown_tracing()
+
+        spans = _read_spans(span_file)
+        root = next(s for s in spans if s["name"] == "http.request")
+        children = [s for s in spans if s.get("parentSpanId") == root["spanId"]]
+        assert {"assembler.build_message", "assembler.build_response"} <= {s["name"] for s in children}
+        attrs = {a["key"]: a["value"] for a in root["attributes"]}
+        assert attrs["http.status_code"] == {"intValue": "200"}
@@ -0,0 +1,352 @@
+"""
+Build the fine-tuning dataset from all pair sources in one streaming pass.
+
+Sources are read line by line in priority order (by default corrections,
+then logged generations, then synthetic pairs), and each pair goes through:
+
+1. Near-duplicate removal: MinHash signatures of the prompt's word
+   bigrams, banded for LSH (``BANDS`` bands of ``ROWS`` rows: prompts with
+   a Jaccard similarity above ~0.84 very likely share a band). A pair is
+   dropped if any of its band keys was seen before, so a correction always
+   wins over a later synthetic near-copy of its prompt. Seen band keys are
+   kept in a fixed-size Bloom filter (``--dedupe-memory-mb``), which bounds
+   memory however many pairs are read, at the cost of a tiny false
+   positive rate.
+2. Split: a hash of the prompt's entity-free template (URLs, @usernames,
+   #hashtags and quotes replaced by placeholders) picks train, val or test,
+   so the same request with different entities never leaks across splits
+   and re-runs give the same split.
+3. Packing: pairs are bucketed by estimated token length and packed into
+   sequences of at most ``--max-tokens``, each from a single bucket so
+   short and long examples aren't mixed.
+4. Sharding: each split's packs are written to ``<split>-NNNNN.jsonl``
+   files of at most ``--shard-size`` packs.
+
+Only one open pack per bucket and split is held in memory. The dataset is
+built in a temporary directory and swapped in when complete, together with
+a manifest.json of counts and settings.
+
+Output: training/data/dataset/
+
+Usage:
+    python build_dataset.py
+    python build_dataset.py --source corrections=corrections.jsonl --source synthetic=pairs.jsonl
+    python build_dataset.py --benchmark 1000000
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import resource
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.entity_cache import extract_entities
+
+DATA_DIR = Path(__file__).parent / "data"
+OUTPUT_DIR = DATA_DIR / "dataset"
+DEFAULT_SOURCES = [
+    ("corrections", DATA_DIR / "corrections.jsonl"),
+    ("generations", DATA_DIR / "generations.jsonl"),
+    ("synthetic", DATA_DIR / "pairs.jsonl"),
+]
+SPLITS = ("train", "val", "test")
+
+BANDS = 4
+ROWS = 8
+# One 32-bit hash per signature row, all from a single digest of the shingle
+_ROW_HASHES = struct.Struct(f"<{BANDS * ROWS}I")
+_WORD = re.compile(r"\w+")
+_CHARS_PER_TOKEN = 4  # Rough token estimate; no tokenizer is needed to pack
+
+
+def minhash(text: str) -> list[int]:
+    """Return the MinHash signature of ``text``'s lowercase word bigrams."""
+    words = _WORD.findall(text.lower())
+    shingles = {" ".join(words[i:i + 2]) for i in range(max(1, len(words) - 1))}
+    rows = [_ROW_HASHES.unpack(hashlib.shake_128(s.encode()).digest(_ROW_HASHES.size)) for s in shingles]
+    return list(map(min, zip(*rows)))
+
+
+def band_keys(signature: list[int]) -> list[int]:
+    """Return one 64-bit LSH key per band (ints hash deterministically across runs)."""
+    return [hash((band, *signature[band * ROWS:(band + 1) * ROWS])) & 0xFFFFFFFFFFFFFFFF for band in range(BANDS)]
+
+
+class BloomFilter:
+    """Fixed-size set of 64-bit keys with false positives but no false negatives."""
+
+    def __init__(self, size_bytes: int, probes: int = 4):
+        self._bits = bytearray(size_bytes)
+        self._size = size_bytes * 8
+        self._probes = probes
+
+    def _positions(self, key: int) -> Iterator[int]:
+        h1, h2 = key & 0xFFFFFFFF, (key >> 32) | 1
+        for i in range(self._probes):
+            yield (h1 + i * h2) % self._size
+
+    def __contains__(self, key: int) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: int) -> None:
+        for p in self._positions(key):
+            self._bits[p >> 3] |= 1 << (p & 7)
+
+
+def assign_split(prompt: str, val_fraction: float, test_fraction: float) -> str:
+    """Pick a pair's split from a hash of its entity-free prompt template."""
+    template = " ".join(extract_entities(prompt)[0].lower().split())
+    digest = hashlib.blake2b(template.encode(), digest_size=8).digest()
+    point = int.from_bytes(digest, "big") / 2**64
+    if point < test_fraction:
+        return "test"
+    if point < test_fraction + val_fraction:
+        return "val"
+    return "train"
+
+
+def estimate_tokens(pair: dict) -> int:
+    target = pair.get("message") or json.dumps(pair.get("plan"))
+    return (len(pair["input"]) + len(target)) // _CHARS_PER_TOKEN + 1
+
+
+def _bucket(tokens: int, max_tokens: int) -> int:
+    """The smallest power of two (from 64, at most ``max_tokens``) that fits ``tokens``."""
+    bucket = 64
+    while bucket < tokens and bucket < max_tokens:
+        bucket *= 2
+    return min(bucket, max_tokens)
+
+
+def iter_source(path: Path) -> Iterator[dict | None]:
+    """Stream the pairs of a JSONL file; yield None for lines that aren't usable pairs."""
+    if not path.exists():
+        return
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                pair = json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+                continue
+            valid = isinstance(pair, dict) and isinstance(pair.get("input"), str) and (pair.get("message") or pair.get("plan"))
+            yield pair if valid else None
+
+
+class _ShardWriter:
+    """Writes one split's packs to numbered shard files."""
+
+    def __init__(self, directory: Path, split: str, shard_size: int):
+        self.directory = directory
+        self.split = split
+        self.shard_size = shard_size
+        self.shards: list[str] = []
+        self.packs = 0
+        self._file = None
+        self._in_shard = 0
+
+    def write(self, pack: dict) -> None:
+        if self._file is None or self._in_shard >= self.shard_size:
+            self._open()
+        self._file.write(json.dumps(pack) + "\n")
+        self._in_shard += 1
+        self.packs += 1
+
+    def _open(self) -> None:
+        self.close()
+        name = f"{self.split}-{len(self.shards):05d}.jsonl"
+        self._file = open(self.directory / name, "w")
+        self.shards.append(name)
+        self._in_shard = 0
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _Packer:
+    """Length-bucketed packing of one split's pairs."""
+
+    def __init__(self, writer: _ShardWriter, max_tokens: int):
+        self.writer = writer
+        self.max_tokens = max_tokens
+        self.examples = 0
+        self._open: dict[int, tuple[list[dict], int]] = {}  # bucket -> (examples, tokens)
+
+    def add(self, pair: dict, tokens: int) -> None:
+        bucket = _bucket(tokens, self.max_tokens)
+        examples, total = self._open.get(bucket, ([], 0))
+        if examples and total + tokens > self.max_tokens:
+            self._flush(bucket, examples, total)
+            examples, total = [], 0
+        examples.append(pair)
+        self._open[bucket] = (examples, total + tokens)
+        self.examples += 1
+
+    def _flush(self, bucket: int, examples: list[dict], total: int) -> None:
+        self.writer.write({"bucket": bucket, "tokens": total, "examples": examples})
+
+    def close(self) -> None:
+        for bucket, (examples, total) in sorted(self._open.items()):
+            self._flush(bucket, examples, total)
+        self._open.clear()
+        self.writer.close()
+
+
+def build_dataset(
+    sources: list[tuple[str, Path]] = DEFAULT_SOURCES,
+    output_dir: Path = OUTPUT_DIR,
+    val_fraction: float = 0.05,
+    test_fraction: float = 0.05,
+    max_tokens: int = 2048,
+    shard_size: int = 10000,
+    dedupe_memory_mb: float = 32,
+) -> dict:
+    """Stream ``sources`` (highest priority first) into a split, packed, sharded dataset; return the manifest."""
+    output_dir = Path(output_dir)
+    output_dir.parent.mkdir(parents=True, exist_ok=True)
+    build_dir = Path(tempfile.mkdtemp(dir=output_dir.parent, prefix=f".{output_dir.name}-"))
+    seen = BloomFilter(max(1, int(dedupe_memory_mb * (1 << 20))))
+    packers = {split: _Packer(_ShardWriter(build_dir, split, shard_size), max_tokens) for split in SPLITS}
+    stats: dict[str, Counter] = {}
+
+    try:
+        for name, path in sources:
+            counts = stats.setdefault(name, Counter())
+            for pair in iter_source(Path(path)):
+                counts["read"] += 1
+                if pair is None:
+                    counts["invalid"] += 1
+                    continue
+                keys = band_keys(minhash(pair["input"]))
+                if any(key in seen for key in keys):
+                    counts["near_duplicates"] += 1
+                    continue
+                for key in keys:
+                    seen.add(key)
+                pair.setdefault("source", name)
+                packers[assign_split(pair["input"], val_fraction, test_fraction)].add(pair, estimate_tokens(pair))
+                counts["kept"] += 1
+        for packer in packers.values():
+            packer.close()
+
+        manifest = {
+            "sources": {name: dict(counts) for name, counts in stats.items()},
+            "splits": {
+                split: {"examples": p.examples, "packs": p.writer.packs, "shards": p.writer.shards}
+                for split, p in packers.items()
+            },
+            "config": {
+                "val_fraction": val_fraction, "test_fraction": test_fraction, "max_tokens": max_tokens,
+                "shard_size": shard_size, "bands": BANDS, "rows": ROWS, "dedupe_memory_mb": dedupe_memory_mb,
+            },
+        }
+        with open(build_dir / "manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+    except BaseException:
+        for packer in packers.values():
+            packer.writer.close()
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    os.replace(build_dir, output_dir)
+    return manifest
+
+
+def iter_split(dataset_dir: Path, split: str) -> Iterator[dict]:
+    """Stream the examples of one split of a built dataset, unpacked, in shard order."""
+    dataset_dir = Path(dataset_dir)
+    with open(dataset_dir / "manifest.json") as f:
+        shards = json.load(f)["splits"][split]["shards"]
+    for name in shards:
+        with open(dataset_dir / name) as f:
+            for line in f:
+                yield from json.loads(line)["examples"]
+
+
+def benchmark(rows: int, **kwargs) -> dict:
+    """Time a build over ``rows`` random pairs, every fifth a near-duplicate of the one before."""
+    rng = random.Random(0)
+    vocabulary = [f"w{i}" for i in range(5000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        source = tmp_dir / "pairs.jsonl"
+        with open(source, "w") as f:
+            for i in range(rows):
+                if i % 5 == 4:
+                    prompt += " please"
+                else:
+                    prompt = "Search Twitter for " + " ".join(rng.choices(vocabulary, k=8))
+                f.write(json.dumps({
+                    "input": prompt,
+                    "message": f"1. [service] Search Twitter for posts with keyword: {prompt[19:]}",
+                }) + "\n")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        manifest = build_dataset([("synthetic", source)], tmp_dir / "dataset", **kwargs)
+        elapsed = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return {
+        "rows": rows,
+        "kept": manifest["sources"]["synthetic"].get("kept", 0),
+        "build_s": elapsed,
+        "rows_per_s": rows / elapsed if elapsed else 0.0,
+        "peak_rss_growth_mb": (rss_after - rss_before) / 1024,
+    }
+
+
+def _parse_source(value: str) -> tuple[str, Path]:
+    name, sep, path = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=PATH, got {value!r}")
+    return name, Path(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", type=_parse_source, action="append",
+                        help="NAME=PATH of a pairs JSONL file, highest priority first (repeatable)")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    parser.add_argument("--val-fraction", type=float, default=0.05)
+    parser.add_argument("--test-fraction", type=float, default=0.05)
+    parser.add_argument("--max-tokens", type=int, default=2048, help="Token budget of a packed sequence")
+    parser.add_argument("--shard-size", type=int, default=10000, help="Packs per shard file")
+    parser.add_argument("--dedupe-memory-mb", type=float, default=32, help="Size of the near-duplicate filter")
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", help="Benchmark on synthetic pairs")
+    args = parser.parse_args()
+
+    options = {
+        "val_fraction": args.val_fraction, "test_fraction": args.test_fraction, "max_tokens": args.max_tokens,
+        "shard_size": args.shard_size, "dedupe_memory_mb": args.dedupe_memory_mb,
+    }
+    if args.benchmark:
+        stats = benchmark(args.benchmark, **options)
+        print(f"Built {stats['kept']} of {stats['rows']} pairs in {stats['build_s']:.1f}s "
+              f"({stats['rows_per_s']:,.0f} pairs/s, peak RSS +{stats['peak_rss_growth_mb']:.1f} MB)")
+        sys.exit(0)
+
+    manifest = build_dataset(args.source or DEFAULT_SOURCES, args.output_dir, **options)
+    for name, counts in manifest["sources"].items():
+        print(f"{name:12s} {counts}")
+    for split, info in manifest["splits"].items():
+        print(f"{split:5s} {info['examples']} examples in {info['packs']} packs, {len(info['shards'])} shards")
+    print(f"Saved dataset to {args.output_dir}")
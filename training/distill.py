@@ -0,0 +1,300 @@
+"""
+Build a structured-output distillation dataset for a smaller planner model.
+
+``fine_tune.py`` trains on the rendered message text, but ``generate_plan``
+needs a model that answers with a ``QueryPlan`` tool call (instructor's
+TOOLS mode). This script collects (prompt, validated plan) pairs and writes
+them in the exact shape of a production planning request, so a fine-tuned
+model can be dropped into ``generate_plan`` in place of the large one.
+
+Sources, in priority order:
+1. User corrections (``export_corrections.py`` output): the numbered
+   ``final_message`` is parsed back into a plan with ``parse_message``.
+   Messages that don't parse unambiguously are skipped.
+2. The generation log: every plan the production planner served, whether
+   it came from the LLM or from the plan caches. Refinements are skipped,
+   since their plan depends on the base plan.
+3. Catalog-driven synthetic pairs (``generate_from_catalog.py`` output),
+   which cover categories and initiators real traffic rarely reaches.
+
+A prompt keeps only its first pair (same prompt, options and collection,
+ignoring case and spacing), so a correction replaces the plan the user
+corrected. A pair is dropped if any service step names a category or
+initiator that isn't in its collection's current catalog.
+
+Outputs (in ``--output-dir``):
+- plans.jsonl: one {"input", "options", "collection", "plan", "source"} per pair
+- openai.jsonl: chat fine-tuning examples with the planner's system prompt,
+  the user message and a ``QueryPlan`` (or ``CompactPlan``) tool call
+- alpaca.jsonl: instruction/input/output rows whose output is the plan JSON
+
+Usage:
+    python distill.py
+    python distill.py --log-dir ./generation_log --models gpt-4o --format compact
+    python distill.py --catalog-pairs data/catalog_pairs.jsonl
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models.compact_plan import CompactPlan
+from app.models.step_types import QueryPlan
+from app.prompts.system_prompt import build_system_prompt
+from app.services.catalog import UnknownCollectionError, list_categories, use_collection
+from app.services.compact_plan import compact_json, compact_plan
+from app.services.generation_log import iter_records
+from app.services.message_parser import MessageParseError, parse_message
+from app.services.planner import build_user_message, structural_options
+
+DATA_DIR = Path(__file__).parent / "data"
+CORRECTIONS_FILE = DATA_DIR / "corrections.jsonl"
+CATALOG_PAIRS_FILE = DATA_DIR / "catalog_pairs.jsonl"
+OUTPUT_DIR = DATA_DIR / "distill"
+
+ALPACA_INSTRUCTION = "Convert this natural language request into a query plan for the social media analytics platform."
+
+
+def _prompt_key(prompt: str, options: dict | None, collection: str | None) -> str:
+    return json.dumps(
+        [" ".join(prompt.lower().split()), options or {}, collection or settings.qdrant_collection],
+        sort_keys=True, default=str,
+    )
+
+
+def iter_correction_pairs(path: Path, rejected: Counter) -> Iterator[dict]:
+    """Yield a pair for every correction whose final message parses back into a plan."""
+    if not path.exists():
+        return
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            if not row.get("input") or not row.get("message"):
+                rejected["correction_incomplete"] += 1
+                continue
+            try:
+                plan = parse_message(row["message"])
+            except (MessageParseError, ValidationError):
+                rejected["correction_unparsed"] += 1
+                continue
+            yield {"input": row["input"], "options": {}, "collection": None, "plan": plan, "source": "user_correction"}
+
+
+def iter_log_pairs(log_dir: str | Path, models: set[str] | None, rejected: Counter) -> Iterator[dict]:
+    """Yield a pair for every generation log record with a valid plan (from ``models``, if given)."""
+    for record in iter_records(log_dir):
+        if record.get("kind") == "refine" or not record.get("prompt") or not record.get("plan"):
+            continue
+        if models and record.get("model") not in models:
+            rejected["log_other_model"] += 1
+            continue
+        try:
+            plan = QueryPlan.model_validate(record["plan"])
+        except ValidationError:
+            rejected["log_invalid"] += 1
+            continue
+        yield {
+            "input": record["prompt"],
+            # Counts and dates are applied after generation and never reach the model; the logged
+            # plan is the one generated before they were applied
+            "options": structural_options(record.get("options")) or {},
+            "collection": record.get("collection"),
+            "plan": plan,
+            "source": "generation_log",
+        }
+
+
+class _CatalogCheck:
+    """Checks plans against each collection's catalog (loaded once per collection)."""
+
+    def __init__(self):
+        self._initiators: dict[str | None, dict[str, set[str]] | None] = {}
+
+    def __call__(self, plan: QueryPlan, collection: str | None) -> str | None:
+        """Return why ``plan`` doesn't fit the catalog, or None if it does."""
+        if collection not in self._initiators:
+            try:
+                with use_collection(collection):
+                    self._initiators[collection] = {c["category"]: set(c["initiators"]) for c in list_categories()}
+            except UnknownCollectionError:
+                self._initiators[collection] = None
+        initiators = self._initiators[collection]
+        if initiators is None:
+            return "unknown_collection"
+        for step in plan.steps:
+            if step.type != "service":
+                continue
+            if step.service_category not in initiators:
+                return "unknown_category"
+            if step.initiator not in initiators[step.service_category]:
+                return "unsupported_initiator"
+        return None
+
+
+def iter_catalog_pairs(path: Path, rejected: Counter) -> Iterator[dict]:
+    """Yield a pair for every ``generate_from_catalog.py`` row with a valid plan."""
+    if not path.exists():
+        return
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            try:
+                plan = QueryPlan.model_validate(row["plan"])
+            except (KeyError, ValidationError):
+                rejected["catalog_pair_invalid"] += 1
+                continue
+            yield {
+                "input": row["input"], "options": {}, "collection": row.get("collection"), "plan": plan,
+                "source": "catalog_synthetic",
+            }
+
+
+def collect_pairs(
+    corrections_path: Path,
+    log_dir: str | Path | None,
+    models: set[str] | None,
+    rejected: Counter,
+    catalog_pairs_path: Path | None = None,
+) -> Iterator[dict]:
+    """Yield unique, catalog-valid pairs: corrections first, then generation log plans, then catalog pairs."""
+    seen: set[str] = set()
+    check = _CatalogCheck()
+    sources = [iter_correction_pairs(corrections_path, rejected)]
+    if log_dir is not None:
+        sources.append(iter_log_pairs(log_dir, models, rejected))
+    if catalog_pairs_path is not None:
+        sources.append(iter_catalog_pairs(catalog_pairs_path, rejected))
+    for source in sources:
+        for pair in source:
+            key = _prompt_key(pair["input"], pair["options"], pair["collection"])
+            if key in seen:
+                rejected["duplicate"] += 1
+                continue
+            reason = check(pair["plan"], pair["collection"])
+            if reason is not None:
+                rejected[reason] += 1
+                continue
+            seen.add(key)
+            yield pair
+
+
+def _plan_json(plan: QueryPlan, compact: bool) -> str:
+    if compact:
+        return compact_json(compact_plan(plan))
+    return plan.model_dump_json(exclude_none=True)
+
+
+def openai_example(pair: dict, system_prompt: str, tool: dict, compact: bool) -> dict:
+    """Return the pair as a chat fine-tuning example answering with the planner's tool call."""
+    return {
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": build_user_message(pair["input"], pair["options"])},
+            {
+                "role": "assistant",
+                "tool_calls": [{
+                    "id": "call_1",
+                    "type": "function",
+                    "function": {"name": tool["name"], "arguments": _plan_json(pair["plan"], compact)},
+                }],
+            },
+        ],
+        "tools": [{"type": "function", "function": tool}],
+    }
+
+
+def alpaca_example(pair: dict, compact: bool) -> dict:
+    return {
+        "instruction": ALPACA_INSTRUCTION,
+        "input": build_user_message(pair["input"], pair["options"]),
+        "output": _plan_json(pair["plan"], compact),
+    }
+
+
+def _tool_schema(compact: bool) -> dict:
+    """The function definition instructor sends for the planner's response model."""
+    from instructor import openai_schema
+
+    return openai_schema(CompactPlan if compact else QueryPlan).openai_schema
+
+
+def distill(
+    output_dir: Path = OUTPUT_DIR,
+    corrections_path: Path = CORRECTIONS_FILE,
+    log_dir: str | Path | None = None,
+    models: set[str] | None = None,
+    output_format: str = "full",
+    catalog_pairs_path: Path | None = None,
+) -> dict:
+    """Write the distillation dataset to ``output_dir``; return counts of written and rejected pairs.
+
+    Each file is written to a temporary name and renamed once complete, so
+    a failed run leaves the previous dataset in place.
+    """
+    if output_format not in ("full", "compact"):
+        raise ValueError(f"Unsupported plan output format: {output_format}")
+    compact = output_format == "compact"
+    tool = _tool_schema(compact)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    names = ("plans.jsonl", "openai.jsonl", "alpaca.jsonl")
+    files = {}
+    for name in names:
+        fd, tmp = tempfile.mkstemp(dir=output_dir, prefix=f".{name}-")
+        files[name] = (os.fdopen(fd, "w"), Path(tmp))
+
+    rejected: Counter = Counter()
+    written: Counter = Counter()
+    system_prompts: dict[str | None, str] = {}
+    try:
+        for pair in collect_pairs(corrections_path, log_dir, models, rejected, catalog_pairs_path):
+            collection = pair["collection"]
+            if collection not in system_prompts:
+                with use_collection(collection):
+                    system_prompts[collection] = build_system_prompt(compact=compact)
+            files["plans.jsonl"][0].write(json.dumps({**pair, "plan": pair["plan"].model_dump(mode="json")}) + "\n")
+            files["openai.jsonl"][0].write(json.dumps(openai_example(pair, system_prompts[collection], tool, compact)) + "\n")
+            files["alpaca.jsonl"][0].write(json.dumps(alpaca_example(pair, compact)) + "\n")
+            written[pair["source"]] += 1
+    except BaseException:
+        for f, tmp in files.values():
+            f.close()
+            tmp.unlink(missing_ok=True)
+        raise
+    for name, (f, tmp) in files.items():
+        f.close()
+        os.replace(tmp, output_dir / name)
+
+    return {"pairs": sum(written.values()), "by_source": dict(written), "rejected": dict(rejected)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--log-dir", default=settings.generation_log_dir, help="Generation log directory")
+    parser.add_argument("--corrections", type=Path, default=CORRECTIONS_FILE, help="export_corrections.py output")
+    parser.add_argument(
+        "--catalog-pairs", type=Path, default=CATALOG_PAIRS_FILE, help="generate_from_catalog.py output (if present)"
+    )
+    parser.add_argument("--models", help="Only distill logged plans from these models (comma-separated)")
+    parser.add_argument("--format", choices=("full", "compact"), default="full", help="Plan schema the student answers with")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    models = {m.strip() for m in args.models.split(",") if m.strip()} if args.models else None
+    stats = distill(args.output_dir, args.corrections, args.log_dir, models, args.format, args.catalog_pairs)
+    print(f"Wrote {stats['pairs']} pairs to {args.output_dir} ({stats['by_source']})")
+    if stats["rejected"]:
+        print(f"Skipped: {stats['rejected']}")
@@ -6,18 +6,42 @@ Metrics:
 - Step count accuracy: Correct number of steps?
 - Service category match: Correct service selected?
 - Initiator match: Correct initiator type?
+- Latency p50/p95/p99, token usage and instructor retries per model
+
+Test pairs are evaluated concurrently (``--workers``). With ``--record`` every
+LLM response is stored in a cassette keyed by a hash of the request, and
+``--replay`` serves responses from that cassette instead of calling the LLM,
+so scoring changes re-run offline in seconds and model comparisons are
+reproducible.
+
+Usage:
+    python evaluate.py --workers 8 --models gpt-4o,ollama/gpt-oss:latest --record
+    python evaluate.py --models gpt-4o,ollama/gpt-oss:latest --replay --save results.json
 """
 
+import argparse
+import hashlib
 import json
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import litellm
+
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.services.planner import generate_plan
+from app.config import settings
+from app.services.planner import generate_plan, set_completion_override
+from benchmarks.common import summarize_latencies
 
 DATA_DIR = Path(__file__).parent / "data"
 TEST_FILE = DATA_DIR / "test_set.jsonl"
+CASSETTE_FILE = DATA_DIR / "llm_responses.jsonl"
+
+# Request fields that determine the LLM output; credentials and endpoints are excluded
+_KEY_FIELDS = ("model", "messages", "tools", "tool_choice", "response_format", "temperature", "top_p", "seed")
 
 
 def load_test_set() -> list[dict]:
@@ -34,39 +58,119 @@ def load_test_set() -> list[dict]:
     return pairs
 
 
-def evaluate(test_pairs: list[dict]) -> dict:
+def request_key(kwargs: dict) -> str:
+    """Hash the output-determining fields of a litellm completion request."""
+    payload = {k: kwargs[k] for k in _KEY_FIELDS if k in kwargs}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ResponseCassette:
+    """Append-only JSONL store of LLM responses keyed by ``request_key``."""
+
+    def __init__(self, path: Path, mode: str):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.recorded = 0
+        self._responses: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+        if path.exists():
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._responses[entry["key"]] = entry["response"]
+
+    def completion(self, **kwargs):
+        """Drop-in replacement for ``litellm.completion``."""
+        key = request_key(kwargs)
+        with self._lock:
+            stored = self._responses.get(key)
+        if stored is not None:
+            with self._lock:
+                self.hits += 1
+            return litellm.ModelResponse(**stored)
+        if self.mode == "replay":
+            raise KeyError(f"No recorded LLM response for request {key[:12]}; re-run with --record")
+
+        response = litellm.completion(**kwargs)
+        data = json.loads(json.dumps(response.model_dump(), default=str))
+        with self._lock:
+            self._responses[key] = data
+            self.recorded += 1
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps({"key": key, "model": kwargs.get("model"), "response": data}) + "\n")
+        return response
+
+
+def _evaluate_one(pair: dict, model: str) -> dict:
+    """Generate and score a single test pair."""
+    stats: dict = {}
+    start = time.perf_counter()
+    try:
+        plan = generate_plan(pair["input"], stats=stats, model=model, use_cache=False)
+    except Exception as e:
+        return {
+            "ok": False,
+            "error": str(e),
+            "latency_ms": (time.perf_counter() - start) * 1000,
+            "stats": stats,
+        }
+
+    expected_steps = pair.get("expected_step_count", len(pair.get("steps", [])))
+    first = plan.steps[0] if plan.steps else None
+    return {
+        "ok": True,
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "stats": stats,
+        "step_count_match": len(plan.steps) == expected_steps,
+        "service_category_match": bool(
+            first and "expected_category" in pair and first.service_category == pair["expected_category"]
+        ),
+        "initiator_match": bool(
+            first and "expected_initiator" in pair and first.initiator == pair["expected_initiator"]
+        ),
+    }
+
+
+def evaluate(test_pairs: list[dict], model: str | None = None, workers: int = 4) -> dict:
     """Run evaluation on test pairs."""
+    model = model or settings.litellm_model
     results = {
+        "model": model,
         "total": len(test_pairs),
         "parse_success": 0,
         "step_count_match": 0,
         "service_category_match": 0,
         "initiator_match": 0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "retries": 0,
         "errors": [],
     }
 
-    for pair in test_pairs:
-        try:
-            plan = generate_plan(pair["input"])
-            results["parse_success"] += 1
-
-            # Check step count
-            expected_steps = pair.get("expected_step_count", len(pair.get("steps", [])))
-            if len(plan.steps) == expected_steps:
-                results["step_count_match"] += 1
-
-            # Check first step service category
-            if plan.steps and "expected_category" in pair:
-                if plan.steps[0].service_category == pair["expected_category"]:
-                    results["service_category_match"] += 1
-
-            # Check first step initiator
-            if plan.steps and "expected_initiator" in pair:
-                if plan.steps[0].initiator == pair["expected_initiator"]:
-                    results["initiator_match"] += 1
-
-        except Exception as e:
-            results["errors"].append({"input": pair["input"], "error": str(e)})
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        outcomes = list(pool.map(lambda pair: _evaluate_one(pair, model), test_pairs))
+    elapsed = time.perf_counter() - started
+
+    latencies = []
+    for pair, outcome in zip(test_pairs, outcomes):
+        stats = outcome["stats"]
+        results["prompt_tokens"] += stats.get("prompt_tokens") or 0
+        results["completion_tokens"] += stats.get("completion_tokens") or 0
+        results["retries"] += stats.get("retries") or 0
+        if not outcome["ok"]:
+            results["errors"].append({"input": pair["input"], "error": outcome["error"]})
+            continue
+        latencies.append(outcome["latency_ms"])
+        results["parse_success"] += 1
+        for metric in ("step_count_match", "service_category_match", "initiator_match"):
+            results[metric] += outcome[metric]
 
     # Calculate rates
     total = results["total"] or 1
@@ -74,19 +178,27 @@ def evaluate(test_pairs: list[dict]) -> dict:
     results["step_accuracy"] = results["step_count_match"] / total
     results["category_accuracy"] = results["service_category_match"] / total
     results["initiator_accuracy"] = results["initiator_match"] / total
+    results["latency"] = summarize_latencies(latencies)
+    results["elapsed_s"] = elapsed
 
     return results
 
 
 def print_results(results: dict) -> None:
     """Pretty-print evaluation results."""
+    latency = results["latency"]
+    total = results["total"] or 1
     print(f"\n{'='*50}")
-    print(f"EVALUATION RESULTS ({results['total']} test cases)")
+    print(f"EVALUATION RESULTS: {results['model']} ({results['total']} test cases)")
     print(f"{'='*50}")
     print(f"Parse success rate:     {results['parse_rate']:.1%}")
     print(f"Step count accuracy:    {results['step_accuracy']:.1%}")
     print(f"Category accuracy:      {results['category_accuracy']:.1%}")
     print(f"Initiator accuracy:     {results['initiator_accuracy']:.1%}")
+    print(f"Latency p50/p95/p99:    {latency['p50_ms']:.0f} / {latency['p95_ms']:.0f} / {latency['p99_ms']:.0f} ms")
+    print(f"Tokens in/out (mean):   {results['prompt_tokens'] / total:.0f} / {results['completion_tokens'] / total:.0f}")
+    print(f"Retries:                {results['retries']}")
+    print(f"Wall time:              {results['elapsed_s']:.1f}s")
 
     if results["errors"]:
         print(f"\nErrors ({len(results['errors'])}):")
@@ -95,10 +207,37 @@ def print_results(results: dict) -> None:
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--models", help="Comma-separated litellm model strings (default: configured model)")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--record", action="store_true", help="Store LLM responses in the cassette")
+    mode.add_argument("--replay", action="store_true", help="Serve LLM responses from the cassette only")
+    parser.add_argument("--cassette", type=Path, default=CASSETTE_FILE)
+    parser.add_argument("--save", type=Path, help="Write results as JSON")
+    args = parser.parse_args()
+
     test_pairs = load_test_set()
     if not test_pairs:
         print("No test data. Create training/data/test_set.jsonl first.")
         sys.exit(1)
 
-    results = evaluate(test_pairs)
-    print_results(results)
+    cassette = None
+    if args.record or args.replay:
+        cassette = ResponseCassette(args.cassette, "record" if args.record else "replay")
+        set_completion_override(cassette.completion)
+
+    models = [m.strip() for m in args.models.split(",")] if args.models else [settings.litellm_model]
+    all_results = []
+    for model in models:
+        results = evaluate(test_pairs, model=model, workers=args.workers)
+        print_results(results)
+        all_results.append(results)
+
+    if cassette is not None:
+        print(f"\nCassette: {cassette.hits} replayed, {cassette.recorded} recorded ({args.cassette})")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(all_results, f, indent=2)
+        print(f"Saved results to {args.save}")
@@ -4,55 +4,258 @@ Export user-corrected pairs from the feedback database for training.
 Reads from query_builder_logs table where was_edited=True,
 producing high-quality training pairs.
 
+Rows are streamed in id-ordered chunks (keyset pagination over the
+was_edited index) and written as they are read, so memory stays flat
+regardless of table size. In incremental mode a watermark of the last
+exported id is persisted and only newer corrections are appended. Ids are
+assigned in insertion order, so the id alone is a complete keyset cursor.
+
 Output: training/data/corrections.jsonl
+Watermark: training/data/corrections.watermark.json
+
+Usage:
+    python export_corrections.py                 # full re-export
+    python export_corrections.py --incremental   # append new corrections only
+    python export_corrections.py --benchmark 1000000
 """
 
+import argparse
 import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterator
 
-from sqlmodel import Session, create_engine, select
-
-import sys
+from sqlalchemy import select, text
+from sqlalchemy.engine import Engine
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.config import settings
+from app.database import create_db_engine, init_db
 from app.models.feedback import QueryBuilderLog
 
 OUTPUT_DIR = Path(__file__).parent / "data"
 OUTPUT_FILE = OUTPUT_DIR / "corrections.jsonl"
+WATERMARK_FILE = OUTPUT_DIR / "corrections.watermark.json"
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def load_watermark(path: Path = WATERMARK_FILE) -> dict:
+    """Return the persisted watermark, or a zero watermark if none exists."""
+    if not path.exists():
+        return {"last_id": 0}
+    with open(path) as f:
+        return json.load(f)
 
 
-def export_corrections() -> list[dict]:
-    """Export edited feedback entries as training pairs."""
-    engine = create_engine(settings.database_url)
-    pairs = []
+def save_watermark(watermark: dict, path: Path = WATERMARK_FILE) -> None:
+    """Atomically persist the watermark so a crash never leaves it half-written."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(watermark, f)
+    os.replace(tmp, path)
 
-    with Session(engine) as session:
-        statement = select(QueryBuilderLog).where(QueryBuilderLog.was_edited == True)
-        logs = session.exec(statement).all()
 
-        for log in logs:
-            pairs.append({
-                "input": log.input_prompt,
-                "message": log.final_message,  # Use the corrected version
-                "original_message": log.generated_message,
-                "rating": log.rating,
+def iter_corrections(
+    engine: Engine,
+    after_id: int = 0,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[tuple[int, dict]]:
+    """Yield ``(id, pair)`` for every edited row with ``id > after_id``.
+
+    Each chunk is its own short query (``WHERE was_edited AND id > ? ORDER BY
+    id LIMIT ?``), so no read transaction is held open across the whole
+    export and concurrent API writes are never blocked.
+    """
+    columns = (
+        QueryBuilderLog.id,
+        QueryBuilderLog.input_prompt,
+        QueryBuilderLog.final_message,
+        QueryBuilderLog.generated_message,
+        QueryBuilderLog.rating,
+    )
+    last_id = after_id
+
+    while True:
+        statement = (
+            select(*columns)
+            .where(QueryBuilderLog.was_edited == True)  # noqa: E712
+            .where(QueryBuilderLog.id > last_id)
+            .order_by(QueryBuilderLog.id)
+            .limit(chunk_size)
+        )
+        with engine.connect() as conn:
+            rows = conn.execute(statement).all()
+
+        if not rows:
+            return
+
+        for row_id, input_prompt, final_message, generated_message, rating in rows:
+            yield row_id, {
+                "input": input_prompt,
+                "message": final_message,  # Use the corrected version
+                "original_message": generated_message,
+                "rating": rating,
                 "source": "user_correction",
-            })
+            }
+
+        last_id = rows[-1][0]
+        if len(rows) < chunk_size:
+            return
+
+
+def export_corrections(
+    output_path: Path = OUTPUT_FILE,
+    incremental: bool = False,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    engine: Engine | None = None,
+    watermark_path: Path = WATERMARK_FILE,
+) -> int:
+    """Stream edited feedback entries to ``output_path``; return the number written.
 
-    return pairs
+    A full export writes to a temporary file and renames it over the output,
+    so readers never see a partial file. An incremental export appends to the
+    existing file and advances the watermark only after the new rows are
+    flushed to disk. An incremental export with no watermark yet is a full one.
+    """
+    engine = engine or create_db_engine()
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    if incremental and not watermark_path.exists():
+        # Without a watermark there's no telling which rows the output already has:
+        # appending would duplicate them, so rewrite it instead
+        incremental = False
 
+    watermark = load_watermark(watermark_path) if incremental else {"last_id": 0}
+    count = 0
 
-def save_corrections(pairs: list[dict]) -> None:
-    """Save correction pairs to JSONL."""
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_FILE, "w") as f:
-        for pair in pairs:
+    if incremental:
+        f = open(output_path, "a")
+        tmp_path = None
+    else:
+        fd, tmp_name = tempfile.mkstemp(dir=output_path.parent, prefix=".corrections-", suffix=".jsonl")
+        f = os.fdopen(fd, "w")
+        tmp_path = Path(tmp_name)
+
+    try:
+        for row_id, pair in iter_corrections(engine, watermark["last_id"], chunk_size):
             f.write(json.dumps(pair) + "\n")
-    print(f"Exported {len(pairs)} correction pairs to {OUTPUT_FILE}")
+            watermark = {"last_id": row_id}
+            count += 1
+        f.flush()
+        os.fsync(f.fileno())
+    except BaseException:
+        f.close()
+        if tmp_path is not None:
+            tmp_path.unlink(missing_ok=True)
+        raise
+    f.close()
+
+    if tmp_path is not None:
+        os.replace(tmp_path, output_path)
+    save_watermark(watermark, watermark_path)
+
+    return count
+
+
+def _build_benchmark_db(path: Path, rows: int, edited_ratio: float = 0.3) -> Engine:
+    """Create a synthetic feedback database with ``rows`` rows."""
+    engine = create_db_engine(f"sqlite:///{path}")
+    init_db(engine)
+    edit_every = max(1, round(1 / edited_ratio))
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+    batch = []
+
+    with engine.begin() as conn:
+        insert = text(
+            "INSERT INTO query_builder_logs "
+            "(user_id, input_prompt, generated_message, final_message, rating, was_edited, created_at) "
+            "VALUES (:user_id, :input_prompt, :generated_message, :final_message, :rating, :was_edited, :created_at)"
+        )
+        for i in range(rows):
+            edited = i % edit_every == 0
+            batch.append({
+                "user_id": i % 1000,
+                "input_prompt": f"Search Twitter for posts about topic {i}",
+                "generated_message": f"1. [service] Search Twitter for posts with keyword: topic {i}",
+                "final_message": f"1. [service] Search Twitter for posts with keyword: topic {i}, news"
+                if edited else f"1. [service] Search Twitter for posts with keyword: topic {i}",
+                "rating": 1 + i % 5,
+                "was_edited": edited,
+                "created_at": now,
+            })
+            if len(batch) >= 10000:
+                conn.execute(insert, batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert, batch)
+
+    return engine
+
+
+def benchmark(rows: int, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """Time a full and an incremental export against a synthetic database."""
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        t0 = time.perf_counter()
+        engine = _build_benchmark_db(tmp_dir / "bench.db", rows)
+        build_s = time.perf_counter() - t0
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        t0 = time.perf_counter()
+        exported = export_corrections(
+            tmp_dir / "corrections.jsonl",
+            chunk_size=chunk_size,
+            engine=engine,
+            watermark_path=tmp_dir / "watermark.json",
+        )
+        export_s = time.perf_counter() - t0
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        t0 = time.perf_counter()
+        appended = export_corrections(
+            tmp_dir / "corrections.jsonl",
+            incremental=True,
+            chunk_size=chunk_size,
+            engine=engine,
+            watermark_path=tmp_dir / "watermark.json",
+        )
+        incremental_s = time.perf_counter() - t0
+        engine.dispose()
+
+    return {
+        "rows": rows,
+        "exported": exported,
+        "build_s": build_s,
+        "export_s": export_s,
+        "rows_per_s": exported / export_s if export_s else 0.0,
+        "peak_rss_growth_mb": (rss_after - rss_before) / 1024,
+        "incremental_appended": appended,
+        "incremental_noop_s": incremental_s,
+    }
 
 
 if __name__ == "__main__":
-    pairs = export_corrections()
-    save_corrections(pairs)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--incremental", action="store_true", help="Append only rows newer than the watermark")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--benchmark", type=int, metavar="ROWS", help="Benchmark on a synthetic database")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        stats = benchmark(args.benchmark, args.chunk_size)
+        print(f"Built {stats['rows']} rows in {stats['build_s']:.1f}s")
+        print(f"Exported {stats['exported']} corrections in {stats['export_s']:.2f}s "
+              f"({stats['rows_per_s']:,.0f} rows/s, peak RSS +{stats['peak_rss_growth_mb']:.1f} MB)")
+        print(f"Incremental re-run appended {stats['incremental_appended']} rows in "
+              f"{stats['incremental_noop_s'] * 1000:.1f}ms")
+        sys.exit(0)
+
+    count = export_corrections(incremental=args.incremental, chunk_size=args.chunk_size)
+    mode = "Appended" if args.incremental else "Exported"
+    print(f"{mode} {count} correction pairs to {OUTPUT_FILE}")
@@ -0,0 +1,72 @@
+"""
+Export logged /generate calls as training pairs.
+
+Streams every record from the generation log, rebuilds the assembled
+message from the logged plan and writes one pair per line, so real
+production prompts can be used alongside synthetic pairs and corrections.
+Refinements are skipped: their prompt is an edit instruction, and the plan
+depends on the base plan it was applied to. Only calls planned against one
+catalog collection are exported (the default one unless ``--collection``),
+since the same prompt maps to different services in another catalog.
+
+Output: training/data/generations.jsonl
+
+Usage:
+    python export_generations.py [generation_log_dir]
+    python export_generations.py --collection catalog_eu
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pydantic import ValidationError
+
+from app.config import settings
+from app.models.step_types import QueryPlan
+from app.services.assembler import build_message
+from app.services.generation_log import iter_records
+
+OUTPUT_DIR = Path(__file__).parent / "data"
+OUTPUT_FILE = OUTPUT_DIR / "generations.jsonl"
+
+
+def export_generations(log_dir: str | Path, output_path: Path = OUTPUT_FILE, collection: str | None = None) -> int:
+    """Stream the records of ``collection`` (default: the default one) to ``output_path``; return the count."""
+    collection = collection or settings.qdrant_collection
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    count = 0
+
+    with open(output_path, "w") as f:
+        for record in iter_records(log_dir):
+            if record.get("kind") == "refine" or (record.get("collection") or settings.qdrant_collection) != collection:
+                continue
+            try:
+                plan = QueryPlan.model_validate(record["plan"])
+            except (KeyError, ValidationError):
+                continue
+            f.write(json.dumps({
+                "input": record["prompt"],
+                "message": build_message(plan),
+                "plan": record["plan"],
+                "options": record.get("options") or {},
+                "collection": collection,
+                "model": record.get("model"),
+                "source": "generation_log",
+            }) + "\n")
+            count += 1
+
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log_dir", nargs="?", default=settings.generation_log_dir)
+    parser.add_argument("--collection", help="Catalog collection to export (default: the default one)")
+    args = parser.parse_args()
+
+    count = export_generations(args.log_dir, OUTPUT_FILE, args.collection)
+    print(f"Exported {count} generation pairs to {OUTPUT_FILE}")
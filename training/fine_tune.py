@@ -5,33 +5,61 @@ Approach 1: LoRA with unsloth (local, recommended)
 Approach 2: OpenAI fine-tuning API
 
 Requires 500+ quality training pairs in training/data/pairs.jsonl
+
+Trains on the train split of the dataset built by build_dataset.py
+(deduplicated and split) when it exists, otherwise on the raw pair files.
+Pairs are streamed and written as they are read.
+
+These pairs train on the rendered message. To train a planner that can
+replace the LLM in ``generate_plan`` (QueryPlan tool calls), use the
+structured dataset from distill.py instead.
 """
 
 import json
+import sys
 from pathlib import Path
+from typing import Iterable, Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from training.build_dataset import OUTPUT_DIR as DATASET_DIR
+from training.build_dataset import iter_split
 
 DATA_DIR = Path(__file__).parent / "data"
 PAIRS_FILE = DATA_DIR / "pairs.jsonl"
 CORRECTIONS_FILE = DATA_DIR / "corrections.jsonl"
 
 
-def load_training_data() -> list[dict]:
-    """Load and merge all training data sources."""
-    pairs = []
+def iter_training_data(dataset_dir: Path = DATASET_DIR) -> Iterator[dict]:
+    """Stream the training pairs that have a rendered message."""
+    if (dataset_dir / "manifest.json").exists():
+        pairs = iter_split(dataset_dir, "train")
+    else:
+        pairs = _iter_raw_pairs()
+    for pair in pairs:
+        if pair.get("message"):
+            yield pair
+
 
+def _iter_raw_pairs() -> Iterator[dict]:
     for path in [PAIRS_FILE, CORRECTIONS_FILE]:
         if path.exists():
             with open(path) as f:
                 for line in f:
                     if line.strip():
-                        pairs.append(json.loads(line))
+                        yield json.loads(line)
 
+
+def load_training_data() -> list[dict]:
+    """Load and merge all training data sources."""
+    pairs = list(iter_training_data())
     print(f"Loaded {len(pairs)} total training pairs")
     return pairs
 
 
-def prepare_openai_format(pairs: list[dict], output_path: str) -> None:
-    """Convert pairs to OpenAI fine-tuning JSONL format."""
+def prepare_openai_format(pairs: Iterable[dict], output_path: str) -> int:
+    """Convert pairs to OpenAI fine-tuning JSONL format; return the number written."""
+    count = 0
     with open(output_path, "w") as f:
         for pair in pairs:
             entry = {
@@ -42,30 +70,34 @@ def prepare_openai_format(pairs: list[dict], output_path: str) -> None:
                 ]
             }
             f.write(json.dumps(entry) + "\n")
+            count += 1
     print(f"Wrote OpenAI format to {output_path}")
+    return count
 
 
-def prepare_unsloth_format(pairs: list[dict], output_path: str) -> None:
-    """Convert pairs to unsloth/alpaca training format."""
-    dataset = []
-    for pair in pairs:
-        dataset.append({
-            "instruction": "Convert this natural language request into a structured query for the social media analytics platform.",
-            "input": pair["input"],
-            "output": pair["message"],
-        })
-
+def prepare_unsloth_format(pairs: Iterable[dict], output_path: str) -> int:
+    """Convert pairs to unsloth/alpaca training format (a JSON array, written one entry at a time)."""
+    count = 0
     with open(output_path, "w") as f:
-        json.dump(dataset, f, indent=2)
+        f.write("[")
+        for pair in pairs:
+            entry = {
+                "instruction": "Convert this natural language request into a structured query for the social media analytics platform.",
+                "input": pair["input"],
+                "output": pair["message"],
+            }
+            f.write(("," if count else "") + "\n  " + json.dumps(entry))
+            count += 1
+        f.write("\n]\n")
     print(f"Wrote unsloth format to {output_path}")
+    return count
 
 
 if __name__ == "__main__":
-    pairs = load_training_data()
-
-    if len(pairs) < 50:
-        print(f"WARNING: Only {len(pairs)} pairs. Recommend 500+ for fine-tuning.")
-
     DATA_DIR.mkdir(parents=True, exist_ok=True)
-    prepare_openai_format(pairs, str(DATA_DIR / "openai_finetune.jsonl"))
-    prepare_unsloth_format(pairs, str(DATA_DIR / "unsloth_finetune.json"))
+    count = prepare_openai_format(iter_training_data(), str(DATA_DIR / "openai_finetune.jsonl"))
+    prepare_unsloth_format(iter_training_data(), str(DATA_DIR / "unsloth_finetune.json"))
+    print(f"Prepared {count} training pairs")
+
+    if count < 50:
+        print(f"WARNING: Only {count} pairs. Recommend 500+ for fine-tuning.")
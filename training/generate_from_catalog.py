@@ -0,0 +1,250 @@
+"""
+Generate synthetic (prompt, plan) pairs from the service catalog, offline.
+
+The second input source of ``generate_synthetic.py``: instead of asking an
+LLM to reverse-generate prompts, this walks the catalog's categories and
+the initiators their services support, and builds each pair from prompt
+templates and entity pools. For platform categories (twitter_posts, ...)
+the scrape is optionally followed by the processing chains the planner
+produces: normalize, then sentiment and/or narratives.
+
+Plans are assembled the way the planner's compact format expands them:
+descriptions from ``describe_step``, metadata from ``derive_metadata``,
+and the message is what ``build_message`` renders. No LLM is called, and
+output depends only on the catalog, ``--count`` and ``--seed``, so the
+same corpus can be rebuilt for training data or load tests.
+``distill.py`` reads the output as its lowest-priority source.
+
+Output: training/data/catalog_pairs.jsonl
+
+Usage:
+    python generate_from_catalog.py --count 500000
+    python generate_from_catalog.py --count 20000 --collection catalog_eu --seed 7
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.models.step_types import QueryPlan, StepPlan
+from app.services.assembler import PLATFORM_NAMES, describe_step
+from app.services.catalog import list_categories, use_collection
+from app.services.compact_plan import derive_metadata
+
+OUTPUT_DIR = Path(__file__).parent / "data"
+OUTPUT_FILE = OUTPUT_DIR / "catalog_pairs.jsonl"
+
+TOPICS = [
+    "climate change", "elections", "inflation", "the world cup", "artificial intelligence", "vaccines",
+    "housing prices", "electric cars", "the olympics", "remote work", "cryptocurrency", "wildfires",
+    "space exploration", "the stock market", "public transport", "renewable energy", "data privacy",
+    "food prices", "a product launch", "the music festival",
+]
+HANDLES = [
+    "bbc", "nasa", "elonmusk", "nytimes", "who", "cnn", "natgeo", "espn", "un", "reuters",
+    "spacex", "greenpeace", "unicef", "tedtalks", "nba", "fifaworldcup", "aljazeera", "guardian",
+]
+HASHTAGS = [
+    "breakingnews", "cooking", "climateaction", "worldcup", "ai", "travel", "fitness", "election2024",
+    "iranprotest", "startup", "gaming", "fashion", "crypto", "earthquake", "olympics", "music",
+]
+URL_PATHS = ["groups/{handle}", "{handle}", "pages/{handle}", "channel/{handle}", "r/{handle}", "c/{handle}"]
+NARRATIVE_TOPICS = [
+    "economy, politics", "health, safety", "corruption, protests", "security, migration",
+    "technology, jobs", "environment, energy",
+]
+
+# Scrape phrasing per initiator; {subject} is "Twitter posts", {platform} "Twitter", {kind} "posts"
+SCRAPE_TEMPLATES = {
+    "keyword": [
+        "Search {platform} for {kind} about {value}",
+        "Find {subject} mentioning {value}",
+        "Get {subject} about {value}",
+        "Look for {kind} on {platform} discussing {value}",
+    ],
+    "hashtag": [
+        "Scrape {subject} tagged #{value}",
+        "Find {subject} with the hashtag #{value}",
+        "Get {kind} about #{value} from {platform}",
+        "Collect {platform} {kind} using #{value}",
+    ],
+    "username": [
+        "Get {subject} from @{value}",
+        "Scrape the {kind} of @{value} on {platform}",
+        "Collect {platform} {kind} published by @{value}",
+        "Fetch the latest {kind} by @{value} on {platform}",
+    ],
+    "url": [
+        "Scrape {kind} from this {platform} page: {value}",
+        "Get the {subject} at {value}",
+        "Collect {kind} from {value}",
+    ],
+    "image": [
+        "Run {name} on this image",
+        "Use {name} on the uploaded photo",
+    ],
+}
+# Categories without a platform prefix (photo_location, username_search, ...)
+OTHER_TEMPLATES = [
+    "Run {name} for {value}",
+    "Use {name} with {initiator} {value}",
+]
+
+# Processing chains after the scrape (platform categories only); normalize always comes first
+CHAINS = [(), ("normalize",), ("normalize", "sentiment"), ("normalize", "narratives"), ("normalize", "sentiment", "narratives")]
+CHAIN_PHRASES = {
+    "normalize": ["normalize the data", "convert the results to the standard format"],
+    "sentiment": ["analyze the sentiment", "classify the sentiment of each post"],
+    "narratives": ["identify the narratives", "group the posts into narratives"],
+}
+NARRATIVES_WITH_TOPICS = ["classify the narratives: {topics}", "sort the posts into narratives about {topics}"]
+
+
+def _value(initiator: str, platform: str | None, rng: random.Random) -> str | None:
+    if initiator == "keyword":
+        return rng.choice(TOPICS)
+    if initiator == "hashtag":
+        return rng.choice(HASHTAGS)
+    if initiator == "username":
+        return rng.choice(HANDLES) + (str(rng.randrange(100)) if rng.random() < 0.3 else "")
+    if initiator == "url":
+        path = rng.choice(URL_PATHS).format(handle=rng.choice(HANDLES))
+        return f"https://{platform or 'example'}.com/{path}"
+    if initiator == "image":
+        return None
+    return rng.choice(HANDLES)
+
+
+def _join(phrases: list[str]) -> str:
+    if len(phrases) == 1:
+        return phrases[0]
+    return ", ".join(phrases[:-1]) + " and " + phrases[-1]
+
+
+class CatalogPairGenerator:
+    """Deterministic (prompt, plan) pairs covering every category and initiator of a catalog."""
+
+    def __init__(self, categories: list[dict], seed: int = 0):
+        self.rng = random.Random(seed)
+        # One unit per (category, initiator) a service supports, in catalog order
+        self.units: list[tuple[str, str, str]] = []
+        for group in categories:
+            for initiator in sorted(group["initiators"]):
+                service = next(s for s in group["services"] if initiator in s["initiators"])
+                self.units.append((group["category"], initiator, service.get("name") or group["category"]))
+        if not self.units:
+            raise ValueError("the catalog has no services to generate from")
+        self._scripter_descriptions: dict[tuple, str] = {}
+
+    def pairs(self, count: int) -> Iterator[tuple[str, QueryPlan, str]]:
+        """Yield ``count`` (prompt, plan, message) triples, cycling over the catalog units."""
+        for i in range(count):
+            yield self.pair(*self.units[i % len(self.units)])
+
+    def pair(self, category: str, initiator: str, name: str) -> tuple[str, QueryPlan, str]:
+        rng = self.rng
+        prefix, _, kind = category.partition("_")
+        platform = prefix if prefix in PLATFORM_NAMES and kind else None
+        value = _value(initiator, platform, rng)
+
+        if platform is not None and initiator in SCRAPE_TEMPLATES and initiator != "image":
+            display = PLATFORM_NAMES[platform]
+            kind = kind.replace("_", " ")
+            template = rng.choice(SCRAPE_TEMPLATES[initiator])
+            prompt = template.format(platform=display, kind=kind, subject=f"{display} {kind}", value=value, name=name)
+            chain = rng.choice(CHAINS)
+        else:
+            templates = SCRAPE_TEMPLATES["image"] if value is None else OTHER_TEMPLATES
+            prompt = rng.choice(templates).format(name=name, initiator=initiator, value=value)
+            chain = ()
+
+        service = StepPlan(
+            type="service",
+            service_category=category,
+            initiator=initiator,
+            description="",
+            params={} if value is None else {initiator: value},
+        )
+        service.description = describe_step(service, 1)
+        steps = [service]
+        phrases = []
+        for operation in chain:
+            if operation == "normalize":
+                params = {"platform": platform}
+                phrases.append(rng.choice(CHAIN_PHRASES["normalize"]))
+            elif operation == "narratives" and rng.random() < 0.4:
+                topics = rng.choice(NARRATIVE_TOPICS)
+                params = {"operation": "narratives", "narrative_topics": topics}
+                phrases.append(rng.choice(NARRATIVES_WITH_TOPICS).format(topics=topics))
+            else:
+                params = {"operation": operation}
+                phrases.append(rng.choice(CHAIN_PHRASES[operation]))
+            # Processing reads the normalized data (step 2) once there is any
+            related = [1] if operation == "normalize" else [2]
+            steps.append(self._scripter_step(params, related, len(steps) + 1))
+        if phrases:
+            prompt = f"{prompt} and {_join(phrases)}" if len(phrases) == 1 else f"{prompt}, then {_join(phrases)}"
+
+        plan = QueryPlan(steps=steps, metadata=derive_metadata(steps))
+        message = "\n".join(f"{n}. [{step.type}] {step.description}" for n, step in enumerate(steps, 1))
+        return prompt, plan, message
+
+    def _scripter_step(self, params: dict, related: list[int], number: int) -> StepPlan:
+        # Scripter descriptions only depend on these, and rendering their templates dominates the cost
+        key = (tuple(params.items()), tuple(related), number)
+        description = self._scripter_descriptions.get(key)
+        if description is None:
+            step = StepPlan(type="scripter", description="", params=params, related_steps=related)
+            description = self._scripter_descriptions[key] = describe_step(step, number)
+        return StepPlan(type="scripter", description=description, params=params, related_steps=related)
+
+
+def generate_from_catalog(
+    count: int, output_path: Path = OUTPUT_FILE, seed: int = 0, collection: str | None = None
+) -> int:
+    """Write ``count`` catalog-driven pairs to ``output_path``; return the number written.
+
+    The file is written to a temporary name and renamed once complete, so an
+    interrupted run leaves the previous output in place.
+    """
+    with use_collection(collection):
+        generator = CatalogPairGenerator(list_categories(), seed)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=output_path.parent, prefix=f".{output_path.name}-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                for prompt, plan, message in generator.pairs(count):
+                    f.write(json.dumps({
+                        "input": prompt,
+                        "message": message,
+                        "plan": plan.model_dump(mode="json"),
+                        "collection": collection,
+                        "source": "catalog_synthetic",
+                    }) + "\n")
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        os.replace(tmp, output_path)
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000, help="Pairs to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--collection", help="Catalog collection to generate from (default: the default one)")
+    parser.add_argument("--output", type=Path, default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = generate_from_catalog(args.count, args.output, args.seed, args.collection)
+    elapsed = time.perf_counter() - start
+    print(f"Saved {count} pairs to {args.output} in {elapsed:.1f}s ({count / elapsed * 60:,.0f} pairs/min)")
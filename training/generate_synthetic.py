@@ -4,13 +4,30 @@ Generate synthetic training pairs from production data.
 Input sources:
 1. messages.json (production queries) → reverse-generate NL prompts
 2. Service catalog → generate prompts per service category
+   (offline, from templates: see generate_from_catalog.py)
+
+Messages are stream-parsed (a JSON array or JSONL) and sent to the LLM
+concurrently, bounded by ``--concurrency`` and a ``--rps`` rate limit.
+Pairs are appended to the output as soon as each message completes, and
+the message's hash is then recorded in a checkpoint file, so an interrupted
+run picks up where it stopped. Repeated messages and prompts that already
+exist in the output are skipped.
 
 Output: training/data/pairs.jsonl
+Checkpoint: training/data/pairs.checkpoint
+
+Usage:
+    python generate_synthetic.py <messages.json> [--concurrency 8] [--rps 4]
 """
 
+import argparse
+import asyncio
+import hashlib
 import json
 import sys
+import time
 from pathlib import Path
+from typing import Iterator
 
 import litellm
 
@@ -20,6 +37,7 @@ from app.config import settings
 
 OUTPUT_DIR = Path(__file__).parent / "data"
 OUTPUT_FILE = OUTPUT_DIR / "pairs.jsonl"
+CHECKPOINT_FILE = OUTPUT_DIR / "pairs.checkpoint"
 
 REVERSE_PROMPT = """Given this structured query message for a social media analytics platform,
 write a natural language prompt that a user would type to generate this query.
@@ -30,52 +48,242 @@ Query message:
 Write 3-5 different natural language prompts that would produce this query.
 Return as a JSON array of strings."""
 
+_READ_CHUNK = 1 << 16
 
-def generate_from_messages(messages_path: str) -> list[dict]:
-    """Generate NL→structured pairs from production messages.json."""
-    with open(messages_path) as f:
-        messages = json.load(f)
-
-    pairs = []
-    for msg in messages:
-        # Call LLM to reverse-generate natural language prompts
-        kwargs = {
-            "model": settings.litellm_model,
-            "messages": [
-                {"role": "user", "content": REVERSE_PROMPT.format(message=msg["message"])},
-            ],
-        }
-        if settings.litellm_api_base:
-            kwargs["api_base"] = settings.litellm_api_base
-
-        response = litellm.completion(**kwargs)
-        try:
-            prompts = json.loads(response.choices[0].message.content)
-            for prompt in prompts:
-                pairs.append({
-                    "input": prompt,
-                    "message": msg["message"],
-                    "source": "reverse_generated",
-                })
-        except (json.JSONDecodeError, KeyError):
-            continue
 
-    return pairs
+def iter_messages(messages_path: str | Path) -> Iterator[dict]:
+    """Stream message objects from a JSON array or a JSONL file.
+
+    Only one decoded object and one read chunk are held in memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(messages_path, encoding="utf-8") as f:
+        buf = f.read(_READ_CHUNK).lstrip()
+        in_array = buf.startswith("[")
+        if in_array:
+            buf = buf[1:]
+        eof = False
+
+        while True:
+            buf = buf.lstrip().lstrip(",").lstrip()
+            if in_array and buf.startswith("]"):
+                return
+            if not buf:
+                if eof:
+                    return
+                chunk = f.read(_READ_CHUNK)
+                eof = not chunk
+                buf += chunk
+                continue
+            try:
+                obj, end = decoder.raw_decode(buf)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(_READ_CHUNK)
+                eof = not chunk
+                buf += chunk
+                continue
+            yield obj
+            buf = buf[end:]
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _prompt_key(prompt: str) -> str:
+    """Normalize a prompt for duplicate detection."""
+    return _hash(" ".join(prompt.lower().split()))
+
+
+def load_checkpoint(path: Path = CHECKPOINT_FILE) -> set[str]:
+    """Return hashes of messages already processed by a previous run."""
+    if not path.exists():
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def load_seen_prompts(path: Path = OUTPUT_FILE) -> set[str]:
+    """Return normalized keys of prompts already present in the output."""
+    seen = set()
+    if path.exists():
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        seen.add(_prompt_key(json.loads(line)["input"]))
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+    return seen
+
+
+class RateLimiter:
+    """Spaces request starts at least ``1 / rps`` seconds apart."""
+
+    def __init__(self, rps: float | None):
+        self.interval = 1.0 / rps if rps else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            if self._next > now:
+                await asyncio.sleep(self._next - now)
+            self._next = max(now, self._next) + self.interval
 
 
-def save_pairs(pairs: list[dict]) -> None:
-    """Save pairs to JSONL file."""
-    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_FILE, "a") as f:
-        for pair in pairs:
-            f.write(json.dumps(pair) + "\n")
-    print(f"Saved {len(pairs)} pairs to {OUTPUT_FILE}")
+class Progress:
+    """Counters plus a periodic one-line throughput readout."""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.started = time.monotonic()
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.pairs = 0
+        self.duplicate_prompts = 0
+        self._last_report = self.started
+
+    def maybe_report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        elapsed = now - self.started or 1e-9
+        print(
+            f"[{elapsed:7.1f}s] messages done={self.done} skipped={self.skipped} failed={self.failed} "
+            f"| pairs={self.pairs} dup_prompts={self.duplicate_prompts} "
+            f"| {self.done / elapsed:.2f} msg/s, {self.pairs / elapsed:.2f} pairs/s",
+            file=sys.stderr,
+            flush=True,
+        )
+
+
+async def _reverse_generate(message: str) -> list[str]:
+    """Ask the LLM for natural language prompts that would produce ``message``."""
+    kwargs = {
+        "model": settings.litellm_model,
+        "messages": [
+            {"role": "user", "content": REVERSE_PROMPT.format(message=message)},
+        ],
+    }
+    if settings.litellm_api_base:
+        kwargs["api_base"] = settings.litellm_api_base
+    kwargs.update(settings.litellm_extra_kwargs)
+
+    response = await litellm.acompletion(**kwargs)
+    prompts = json.loads(response.choices[0].message.content)
+    return [p for p in prompts if isinstance(p, str) and p.strip()]
+
+
+async def generate_from_messages(
+    messages_path: str | Path,
+    output_path: Path = OUTPUT_FILE,
+    checkpoint_path: Path = CHECKPOINT_FILE,
+    concurrency: int = 8,
+    rps: float | None = None,
+    progress_interval: float = 5.0,
+) -> Progress:
+    """Generate NL→structured pairs from production messages.json, resumably."""
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    processed = load_checkpoint(checkpoint_path)
+    seen_prompts = load_seen_prompts(output_path)
+    in_flight: set[str] = set()
+
+    limiter = RateLimiter(rps)
+    progress = Progress(progress_interval)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    with open(output_path, "a") as out, open(checkpoint_path, "a") as ckpt:
+
+        async def worker() -> None:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                msg_hash, message = item
+                await limiter.wait()
+                try:
+                    prompts = await _reverse_generate(message)
+                except (json.JSONDecodeError, KeyError, TypeError, IndexError):
+                    prompts = []
+                except Exception as e:
+                    # Leave it out of the checkpoint so a re-run retries it
+                    print(f"LLM call failed: {e}", file=sys.stderr)
+                    progress.failed += 1
+                    in_flight.discard(msg_hash)
+                    continue
+
+                for prompt in prompts:
+                    key = _prompt_key(prompt)
+                    if key in seen_prompts:
+                        progress.duplicate_prompts += 1
+                        continue
+                    seen_prompts.add(key)
+                    out.write(json.dumps({
+                        "input": prompt,
+                        "message": message,
+                        "source": "reverse_generated",
+                    }) + "\n")
+                    progress.pairs += 1
+                out.flush()
+
+                ckpt.write(msg_hash + "\n")
+                ckpt.flush()
+                processed.add(msg_hash)
+                in_flight.discard(msg_hash)
+                progress.done += 1
+                progress.maybe_report()
+
+        async def produce() -> None:
+            for msg in iter_messages(messages_path):
+                message = msg.get("message") if isinstance(msg, dict) else None
+                if not message:
+                    continue
+                msg_hash = _hash(message)
+                if msg_hash in processed or msg_hash in in_flight:
+                    progress.skipped += 1
+                    continue
+                in_flight.add(msg_hash)
+                await queue.put((msg_hash, message))
+
+            for _ in workers:
+                await queue.put(None)
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        producer = asyncio.create_task(produce())
+        try:
+            await asyncio.gather(producer, *workers)
+        except BaseException:
+            # A worker that dies (e.g. a failed write) stops draining the queue;
+            # cancel the rest instead of leaving the producer blocked on put()
+            for task in (producer, *workers):
+                task.cancel()
+            await asyncio.gather(producer, *workers, return_exceptions=True)
+            raise
+
+    progress.maybe_report(force=True)
+    return progress
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python generate_synthetic.py <messages.json>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("messages", help="Path to messages.json (array) or messages.jsonl")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rps", type=float, help="Maximum LLM requests started per second")
+    parser.add_argument("--progress-interval", type=float, default=5.0)
+    args = parser.parse_args()
 
-    pairs = generate_from_messages(sys.argv[1])
-    save_pairs(pairs)
+    progress = asyncio.run(generate_from_messages(
+        args.messages,
+        concurrency=args.concurrency,
+        rps=args.rps,
+        progress_interval=args.progress_interval,
+    ))
+    print(f"Saved {progress.pairs} pairs to {OUTPUT_FILE}")